@@ -0,0 +1,28 @@
+"""
+Общие помощники массовых операций
+
+Используются приложениями rbac, users и mock_objects: размер пакета и
+удаление одним DELETE без загрузки строк.
+"""
+
+# Строк на один INSERT/UPDATE/DELETE в массовых операциях
+BULK_BATCH_SIZE = 1000
+
+
+def raw_delete(queryset):
+    """
+    Удаление одним DELETE без загрузки строк
+
+    QuerySet.delete() выбирает строки для каскада Collector и при подключенных
+    сигналах отправляет post_delete для каждой. Здесь выполняется только
+    DELETE по условию queryset: каскад, сигналы и сброс кэшей - забота
+    вызывающего кода, зависимые строки нужно удалить раньше.
+
+    Вызывает QuerySet._raw_delete - тот же DELETE, которым Django сам удаляет
+    строки при быстром удалении (Collector.can_fast_delete). Метод закрытый,
+    поэтому все вызовы проходят через эту функцию.
+
+    Returns:
+        int: количество удаленных строк
+    """
+    return queryset._raw_delete(queryset.db)
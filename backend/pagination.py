@@ -0,0 +1,263 @@
+"""
+Режимы пагинации списков
+
+Режим выбирается параметром ?pagination= (см. PaginationModeMixin):
+- page (по умолчанию): номер страницы и общее количество - COUNT(*) на каждый запрос;
+- nocount: номер страницы без COUNT(*), наличие следующей страницы
+  определяется по лишней строке;
+- offset: limit/offset с ограничением limit;
+- cursor: keyset пагинация по полям cursor_ordering представления - страница
+  выбирается условием (created_at, id) < (курсор) вместо OFFSET и не требует
+  COUNT(*), поэтому глубокие страницы стоят столько же, сколько первая.
+
+Во всех режимах размер страницы задается параметром page_size (в режиме
+offset - limit) и ограничен MAX_PAGE_SIZE.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+PAGINATION_PARAM = "pagination"
+MAX_PAGE_SIZE = 1000
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+
+
+class NextPreviousPagination(pagination.BasePagination):
+    """Пагинация без COUNT(*): размер страницы и ответ из next, previous, results"""
+
+    page_size = pagination.PageNumberPagination.page_size
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class NoCountPagination(NextPreviousPagination):
+    """Постраничная пагинация без COUNT(*): выбирается page_size + 1 строк"""
+
+    page_query_param = "page"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page = int(request.query_params.get(self.page_query_param, 1))
+            if self.page < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(_("Неверная страница"))
+
+        offset = (self.page - 1) * self.page_size
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        return rows[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page - 1)
+
+
+class LimitOffsetPagination(pagination.LimitOffsetPagination):
+    default_limit = pagination.PageNumberPagination.page_size
+    max_limit = MAX_PAGE_SIZE
+
+
+def _reverse(name):
+    return name[1:] if name.startswith("-") else f"-{name}"
+
+
+def _after(queryset, ordering, position):
+    """
+    Строки после позиции в порядке ordering
+
+    Для пары (поле, id) - условие (поле, id) > позиция в направлении
+    сортировки, как в mock_objects.sync: диапазон по полю использует индекс
+    (поле, id), строки с тем же значением поля отсекаются по id.
+    """
+    first, *rest = ordering
+    name = first.lstrip("-")
+    lookup = "lt" if first.startswith("-") else "gt"
+    if not rest:
+        return queryset.filter(**{f"{name}__{lookup}": position[0]})
+    tie = rest[0].lstrip("-")
+    tie_lookup = "gte" if rest[0].startswith("-") else "lte"
+    return queryset.filter(**{f"{name}__{lookup}e": position[0]}).exclude(
+        **{name: position[0], f"{tie}__{tie_lookup}": position[1]}
+    )
+
+
+class KeysetPagination(NextPreviousPagination):
+    """
+    Keyset пагинация; порядок берется из cursor_ordering представления
+
+    Порядок - уникальное поле или пара (поле, уникальное поле), например
+    ("-created_at", "-id"). Курсор хранит значения этих полей у крайней строки
+    страницы и направление; следующая страница выбирается условием после
+    курсора (см. _after) и page_size + 1 строками без OFFSET. Предыдущая -
+    тем же условием в обратном порядке.
+    """
+
+    cursor_query_param = "cursor"
+    ordering = ("-id",)
+    invalid_cursor_message = _("Неверный курсор")
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "cursor_ordering", None) or self.ordering
+        if len(ordering) > 2:
+            raise ImproperlyConfigured(
+                "cursor_ordering: ожидается уникальное поле или пара (поле, уникальное поле)"
+            )
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(request, queryset, view)
+        self.fields = [queryset.model._meta.get_field(name.lstrip("-")) for name in ordering]
+        reverse, position = self.decode_cursor(request)
+
+        if reverse:
+            ordering = [_reverse(name) for name in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = _after(queryset, ordering, position)
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    def decode_cursor(self, request):
+        """
+        Returns:
+            tuple: (в обратном порядке, позиция - значения полей порядка или None)
+        """
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return False, None
+        try:
+            raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+            reverse, *values = json.loads(raw)
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(item) for field, item in zip(self.fields, values)]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), position
+
+    def encode_cursor(self, reverse, row):
+        values = [int(reverse)] + [field.value_to_string(row) for field in self.fields]
+        cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(False, self.rows[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.rows:
+            return None
+        return self.encode_cursor(True, self.rows[0])
+
+
+PAGINATION_MODES = {
+    "page": PageNumberPagination,
+    "nocount": NoCountPagination,
+    "offset": LimitOffsetPagination,
+    "cursor": KeysetPagination,
+}
+
+
+class PaginationModeMixin:
+    """
+    Выбор пагинации параметром ?pagination=
+
+    pagination_modes - доступные представлению режимы; без параметра
+    используется pagination_class. Для режима cursor порядок задается
+    cursor_ordering: его поля должны быть покрыты индексом.
+    """
+
+    pagination_modes = PAGINATION_MODES
+    cursor_ordering = ("-id",)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            mode = request.query_params.get(PAGINATION_PARAM) if request is not None else None
+            if not mode:
+                self._paginator = super().paginator
+            elif mode in self.pagination_modes:
+                self._paginator = self.pagination_modes[mode]()
+            else:
+                raise ValidationError(
+                    {
+                        PAGINATION_PARAM: _("Неизвестный режим пагинации. Доступны: %(modes)s")
+                        % {"modes": ", ".join(self.pagination_modes)}
+                    }
+                )
+        return self._paginator
+
+    def paginate_queryset(self, queryset):
+        # Постраничным режимам нужен устойчивый порядок; cursor задает его сам
+        paginator = self.paginator
+        if (
+            paginator is not None
+            and not isinstance(paginator, KeysetPagination)
+            and not queryset.ordered
+        ):
+            queryset = queryset.order_by("pk")
+        return super().paginate_queryset(queryset)
@@ -0,0 +1,157 @@
+"""
+Бюджет SQL запросов на HTTP запрос
+
+Запросы считаются через connection.execute_wrapper, поэтому учет работает
+и при DEBUG=False. Кроме количества запоминается "форма" каждого запроса -
+SQL без параметров, где списки IN (%s, ...) и VALUES свернуты: много
+запросов одной формы за один HTTP запрос - признак N+1.
+
+Бюджет представления задается атрибутом query_budget его класса, иначе
+используется settings.QUERY_BUDGET["DEFAULT"]. Запросы сверх бюджета и
+повторяющиеся формы записываются в лог; при QUERY_BUDGET["RAISE"] запрос,
+превысивший бюджет, прерывается исключением QueryBudgetExceeded.
+Запросы, выполняемые при чтении потокового ответа, не учитываются.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_VALUES_LIST = re.compile(r"VALUES \((?:%s, )*%s\)(?:, \((?:%s, )*%s\))*")
+
+
+def query_shape(sql):
+    """SQL без зависимости от количества параметров в IN и VALUES"""
+    return _VALUES_LIST.sub("VALUES (...)", _IN_LIST.sub("IN (...)", sql))
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос выполнил больше SQL запросов, чем разрешено бюджетом"""
+
+
+class QueryCounter:
+    """Счетчик для connection.execute_wrapper: количество запросов и их формы"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.count = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[query_shape(sql)] += 1
+        if self.budget is not None and self.count > self.budget:
+            raise QueryBudgetExceeded(
+                f"Превышен бюджет SQL запросов: {self.budget}\n{sql}"
+            )
+        return execute(sql, params, many, context)
+
+    def duplicates(self, threshold=2):
+        """Формы запросов, выполненные не меньше threshold раз, от частых к редким"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+@contextmanager
+def count_queries(budget=None):
+    """
+    Подсчет запросов ко всем базам данных внутри блока
+
+        with count_queries() as counter:
+            ...
+        counter.count, counter.duplicates()
+    """
+    counter = QueryCounter(budget)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+def get_view_budget(view_func):
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+    return settings.QUERY_BUDGET["DEFAULT"] if budget is None else budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Подсчет SQL запросов каждого HTTP запроса
+
+    Должен стоять в начале MIDDLEWARE, чтобы учитывать запросы остальных
+    middleware. При QUERY_BUDGET["HEADERS"] количество запросов
+    возвращается в заголовке X-Query-Count.
+
+    Поддерживает и синхронную, и асинхронную цепочку: под ASGI запрос не
+    переносится в отдельный поток ради этого middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        options = settings.QUERY_BUDGET
+        if not options["ENABLED"]:
+            return self.get_response(request)
+
+        with count_queries() as counter:
+            request._query_counter = counter
+            response = self.get_response(request)
+        return self._report(request, response, counter)
+
+    async def __acall__(self, request):
+        options = settings.QUERY_BUDGET
+        if not options["ENABLED"]:
+            return await self.get_response(request)
+
+        # Соединения с базой принадлежат потоку: счетчик подключается в том
+        # же потоке, где sync_to_async выполняет ORM запроса
+        stack = ExitStack()
+        counter = await sync_to_async(stack.enter_context)(count_queries())
+        try:
+            request._query_counter = counter
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._report(request, response, counter)
+
+    def _report(self, request, response, counter):
+        options = settings.QUERY_BUDGET
+        budget = getattr(request, "_query_budget", options["DEFAULT"])
+        duplicates = counter.duplicates(options["DUPLICATES"])
+        if counter.count > budget or duplicates:
+            logger.warning(
+                "%s %s: %d SQL запросов (бюджет %d), повторяющиеся: %s",
+                request.method,
+                request.path,
+                counter.count,
+                budget,
+                "; ".join(f"{count} x {shape}" for shape, count in duplicates) or "нет",
+            )
+        if options["HEADERS"]:
+            response["X-Query-Count"] = str(counter.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        counter = getattr(request, "_query_counter", None)
+        if counter is None:
+            return None
+        request._query_budget = get_view_budget(view_func)
+        if settings.QUERY_BUDGET["RAISE"]:
+            counter.budget = request._query_budget
+        return None
@@ -61,6 +61,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы учитывать SQL запросы остальных middleware
+    "backend.querybudget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -105,6 +107,138 @@ DATABASES = {
 }
 
 
+# Cache
+# Версия политики RBAC, черный список и эпохи токенов хранятся в кэше, поэтому
+# при нескольких процессах необходимо использовать общий кэш (Redis/Memcached).
+# LocMemCache по умолчанию подходит только для одного процесса: manage.py check
+# предупреждает о нем (users.W001), а check --deploy завершается ошибкой
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+# Время жизни кэша эффективных разрешений пользователя (секунды).
+# Записи сбрасываются сигналами, таймаут лишь ограничивает объем кэша
+RBAC_PERMISSION_CACHE_TIMEOUT = config(
+    "RBAC_PERMISSION_CACHE_TIMEOUT", default=3600, cast=int
+)
+
+
+# Встраивать права RBAC в access токены, чтобы проверка прав на эндпоинтах
+# с PermissionClaimsJWTAuthentication не обращалась к базе данных
+RBAC_TOKEN_CLAIMS = config("RBAC_TOKEN_CLAIMS", default=False, cast=bool)
+
+
+# Аудит логирование: записи сохраняются фоновым потоком пакетами.
+# OVERFLOW - поведение при переполнении очереди: block, drop или sync.
+# EXPORT_SETTLE_SECONDS - записи моложе не попадают в выгрузку (см. export в
+# rbac.views): должно превышать задержку сохранения записи
+AUDIT_LOG = {
+    "ASYNC": config("AUDIT_LOG_ASYNC", default=True, cast=bool),
+    "BATCH_SIZE": config("AUDIT_LOG_BATCH_SIZE", default=500, cast=int),
+    "FLUSH_INTERVAL": config("AUDIT_LOG_FLUSH_INTERVAL", default=1.0, cast=float),
+    "QUEUE_SIZE": config("AUDIT_LOG_QUEUE_SIZE", default=10000, cast=int),
+    "OVERFLOW": config("AUDIT_LOG_OVERFLOW", default="sync"),
+    "EXPORT_SETTLE_SECONDS": config("AUDIT_LOG_EXPORT_SETTLE_SECONDS", default=30, cast=float),
+}
+
+
+# Хеширование паролей
+# ALGORITHM: pbkdf2, argon2 (нужен пакет argon2-cffi) или scrypt. Хеши других
+# алгоритмов и с другой стоимостью пересчитываются при успешном входе.
+# POOL_WORKERS/POOL_QUEUE_SIZE: пул потоков проверки паролей при входе и
+# максимальное число ожидающих проверок, сверх которого вход отклоняется с 503
+PASSWORD_HASHING = {
+    "ALGORITHM": config("PASSWORD_HASHING_ALGORITHM", default="pbkdf2"),
+    "PBKDF2_ITERATIONS": config("PASSWORD_HASHING_PBKDF2_ITERATIONS", default=600000, cast=int),
+    "ARGON2_TIME_COST": config("PASSWORD_HASHING_ARGON2_TIME_COST", default=2, cast=int),
+    "ARGON2_MEMORY_COST": config("PASSWORD_HASHING_ARGON2_MEMORY_COST", default=102400, cast=int),
+    "ARGON2_PARALLELISM": config("PASSWORD_HASHING_ARGON2_PARALLELISM", default=8, cast=int),
+    "SCRYPT_WORK_FACTOR": config("PASSWORD_HASHING_SCRYPT_WORK_FACTOR", default=2**14, cast=int),
+    "POOL_WORKERS": config("PASSWORD_HASHING_POOL_WORKERS", default=4, cast=int),
+    "POOL_QUEUE_SIZE": config("PASSWORD_HASHING_POOL_QUEUE_SIZE", default=64, cast=int),
+}
+
+_PASSWORD_HASHERS = {
+    "pbkdf2": "users.hashers.PBKDF2PasswordHasher",
+    "argon2": "users.hashers.Argon2PasswordHasher",
+    "scrypt": "users.hashers.ScryptPasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHING["ALGORITHM"]]] + [
+    hasher
+    for algorithm, hasher in _PASSWORD_HASHERS.items()
+    if algorithm != PASSWORD_HASHING["ALGORITHM"]
+] + ["django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher"]
+
+AUTHENTICATION_BACKENDS = ["users.backends.PooledModelBackend"]
+
+
+# Фильтр Блума для черного списка refresh токенов (см. users.blacklist)
+TOKEN_BLACKLIST_FILTER = {
+    "ENABLED": config("TOKEN_BLACKLIST_FILTER_ENABLED", default=True, cast=bool),
+    "ERROR_RATE": config("TOKEN_BLACKLIST_FILTER_ERROR_RATE", default=0.001, cast=float),
+    "REBUILD_INTERVAL": config("TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL", default=600, cast=int),
+}
+
+# Бюджет SQL запросов на HTTP запрос (см. backend.querybudget)
+# DEFAULT - бюджет представлений без атрибута query_budget, DUPLICATES - сколько
+# запросов одной формы считать признаком N+1, RAISE - прерывать запрос при
+# превышении бюджета вместо записи в лог
+QUERY_BUDGET = {
+    "ENABLED": config("QUERY_BUDGET_ENABLED", default=DEBUG, cast=bool),
+    "DEFAULT": config("QUERY_BUDGET_DEFAULT", default=20, cast=int),
+    "DUPLICATES": config("QUERY_BUDGET_DUPLICATES", default=5, cast=int),
+    "RAISE": config("QUERY_BUDGET_RAISE", default=False, cast=bool),
+    "HEADERS": config("QUERY_BUDGET_HEADERS", default=DEBUG, cast=bool),
+}
+
+# Выборка изменений mock объектов (см. mock_objects.sync)
+# SETTLE_SECONDS - задержка, после которой изменение попадает в выборку (не
+# меньше длительности самой долгой транзакции записи), TOMBSTONE_DAYS - срок
+# хранения отметок об удалении и водяных знаков
+MOCK_SYNC = {
+    "PAGE_SIZE": config("MOCK_SYNC_PAGE_SIZE", default=500, cast=int),
+    "MAX_PAGE_SIZE": config("MOCK_SYNC_MAX_PAGE_SIZE", default=5000, cast=int),
+    "SETTLE_SECONDS": config("MOCK_SYNC_SETTLE_SECONDS", default=5, cast=float),
+    "TOMBSTONE_DAYS": config("MOCK_SYNC_TOMBSTONE_DAYS", default=30, cast=int),
+}
+
+# Ограничение частоты входа и регистрации (см. users.throttling)
+# STORE: local (память процесса), cache (кэш Django), redis (нужен пакет redis)
+# или путь к классу хранилища. Частоты в формате "количество/период" (s, m, h, d),
+# пустое значение отключает правило.
+THROTTLING = {
+    "ENABLED": config("THROTTLING_ENABLED", default=True, cast=bool),
+    "STORE": config("THROTTLING_STORE", default="cache"),
+    "REDIS_URL": config("THROTTLING_REDIS_URL", default="redis://localhost:6379/0"),
+    # Число доверенных прокси перед приложением: IP клиента берется из
+    # X-Forwarded-For только при значении больше 0, иначе - REMOTE_ADDR
+    "NUM_PROXIES": config("THROTTLING_NUM_PROXIES", default=0, cast=int),
+    "RATES": {
+        "login_ip": config("THROTTLE_LOGIN_IP", default="30/m"),
+        "login_email": config("THROTTLE_LOGIN_EMAIL", default="10/m"),
+        "login_global": config("THROTTLE_LOGIN_GLOBAL", default="600/s"),
+        "register_ip": config("THROTTLE_REGISTER_IP", default="10/h"),
+        "register_email": config("THROTTLE_REGISTER_EMAIL", default="5/h"),
+        "register_global": config("THROTTLE_REGISTER_GLOBAL", default="100/s"),
+    },
+}
+
+# Кэш пользователей для JWT аутентификации (см. users.user_cache)
+# LOCAL_TIMEOUT - время жизни копии в памяти процесса, ограничивает задержку,
+# с которой деактивация и отзыв токенов видны в других процессах
+USER_CACHE = {
+    "ENABLED": config("USER_CACHE_ENABLED", default=True, cast=bool),
+    "TIMEOUT": config("USER_CACHE_TIMEOUT", default=300, cast=int),
+    "LOCAL_TIMEOUT": config("USER_CACHE_LOCAL_TIMEOUT", default=5, cast=int),
+    "LOCAL_MAX_SIZE": config("USER_CACHE_LOCAL_MAX_SIZE", default=10000, cast=int),
+}
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -142,12 +276,13 @@ AUTH_USER_MODEL = "users.CustomUser"
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.EpochJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    # Другие режимы выбираются параметром ?pagination= (см. backend.pagination)
+    "DEFAULT_PAGINATION_CLASS": "backend.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
 
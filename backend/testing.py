@@ -0,0 +1,82 @@
+"""
+Помощники тестов: подсчет SQL запросов (см. backend.querybudget)
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+import rbac.policy
+import users.blacklist
+import users.user_cache
+
+from .querybudget import count_queries
+
+
+def reset_process_caches():
+    """Сброс кэшей процесса, чтобы количество запросов не зависело от порядка тестов"""
+    cache.clear()
+    rbac.policy._policy = None
+    users.user_cache._local.clear()
+    users.blacklist._blacklist = None
+
+
+class QueryCountMixin:
+    @contextmanager
+    def assertQueryCount(self, expected, max_repeats=None):
+        """
+        Точное количество SQL запросов внутри блока
+
+        При max_repeats дополнительно проверяется, что ни одна форма запроса
+        не повторяется чаще (признак N+1).
+        """
+        with count_queries() as counter:
+            yield counter
+
+        shapes = "\n".join(f"{count} x {shape}" for shape, count in counter.shapes.most_common())
+        self.assertEqual(
+            counter.count, expected, f"{counter.count} SQL запросов вместо {expected}:\n{shapes}"
+        )
+        if max_repeats is not None:
+            self.assertEqual(counter.duplicates(max_repeats + 1), [], f"Повторяющиеся запросы:\n{shapes}")
+
+    def assertConstantQueries(self, expected, request, grow):
+        """
+        Количество запросов request() одинаково до и после grow()
+
+        grow добавляет данные (например, строки на страницу списка), так что
+        проверка ловит запросы, выполняемые для каждой строки. Если request()
+        возвращает ответ, он должен быть успешным: иначе считались бы запросы
+        ветки с ошибкой.
+        """
+        with self.assertQueryCount(expected):
+            self._assertSuccess(request())
+        grow()
+        with self.assertQueryCount(expected, max_repeats=1):
+            response = request()
+        self._assertSuccess(response)
+        return response
+
+    def _assertSuccess(self, response):
+        status_code = getattr(response, "status_code", None)
+        if status_code is not None:
+            self.assertLess(status_code, 400, getattr(response, "data", None))
+
+
+@override_settings(
+    AUDIT_LOG={**settings.AUDIT_LOG, "ASYNC": False},
+    THROTTLING={**settings.THROTTLING, "ENABLED": False},
+)
+class QueryCountTestCase(QueryCountMixin, APITestCase):
+    """
+    Тесты количества запросов
+
+    Аудит пишется синхронно, чтобы его INSERT учитывался в том же соединении,
+    ограничение частоты отключено.
+    """
+
+    def setUp(self):
+        reset_process_caches()
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MockObjectsConfig(AppConfig):
     name = 'mock_objects'
+
+    def ready(self):
+        from . import signals  # noqa: F401
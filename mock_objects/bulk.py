@@ -0,0 +1,192 @@
+"""
+Массовые операции с MockObject
+
+Строки проверяются сериализатором по одной, строки с ошибками пропускаются
+и перечисляются в ответе вместе с номером (index) в запросе. Остальные
+записываются одной транзакцией пакетами по BULK_BATCH_SIZE: на пакет
+выполняется один INSERT (создание), SELECT ... FOR UPDATE и UPDATE
+(изменение) или SELECT ... FOR UPDATE, INSERT отметок об удалении и DELETE
+(удаление).
+
+bulk_create/bulk_update не вызывают save(), поэтому updated_at при
+изменении присваивается явно, а при удалении отметки (см. mock_objects.sync)
+создаются одним INSERT вместо сигнала post_delete на каждую строку.
+"""
+
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+
+from backend.bulk import BULK_BATCH_SIZE, raw_delete
+
+from .models import MockObject, MockObjectTombstone
+from .serializers import MockObjectSerializer
+
+
+def _chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _row_error(index, object_id, message):
+    return {"index": index, "id": object_id, "errors": {"id": [message]}}
+
+
+def _validate(serializer, row):
+    """
+    Проверка строки одним экземпляром сериализатора, как у ListSerializer:
+    поля сериализатора строятся один раз на запрос, а не на каждую строку
+
+    Returns:
+        tuple: (проверенные поля, ошибки)
+    """
+    try:
+        return serializer.run_validation(row), None
+    except ValidationError as exc:
+        return None, exc.detail
+
+
+def bulk_create_objects(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Массовое создание объектов
+
+    Returns:
+        dict: created - id созданных объектов в порядке строк,
+            errors - список {"index", "errors"} для строк, не прошедших проверку
+    """
+    objects, errors = [], []
+    serializer = MockObjectSerializer()
+    for index, row in enumerate(rows):
+        data, row_errors = _validate(serializer, row)
+        if row_errors:
+            errors.append({"index": index, "errors": row_errors})
+        else:
+            objects.append(MockObject(**data))
+
+    with transaction.atomic():
+        MockObject.objects.bulk_create(objects, batch_size=batch_size)
+    return {"created": [obj.pk for obj in objects], "errors": errors}
+
+
+def _update_rows(objects, fields):
+    """
+    UPDATE пакета объектов одним запросом
+
+    На PostgreSQL - UPDATE ... FROM (VALUES ...): bulk_update строит
+    выражение CASE WHEN для каждой строки и поля, и на пакетах в тысячу строк
+    его сборка занимает больше времени, чем сам запрос.
+    """
+    if connection.vendor != "postgresql":
+        MockObject.objects.bulk_update(objects, fields)
+        return
+
+    quote = connection.ops.quote_name
+    columns = [MockObject._meta.get_field(field) for field in fields]
+    # Типы столбцов VALUES задаются приведением в первой строке
+    first_row = ", ".join(
+        ["%s::bigint"] + [f"%s::{column.db_type(connection)}" for column in columns]
+    )
+    other_rows = ", ".join(["%s"] * (len(columns) + 1))
+    values = ", ".join([f"({first_row})"] + [f"({other_rows})"] * (len(objects) - 1))
+    params = []
+    for obj in objects:
+        params.append(obj.pk)
+        params.extend(
+            column.get_db_prep_save(getattr(obj, column.attname), connection) for column in columns
+        )
+    names = [quote(column.column) for column in columns]
+    assignments = ", ".join(f"{name} = v.{name}" for name in names)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {quote(MockObject._meta.db_table)} AS t SET {assignments} "
+            f"FROM (VALUES {values}) AS v(id, {', '.join(names)}) WHERE t.id = v.id",
+            params,
+        )
+
+
+def bulk_update_objects(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Массовое частичное изменение объектов по id
+
+    Каждая строка содержит id и изменяемые поля. Несуществующие id и
+    повторы id в запросе считаются ошибками строки.
+
+    Returns:
+        dict: updated - id измененных объектов, errors - список
+            {"index", "id", "errors"}
+    """
+    changes, errors = {}, []
+    serializer = MockObjectSerializer(partial=True)
+    for index, row in enumerate(rows):
+        object_id = row.get("id") if isinstance(row, dict) else None
+        if not isinstance(object_id, int) or isinstance(object_id, bool) or object_id < 1:
+            errors.append(_row_error(index, object_id, _("Ожидается id объекта")))
+            continue
+        if object_id in changes:
+            errors.append(_row_error(index, object_id, _("Повтор id в запросе")))
+            continue
+        data, row_errors = _validate(serializer, row)
+        if row_errors:
+            errors.append({"index": index, "id": object_id, "errors": row_errors})
+        else:
+            changes[object_id] = (index, data)
+
+    updated = []
+    now = timezone.now()
+    with transaction.atomic():
+        for chunk in _chunks(changes.items(), batch_size):
+            # Блокировка строк: параллельное изменение других полей не теряется
+            objects = MockObject.objects.select_for_update().in_bulk(dict(chunk))
+            fields = {"updated_at"}
+            for object_id, (index, data) in chunk:
+                obj = objects.get(object_id)
+                if obj is None:
+                    errors.append(_row_error(index, object_id, _("Объект не найден")))
+                    continue
+                for field, value in data.items():
+                    setattr(obj, field, value)
+                obj.updated_at = now
+                fields.update(data)
+                updated.append(object_id)
+            if objects:
+                _update_rows(list(objects.values()), sorted(fields))
+
+    errors.sort(key=lambda error: error["index"])
+    return {"updated": updated, "errors": errors}
+
+
+def bulk_delete_objects(queryset, batch_size=BULK_BATCH_SIZE, limit=None):
+    """
+    Массовое удаление объектов queryset с отметками об удалении
+
+    Args:
+        limit: Наибольшее количество удаляемых объектов (None - без ограничения)
+
+    Returns:
+        list: id удаленных объектов
+    """
+    deleted = []
+    with transaction.atomic():
+        while limit is None or len(deleted) < limit:
+            size = batch_size if limit is None else min(batch_size, limit - len(deleted))
+            # FOR UPDATE: строки, удаленные параллельной транзакцией, не
+            # выбираются повторно и не получают вторую отметку
+            ids = list(
+                queryset.select_for_update().order_by("id").values_list("id", flat=True)[:size]
+            )
+            if not ids:
+                break
+            MockObjectTombstone.objects.bulk_create(
+                MockObjectTombstone(object_id=object_id) for object_id in ids
+            )
+            # Без сборщика связей Django и сигнала post_delete на каждую строку
+            raw_delete(MockObject.objects.filter(id__in=ids))
+            deleted.extend(ids)
+    return deleted
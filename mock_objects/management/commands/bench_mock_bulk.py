@@ -0,0 +1,132 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from mock_objects.models import MockObject
+from mock_objects.views import MockObjectBulkViewSet, MockObjectViewSet
+from rbac.models import Action, Permission, Resource, Role, UserRole
+from rbac.policy import bump_policy_version
+from rbac.tokens import RbacRefreshToken
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение скорости создания, изменения и удаления mock объектов "
+        "по одному и массовыми эндпоинтами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=2000,
+            help="Количество объектов в каждой операции",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._bench(options["rows"])
+                raise _Rollback
+        except _Rollback:
+            pass
+        bump_policy_version()
+
+    def _bench(self, rows):
+        self.factory = APIRequestFactory()
+        self.authorization = f"Bearer {self._make_user().access_token}"
+
+        self.stdout.write(
+            f"{'operation':<10} {'rows':>6} {'single s':>9} {'bulk s':>8} {'speedup':>8} {'bulk rows/s':>12}"
+        )
+        for operation in ("create", "update", "delete"):
+            single = getattr(self, f"_single_{operation}")
+            bulk = getattr(self, f"_bulk_{operation}")
+            single_seconds = self._timed(single, rows)
+            bulk_seconds = self._timed(bulk, rows)
+            self.stdout.write(
+                f"{operation:<10} {rows:>6} {single_seconds:>9.2f} {bulk_seconds:>8.2f} "
+                f"{single_seconds / bulk_seconds:>7.1f}x {rows / bulk_seconds:>12.0f}"
+            )
+
+    def _timed(self, operation, rows):
+        # Объекты для изменения и удаления создаются вне замера
+        ids = [obj.pk for obj in MockObject.objects.bulk_create(
+            MockObject(name=f"bench-{index}") for index in range(rows)
+        )]
+        started = time.perf_counter()
+        operation(ids)
+        return time.perf_counter() - started
+
+    def _make_user(self):
+        """Пользователь с правами через роль: права проверяются, как у обычного клиента"""
+        suffix = uuid.uuid4().hex[:8]
+        resource, _ = Resource.objects.get_or_create(
+            endpoint="/api/mock/objects/", defaults={"name": f"bench-{suffix}"}
+        )
+        permissions = [
+            Permission.objects.get_or_create(resource=resource, action=action)[0]
+            for action in Action.objects.all()
+        ]
+        role = Role.objects.create(name=f"bench-{suffix}")
+        role.permissions.set(permissions)
+        user = User.objects.create_user(
+            email=f"bench-{suffix}@example.com", password=None, first_name="Bench", last_name="User"
+        )
+        UserRole.objects.create(user=user, role=role)
+        bump_policy_version()
+        return RbacRefreshToken.for_user(user)
+
+    def _call(self, viewset, actions, method, path, data=None, **kwargs):
+        request = getattr(self.factory, method)(
+            path, data, format="json", HTTP_AUTHORIZATION=self.authorization
+        )
+        response = viewset.as_view(actions)(request, **kwargs)
+        assert response.status_code < 300, response.data
+        return response
+
+    def _single_create(self, ids):
+        for index in range(len(ids)):
+            self._call(
+                MockObjectViewSet, {"post": "create"}, "post", "/api/mock/objects/",
+                {"name": f"single-{index}"},
+            )
+
+    def _bulk_create(self, ids):
+        self._call(
+            MockObjectBulkViewSet, {"post": "bulk_create"}, "post", "/api/mock/objects/bulk/",
+            [{"name": f"bulk-{index}"} for index in range(len(ids))],
+        )
+
+    def _single_update(self, ids):
+        for pk in ids:
+            self._call(
+                MockObjectViewSet, {"patch": "partial_update"}, "patch",
+                f"/api/mock/objects/{pk}/", {"description": "single"}, pk=pk,
+            )
+
+    def _bulk_update(self, ids):
+        self._call(
+            MockObjectBulkViewSet, {"patch": "bulk_update"}, "patch", "/api/mock/objects/bulk/",
+            [{"id": pk, "description": "bulk"} for pk in ids],
+        )
+
+    def _single_delete(self, ids):
+        for pk in ids:
+            self._call(
+                MockObjectViewSet, {"delete": "destroy"}, "delete", f"/api/mock/objects/{pk}/", pk=pk,
+            )
+
+    def _bulk_delete(self, ids):
+        self._call(
+            MockObjectBulkViewSet, {"post": "bulk_delete"}, "post", "/api/mock/objects/bulk-delete/",
+            {"ids": ids},
+        )
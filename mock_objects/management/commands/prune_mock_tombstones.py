@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mock_objects.models import MockObjectTombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаление отметок об удалении mock объектов старше срока хранения; "
+        "клиенты с более старым водяным знаком получат 410 и выполнят полную загрузку"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.MOCK_SYNC["TOMBSTONE_DAYS"],
+            help="Сколько дней хранить отметки (по умолчанию MOCK_SYNC_TOMBSTONE_DAYS)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Размер пакета DELETE",
+        )
+
+    def handle(self, *args, **options):
+        old = MockObjectTombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(days=options["days"])
+        )
+        deleted = 0
+        while True:
+            ids = list(old.values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            deleted += MockObjectTombstone.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Удалено отметок: {deleted}"))
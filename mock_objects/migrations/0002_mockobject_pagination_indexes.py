@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mock_objects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mockobject',
+            index=models.Index(fields=['created_at', 'id'], name='mock_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mockobject',
+            index=models.Index(fields=['updated_at', 'id'], name='mock_updated_id_idx'),
+        ),
+    ]
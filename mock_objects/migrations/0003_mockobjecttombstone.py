@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mock_objects', '0002_mockobject_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MockObjectTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='deleted at')),
+            ],
+            options={
+                'verbose_name': 'mock object tombstone',
+                'verbose_name_plural': 'mock object tombstones',
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='mock_tombstone_deleted_id_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -13,6 +14,34 @@ class MockObject(models.Model):
     class Meta:
         verbose_name = _("mock object")
         verbose_name_plural = _("mock objects")
+        indexes = [
+            # Keyset пагинация (?pagination=cursor) и выборка измененных записей
+            models.Index(fields=["created_at", "id"], name="mock_created_id_idx"),
+            models.Index(fields=["updated_at", "id"], name="mock_updated_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class MockObjectTombstone(models.Model):
+    """
+    Отметка об удалении MockObject
+
+    Нужна выборке изменений (см. mock_objects.sync): удаленную строку
+    нельзя найти по updated_at. Отметки старше MOCK_SYNC["TOMBSTONE_DAYS"]
+    удаляет команда prune_mock_tombstones.
+    """
+
+    object_id = models.BigIntegerField(_("object id"))
+    deleted_at = models.DateTimeField(_("deleted at"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("mock object tombstone")
+        verbose_name_plural = _("mock object tombstones")
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="mock_tombstone_deleted_id_idx"),
+        ]
+
+    def __str__(self):
+        return str(self.object_id)
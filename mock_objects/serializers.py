@@ -1,9 +1,44 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from .models import MockObject
 
+# Наибольшее количество строк в запросе массовой операции
+BULK_MAX_ITEMS = 10000
+
 
 class MockObjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = MockObject
         fields = ['id', 'name', 'description', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class MockObjectFilterSerializer(serializers.Serializer):
+    """Отбор объектов для массового удаления"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=BULK_MAX_ITEMS
+    )
+    name = serializers.CharField(required=False)
+    name_startswith = serializers.CharField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(_('Необходимо указать хотя бы одно условие отбора'))
+        return attrs
+
+    @staticmethod
+    def filter_queryset(queryset, data):
+        """Применение проверенных условий отбора к queryset объектов"""
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'name' in data:
+            queryset = queryset.filter(name=data['name'])
+        if 'name_startswith' in data:
+            queryset = queryset.filter(name__startswith=data['name_startswith'])
+        if 'created_before' in data:
+            queryset = queryset.filter(created_at__lt=data['created_before'])
+        if 'created_after' in data:
+            queryset = queryset.filter(created_at__gte=data['created_after'])
+        return queryset
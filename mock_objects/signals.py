@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import MockObject, MockObjectTombstone
+
+
+@receiver(post_delete, sender=MockObject)
+def mock_object_deleted(sender, instance, **kwargs):
+    # В той же транзакции, что и удаление (см. mock_objects.sync)
+    MockObjectTombstone.objects.create(object_id=instance.pk)
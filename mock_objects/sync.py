@@ -0,0 +1,135 @@
+"""
+Выборка изменений MockObject (delta sync)
+
+Клиент передает водяной знак (watermark) из предыдущего ответа и получает
+объекты, измененные после него, и идентификаторы удаленных. Знак содержит
+две позиции: (updated_at, id) последнего отданного объекта и
+(deleted_at, id) последней отметки об удалении. Оба потока читаются по
+индексам с условием "после позиции" в порядке (время, id), поэтому стоимость
+запроса пропорциональна числу изменений, а не размеру таблицы.
+
+Потоки независимы: удаленный объект в таблице уже отсутствует и не может
+вернуться из потока объектов после своей отметки об удалении.
+
+Изменения моложе MOCK_SYNC["SETTLE_SECONDS"] не отдаются: updated_at
+присваивается до фиксации транзакции, и запись, зафиксированная позже
+записи с большим updated_at, иначе осталась бы позади водяного знака клиента.
+
+Без водяного знака отдается полный список объектов (первичная загрузка),
+отметки об удалении до ее начала пропускаются.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import MockObject, MockObjectTombstone
+
+
+class InvalidWatermark(ValueError):
+    """Водяной знак не удалось разобрать"""
+
+
+class WatermarkExpired(Exception):
+    """Отметки об удалении после водяного знака уже удалены - нужна полная загрузка"""
+
+
+def encode_watermark(objects_position, tombstones_position):
+    values = []
+    for position in (objects_position, tombstones_position):
+        values.extend([position[0].isoformat(), position[1]] if position else [None, None])
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_watermark(value):
+    """
+    Returns:
+        tuple: (позиция объектов, позиция отметок об удалении); позиция - (время, id) или None
+    """
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        objects_ts, objects_id, tombstones_ts, tombstones_id = json.loads(raw)
+        objects_position = (
+            (datetime.fromisoformat(objects_ts), int(objects_id)) if objects_ts else None
+        )
+        tombstones_position = (datetime.fromisoformat(tombstones_ts), int(tombstones_id))
+    except (ValueError, TypeError):
+        raise InvalidWatermark(value)
+    if tombstones_position[0].tzinfo is None:
+        raise InvalidWatermark(value)
+    return objects_position, tombstones_position
+
+
+def _after(queryset, field, position, until):
+    """Строки после позиции (время, id) и раньше until, в порядке (время, id)"""
+    queryset = queryset.filter(**{f"{field}__lt": until})
+    if position is not None:
+        timestamp, pk = position
+        # Условие по времени использует индекс (field, id); строки с тем же
+        # временем отсекаются по id
+        queryset = queryset.filter(**{f"{field}__gte": timestamp}).exclude(
+            **{field: timestamp, "id__lte": pk}
+        )
+    return queryset.order_by(field, "id")
+
+
+def _read(queryset, limit):
+    rows = list(queryset[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def get_changes(since=None, limit=None, now=None):
+    """
+    Изменения после водяного знака
+
+    Args:
+        since: Водяной знак из предыдущего ответа или None для первичной загрузки
+        limit: Наибольшее количество объектов и отметок об удалении (каждых)
+
+    Returns:
+        dict: objects - измененные объекты, deleted - id удаленных,
+            watermark - знак для следующего запроса, has_more - есть ли еще изменения
+
+    Raises:
+        InvalidWatermark: Если знак не удалось разобрать
+        WatermarkExpired: Если знак старше срока хранения отметок об удалении
+    """
+    options = settings.MOCK_SYNC
+    now = timezone.now() if now is None else now
+    until = now - timedelta(seconds=options["SETTLE_SECONDS"])
+    limit = limit or options["PAGE_SIZE"]
+
+    if since:
+        objects_position, tombstones_position = decode_watermark(since)
+        if tombstones_position[0] < now - timedelta(days=options["TOMBSTONE_DAYS"]):
+            raise WatermarkExpired(since)
+    else:
+        objects_position, tombstones_position = None, (until, 0)
+
+    objects, more_objects = _read(
+        _after(MockObject.objects.all(), "updated_at", objects_position, until), limit
+    )
+    tombstones, more_tombstones = _read(
+        _after(MockObjectTombstone.objects.all(), "deleted_at", tombstones_position, until),
+        limit,
+    )
+
+    if objects:
+        objects_position = (objects[-1].updated_at, objects[-1].pk)
+    if more_tombstones:
+        tombstones_position = (tombstones[-1].deleted_at, tombstones[-1].pk)
+    else:
+        # Все отметки до until прочитаны: позиция сдвигается, даже если
+        # удалений не было, иначе знак регулярно синхронизирующегося клиента
+        # устарел бы через TOMBSTONE_DAYS
+        tombstones_position = (until, 0)
+
+    return {
+        "objects": objects,
+        "deleted": [tombstone.object_id for tombstone in tombstones],
+        "watermark": encode_watermark(objects_position, tombstones_position),
+        "has_more": more_objects or more_tombstones,
+    }
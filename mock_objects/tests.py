@@ -1,3 +1,315 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from backend.testing import QueryCountTestCase
+from rbac.models import Action, Permission, Resource, Role, UserRole
+from rbac.policy import bump_policy_version, get_policy
+from rbac.tokens import RbacRefreshToken
+from users.epochs import get_token_epoch
+
+from .models import MockObject, MockObjectTombstone
+from .serializers import BULK_MAX_ITEMS
+from .sync import encode_watermark, get_changes
+
+User = get_user_model()
+
+
+@override_settings(RBAC_TOKEN_CLAIMS=True)
+class MockObjectTestCase(QueryCountTestCase):
+    """
+    Пользователь без прав суперпользователя получает доступ через роль;
+    права передаются в access токене, поэтому аутентификация и проверка
+    прав не обращаются к базе данных.
+    """
+
+    def setUp(self):
+        super().setUp()
+        resource = Resource.objects.create(name="Тестовые объекты", endpoint="/api/mock/objects/")
+        permissions = Permission.objects.bulk_create(
+            Permission(resource=resource, action=action) for action in Action.objects.all()
+        )
+        role = Role.objects.create(name="Тест")
+        role.permissions.set(permissions)
+        user = User.objects.create_user(
+            email="user@example.com", password="password123", first_name="U", last_name="U"
+        )
+        UserRole.objects.create(user=user, role=role)
+
+        get_policy()
+        get_token_epoch(user.pk)
+        refresh = RbacRefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.object = MockObject.objects.create(name="Объект")
+
+
+class MockObjectQueryCountTests(MockObjectTestCase):
+    """Количество SQL запросов эндпоинтов mock_objects/urls.py"""
+
+    def test_list(self):
+        def grow():
+            MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(20))
+
+        self.assertConstantQueries(2, lambda: self.client.get(reverse("mock-object-list")), grow)
+
+    def test_create(self):
+        with self.assertQueryCount(1):
+            response = self.client.post(reverse("mock-object-list"), {"name": "Новый"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_detail(self):
+        url = reverse("mock-object-detail", args=[self.object.pk])
+        with self.assertQueryCount(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(2):
+            response = self.client.put(url, {"name": "Изменен"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(2):
+            response = self.client.patch(url, {"description": "Описание"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        # Удаление и отметка об удалении
+        with self.assertQueryCount(3):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    def test_list_pagination_modes(self):
+        def grow():
+            MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(20))
+
+        # Без COUNT(*) режимы nocount и cursor выполняют один запрос
+        for mode, expected in (("page", 2), ("offset", 2), ("nocount", 1), ("cursor", 1)):
+            with self.subTest(mode):
+                self.assertConstantQueries(
+                    expected,
+                    lambda: self.client.get(reverse("mock-object-list"), {"pagination": mode}),
+                    grow,
+                )
+
+    def test_list_nocount_pages(self):
+        MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(4))
+        url = reverse("mock-object-list")
+
+        first = self.client.get(url, {"pagination": "nocount", "page_size": 3}).json()
+        self.assertEqual(len(first["results"]), 3)
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(len(second["results"]), 2)
+        self.assertIsNone(second["next"])
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_list_cursor_pages(self):
+        # Одинаковое created_at: страницы разделяются по id
+        MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(4))
+        MockObject.objects.update(created_at=self.object.created_at)
+        expected = list(MockObject.objects.order_by("-id").values_list("id", flat=True))
+        url = reverse("mock-object-list")
+
+        pages = [self.client.get(url, {"pagination": "cursor", "page_size": 2}).json()]
+        self.assertIsNone(pages[0]["previous"])
+        while pages[-1]["next"]:
+            with self.assertQueryCount(1) as counter:
+                pages.append(self.client.get(pages[-1]["next"]).json())
+            self.assertNotIn("OFFSET", " ".join(counter.shapes))
+        self.assertEqual([row["id"] for page in pages for row in page["results"]], expected)
+        self.assertEqual(len(pages), 3)
+
+        previous = self.client.get(pages[-1]["previous"]).json()
+        self.assertEqual(previous["results"], pages[-2]["results"])
+        self.assertEqual(self.client.get(previous["previous"]).json()["results"], pages[0]["results"])
+
+        response = self.client.get(url, {"pagination": "cursor", "cursor": "неверный"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_unknown_pagination(self):
+        response = self.client.get(reverse("mock-object-list"), {"pagination": "all"})
+        self.assertEqual(response.status_code, 400)
+
+
+MOCK_SYNC = {"PAGE_SIZE": 500, "MAX_PAGE_SIZE": 5000, "SETTLE_SECONDS": 0, "TOMBSTONE_DAYS": 30}
+
+
+@override_settings(MOCK_SYNC=MOCK_SYNC)
+class MockObjectChangesTests(MockObjectTestCase):
+    """Выборка изменений /api/mock/objects/changes/"""
+
+    def changes(self, **params):
+        response = self.client.get(reverse("mock-object-changes"), params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.json()
+
+    def test_initial_and_delta(self):
+        initial = self.changes()
+        self.assertEqual([row["id"] for row in initial["objects"]], [self.object.pk])
+        self.assertEqual(initial["deleted"], [])
+        self.assertFalse(initial["has_more"])
+
+        created = MockObject.objects.create(name="Новый")
+        self.object.name = "Изменен"
+        self.object.save()
+        deleted = MockObject.objects.create(name="Удаляемый")
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        delta = self.changes(since=initial["watermark"])
+        self.assertEqual([row["id"] for row in delta["objects"]], [created.pk, self.object.pk])
+        self.assertEqual(delta["deleted"], [deleted_id])
+
+        empty = self.changes(since=delta["watermark"])
+        self.assertEqual(empty["objects"], [])
+        self.assertEqual(empty["deleted"], [])
+
+    def test_limit_pages(self):
+        MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(4))
+        ids, since = [], None
+        while True:
+            page = self.changes(limit=2, **({"since": since} if since else {}))
+            ids.extend(row["id"] for row in page["objects"])
+            since = page["watermark"]
+            if not page["has_more"]:
+                break
+        self.assertEqual(sorted(ids), list(MockObject.objects.values_list("id", flat=True).order_by("id")))
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_query_count(self):
+        since = self.changes()["watermark"]
+
+        def grow():
+            MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(20))
+            MockObjectTombstone.objects.bulk_create(
+                MockObjectTombstone(object_id=-i) for i in range(1, 21)
+            )
+
+        # Объекты и отметки об удалении - по одному запросу
+        self.assertConstantQueries(
+            2, lambda: self.client.get(reverse("mock-object-changes"), {"since": since}), grow
+        )
+
+    def test_settle_delay(self):
+        since = self.changes()["watermark"]
+        MockObject.objects.create(name="Новый")
+        with self.settings(MOCK_SYNC={**MOCK_SYNC, "SETTLE_SECONDS": 60}):
+            self.assertEqual(self.changes(since=since)["objects"], [])
+        self.assertEqual(len(self.changes(since=since)["objects"]), 1)
+
+    def test_invalid_watermark(self):
+        response = self.client.get(reverse("mock-object-changes"), {"since": "not-a-watermark"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("mock-object-changes"), {"limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_watermark_without_deletes_does_not_expire(self):
+        started = timezone.now()
+        since = get_changes(now=started)["watermark"]
+        for day in range(1, 41):
+            since = get_changes(since, now=started + timedelta(days=day))["watermark"]
+
+    def test_expired_watermark(self):
+        old = timezone.now() - timedelta(days=31)
+        since = encode_watermark((old, self.object.pk), (old, 0))
+        response = self.client.get(reverse("mock-object-changes"), {"since": since})
+        self.assertEqual(response.status_code, 410)
+
+
+class MockObjectBulkTests(MockObjectTestCase):
+    """Массовые операции /api/mock/objects/bulk/ и bulk-delete/"""
+
+    def test_bulk_create(self):
+        rows = [{"name": f"Объект {i}"} for i in range(5)] + [{"name": ""}, "строка"]
+        # Одна проверка прав и один INSERT на пакет (SAVEPOINT/RELEASE тестовой транзакции)
+        with self.assertQueryCount(3):
+            response = self.client.post(reverse("mock-object-bulk"), rows, format="json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data["created"]), 5)
+        self.assertEqual([error["index"] for error in data["errors"]], [5, 6])
+        self.assertIn("name", data["errors"][0]["errors"])
+        self.assertEqual(MockObject.objects.filter(id__in=data["created"]).count(), 5)
+
+    def test_bulk_update(self):
+        objects = MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(3))
+        before = MockObject.objects.get(pk=objects[0].pk).updated_at
+        rows = [
+            {"id": objects[0].pk, "description": "Описание"},
+            {"id": objects[1].pk, "name": "Изменен"},
+            {"id": objects[1].pk, "name": "Повтор"},
+            {"id": 10 ** 9, "name": "Нет такого"},
+            {"id": objects[2].pk, "name": ""},
+            {"name": "Без id"},
+        ]
+        # SELECT ... FOR UPDATE и UPDATE на пакет
+        with self.assertQueryCount(4):
+            response = self.client.patch(reverse("mock-object-bulk"), rows, format="json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["updated"], [objects[0].pk, objects[1].pk])
+        self.assertEqual([error["index"] for error in data["errors"]], [2, 3, 4, 5])
+
+        first = MockObject.objects.get(pk=objects[0].pk)
+        self.assertEqual((first.name, first.description), ("Объект 0", "Описание"))
+        self.assertGreater(first.updated_at, before)
+        self.assertEqual(MockObject.objects.get(pk=objects[1].pk).name, "Изменен")
+        self.assertEqual(MockObject.objects.get(pk=objects[2].pk).name, "Объект 2")
+
+    def test_bulk_delete_ids(self):
+        objects = MockObject.objects.bulk_create(MockObject(name=f"Объект {i}") for i in range(3))
+        ids = [obj.pk for obj in objects[:2]] + [10 ** 9]
+        # SELECT ... FOR UPDATE, INSERT отметок и DELETE на пакет, завершающий SELECT
+        with self.assertQueryCount(6):
+            response = self.client.post(reverse("mock-object-bulk-delete"), {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"deleted": 2, "not_found": [10 ** 9]})
+        self.assertEqual(
+            sorted(MockObjectTombstone.objects.values_list("object_id", flat=True)), sorted(ids[:2])
+        )
+        self.assertTrue(MockObject.objects.filter(pk=objects[2].pk).exists())
+
+    def test_bulk_delete_filter(self):
+        MockObject.objects.bulk_create(MockObject(name=f"Загрузка {i}") for i in range(5))
+        response = self.client.post(
+            reverse("mock-object-bulk-delete"), {"name_startswith": "Загрузка"}, format="json"
+        )
+        self.assertEqual(response.json(), {"deleted": 5, "has_more": False})
+        self.assertEqual(list(MockObject.objects.values_list("pk", flat=True)), [self.object.pk])
+        self.assertEqual(MockObjectTombstone.objects.count(), 5)
+
+        response = self.client.post(reverse("mock-object-bulk-delete"), {}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_delete_filter_limit(self):
+        MockObject.objects.bulk_create(MockObject(name=f"Загрузка {i}") for i in range(5))
+        with mock.patch("mock_objects.views.BULK_MAX_ITEMS", 3):
+            response = self.client.post(
+                reverse("mock-object-bulk-delete"), {"name_startswith": "Загрузка"}, format="json"
+            )
+            self.assertEqual(response.json(), {"deleted": 3, "has_more": True})
+            response = self.client.post(
+                reverse("mock-object-bulk-delete"), {"name_startswith": "Загрузка"}, format="json"
+            )
+            self.assertEqual(response.json(), {"deleted": 2, "has_more": False})
+        self.assertEqual(MockObject.objects.count(), 1)
+
+    def test_bulk_permissions(self):
+        role = Role.objects.get(name="Тест")
+        role.permissions.remove(*role.permissions.filter(action__code="delete"))
+        bump_policy_version()
+        refresh = RbacRefreshToken.for_user(User.objects.get(email="user@example.com"))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        response = self.client.post(
+            reverse("mock-object-bulk-delete"), {"ids": [self.object.pk]}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse("mock-object-bulk"), [{"name": "Новый"}], format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_too_many(self):
+        rows = [{"name": "Объект"}] * (BULK_MAX_ITEMS + 1)
+        response = self.client.post(reverse("mock-object-bulk"), rows, format="json")
+        self.assertEqual(response.status_code, 400)
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import MockObjectViewSet
+from .views import MockObjectBulkViewSet, MockObjectViewSet
 
 urlpatterns = [
     path('objects/', MockObjectViewSet.as_view({'get': 'list', 'post': 'create'}), name='mock-object-list'),
+    path('objects/changes/', MockObjectViewSet.as_view({'get': 'changes'}), name='mock-object-changes'),
+    path('objects/bulk/', MockObjectBulkViewSet.as_view({'post': 'bulk_create', 'patch': 'bulk_update'}), name='mock-object-bulk'),
+    path('objects/bulk-delete/', MockObjectBulkViewSet.as_view({'post': 'bulk_delete'}), name='mock-object-bulk-delete'),
     path('objects/<int:pk>/', MockObjectViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='mock-object-detail'),
 ]
\ No newline at end of file
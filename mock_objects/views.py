@@ -1,10 +1,101 @@
-from rest_framework import viewsets, permissions
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import viewsets, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from backend.pagination import PaginationModeMixin
+from .bulk import bulk_create_objects, bulk_delete_objects, bulk_update_objects
 from .models import MockObject
-from .serializers import MockObjectSerializer
+from .serializers import BULK_MAX_ITEMS, MockObjectFilterSerializer, MockObjectSerializer
+from .sync import InvalidWatermark, WatermarkExpired, get_changes
+from rbac.authentication import PermissionClaimsJWTAuthentication
 from rbac.permissions import HasPermission
 
 
-class MockObjectViewSet(viewsets.ModelViewSet):
+class MockObjectViewSet(PaginationModeMixin, viewsets.ModelViewSet):
     queryset = MockObject.objects.all()
     serializer_class = MockObjectSerializer
+    authentication_classes = [PermissionClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated & HasPermission]
+    cursor_ordering = ("-created_at", "-id")
+
+    def changes(self, request):
+        """
+        Изменения после водяного знака ?since= (см. mock_objects.sync)
+
+        Без since отдаются все объекты. Клиент повторяет запрос с watermark
+        из ответа, пока has_more истинно. Устаревший знак - ошибка 410,
+        клиенту нужна полная загрузка.
+        """
+        try:
+            limit = int(request.query_params.get("limit", settings.MOCK_SYNC["PAGE_SIZE"]))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({"limit": _("Ожидается положительное целое число")})
+        limit = min(limit, settings.MOCK_SYNC["MAX_PAGE_SIZE"])
+
+        try:
+            changes = get_changes(request.query_params.get("since"), limit)
+        except InvalidWatermark:
+            raise ValidationError({"since": _("Неверный водяной знак")})
+        except WatermarkExpired:
+            return Response(
+                {"detail": _("Водяной знак устарел, выполните полную загрузку")},
+                status=status.HTTP_410_GONE,
+            )
+
+        changes["objects"] = self.get_serializer(changes["objects"], many=True).data
+        return Response(changes)
+
+
+class MockObjectBulkViewSet(MockObjectViewSet):
+    """
+    Массовые операции с объектами (см. mock_objects.bulk)
+
+    Права проверяются один раз на запрос, строки с ошибками пропускаются и
+    перечисляются в ответе. Количество SQL запросов растет с числом пакетов,
+    поэтому у операций отдельный бюджет.
+    """
+
+    query_budget = 100
+    # Массовое удаление выполняется POST запросом, но требует права на удаление
+    rbac_action_codes = {"bulk_delete": "delete"}
+
+    def _get_rows(self, request):
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get("objects")
+        if not isinstance(rows, list):
+            raise ValidationError({"objects": _("Ожидается список объектов")})
+        if len(rows) > BULK_MAX_ITEMS:
+            raise ValidationError(
+                {"objects": _("Не больше %(count)d объектов в запросе") % {"count": BULK_MAX_ITEMS}}
+            )
+        return rows
+
+    def bulk_create(self, request):
+        """Создание списка объектов"""
+        return Response(bulk_create_objects(self._get_rows(request)))
+
+    def bulk_update(self, request):
+        """Частичное изменение списка объектов; каждая строка содержит id"""
+        return Response(bulk_update_objects(self._get_rows(request)))
+
+    def bulk_delete(self, request):
+        """Удаление объектов по списку ids или условиям отбора"""
+        serializer = MockObjectFilterSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = MockObjectFilterSerializer.filter_queryset(MockObject.objects.all(), data)
+        # Удаление по условиям ограничено BULK_MAX_ITEMS объектами, как и
+        # список ids: иначе число пакетов, а с ним и запросов, не ограничено
+        # query_budget. Остаток удаляется повторным запросом (has_more).
+        deleted = bulk_delete_objects(queryset, limit=BULK_MAX_ITEMS)
+        result = {"deleted": len(deleted)}
+        if "ids" in data:
+            result["not_found"] = sorted(set(data["ids"]) - set(deleted))
+        else:
+            result["has_more"] = len(deleted) == BULK_MAX_ITEMS and queryset.exists()
+        return Response(result)
@@ -6,10 +6,7 @@ class RbacConfig(AppConfig):
     name = "rbac"
 
     def ready(self):
-        # Инициализация RBAC при запуске приложения
-        try:
-            from .utils import initialize_rbac
+        from . import signals  # noqa: F401
 
-            initialize_rbac()
-        except Exception as e:
-            print(f"Ошибка при инициализации RBAC: {e}")
+        # Базовые данные создаются миграцией 0005_seed_rbac или командой
+        # init_rbac; при старте процесса запросов к базе нет
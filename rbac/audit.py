@@ -0,0 +1,255 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP = "drop"
+OVERFLOW_SYNC = "sync"
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    """
+    Асинхронная пакетная запись аудит логов
+
+    Записи помещаются в ограниченную очередь процесса и сохраняются фоновым
+    потоком через bulk_create - по достижении размера пакета или по таймеру.
+
+    Поведение при переполнении очереди (overflow):
+    - block: запрос ждет освобождения места в очереди
+    - drop: запись отбрасывается, увеличивается счетчик dropped
+    - sync: запись сохраняется синхронно в потоке запроса
+
+    При завершении процесса очередь сбрасывается в базу данных (atexit).
+    """
+
+    def __init__(self, batch_size=500, flush_interval=1.0, queue_size=10000,
+                 overflow=OVERFLOW_SYNC):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP, OVERFLOW_SYNC):
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.written = 0
+        self.dropped = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def write(self, entry):
+        """Постановка несохраненного AuditLog в очередь записи"""
+        self._ensure_started()
+        if self.overflow == OVERFLOW_BLOCK:
+            self._queue.put(entry)
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if self.overflow == OVERFLOW_DROP:
+                with self._lock:
+                    self.dropped += 1
+            else:
+                with self._lock:
+                    self.fallbacks += 1
+                entry.save()
+
+    def flush(self):
+        """Ожидание записи всех поставленных в очередь логов"""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self, timeout=5.0):
+        """Сброс очереди и остановка фонового потока"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "written": self.written,
+                "dropped": self.dropped,
+                "fallbacks": self.fallbacks,
+            }
+
+    def _ensure_started(self):
+        # После fork (gunicorn --preload) поток родителя в дочернем процессе не существует
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = None
+
+            if entry is _STOP:
+                stopping = True
+                self._queue.task_done()
+            elif entry is not None:
+                batch.append(entry)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            expired = deadline is not None and time.monotonic() >= deadline
+            if batch and (stopping or expired or len(batch) >= self.batch_size):
+                self._save(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+                deadline = None
+
+        connection.close()
+
+    def _save(self, batch):
+        """
+        Сохранение пакета: bulk_create с одной повторной попыткой (разрыв
+        соединения и т.п.), затем по одной записи - ошибочная запись не
+        отбрасывает остальные записи пакета
+        """
+        for attempt in range(2):
+            close_old_connections()
+            try:
+                with transaction.atomic():
+                    AuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+            except Exception:
+                logger.warning(
+                    "Не удалось сохранить пакет аудит логов (%s записей, попытка %s)",
+                    len(batch), attempt + 1, exc_info=True,
+                )
+            else:
+                with self._lock:
+                    self.written += len(batch)
+                return
+
+        written = 0
+        for entry in batch:
+            try:
+                with transaction.atomic():
+                    entry.save(force_insert=True)
+            except Exception:
+                logger.exception("Не удалось сохранить аудит лог: %s %s", entry.action, entry.resource)
+            else:
+                written += 1
+        with self._lock:
+            self.written += written
+            self.dropped += len(batch) - written
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Общий для процесса экземпляр AuditLogWriter, настроенный из settings.AUDIT_LOG"""
+    global _writer
+
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                options = settings.AUDIT_LOG
+                _writer = AuditLogWriter(
+                    batch_size=options["BATCH_SIZE"],
+                    flush_interval=options["FLUSH_INTERVAL"],
+                    queue_size=options["QUEUE_SIZE"],
+                    overflow=options["OVERFLOW"],
+                )
+    return _writer
+
+
+def write_audit_log(**fields):
+    """
+    Запись аудит лога
+
+    При AUDIT_LOG["ASYNC"] запись передается фоновому потоку, иначе
+    сохраняется сразу.
+    """
+    entry = AuditLog(**fields)
+    if settings.AUDIT_LOG["ASYNC"]:
+        get_writer().write(entry)
+    else:
+        entry.save()
+    return entry
+
+
+_encoder = DjangoJSONEncoder()
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # datetime, Decimal, UUID и т.п. - в том же виде, что и в ответах API
+    return _encoder.default(value)
+
+
+def snapshot(instance, many_to_many=None):
+    """
+    Значения полей экземпляра для аудита без обращения к базе данных
+
+    Внешние ключи записываются идентификатором (resource_id), поля auto_now
+    пропускаются. Значения связей многие-ко-многим передаются явно
+    (many_to_many: имя -> первичные ключи), так как их чтение - отдельный запрос.
+    """
+    values = {
+        field.attname: _json_value(field.value_from_object(instance))
+        for field in instance._meta.concrete_fields
+        if not getattr(field, "auto_now", False)
+    }
+    for name, pks in (many_to_many or {}).items():
+        values[name] = sorted(pks)
+    return values
+
+
+def diff(before, after):
+    """
+    Измененные поля: имя -> [старое значение, новое значение]
+
+    Для связей многие-ко-многим записываются только изменения:
+    {"added": [...], "removed": [...]}.
+    """
+    changes = {}
+    for name, value in after.items():
+        old = before.get(name)
+        if old == value:
+            continue
+        if isinstance(old, list) and isinstance(value, list):
+            changes[name] = {
+                "added": sorted(set(value) - set(old)),
+                "removed": sorted(set(old) - set(value)),
+            }
+        else:
+            changes[name] = [old, value]
+    return changes
@@ -0,0 +1,37 @@
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import EpochJWTAuthentication, check_token_epoch
+from users.epochs import get_token_epoch
+
+from .tokens import has_trusted_claims
+
+
+class ClaimsUser(TokenUser):
+    """
+    Пользователь, восстановленный из прав в access токене
+
+    Не имеет представления в базе данных: содержит только id, флаги
+    is_staff/is_superuser и права RBAC из токена. Флаги читаются из базы при
+    выпуске каждого access токена, а неактивный пользователь новых токенов
+    не получает (см. RbacRefreshToken.refresh_user_flags).
+    """
+
+
+class PermissionClaimsJWTAuthentication(EpochJWTAuthentication):
+    """
+    JWT аутентификация без обращения к базе данных
+
+    Если токен содержит актуальные права RBAC (см. RBAC_TOKEN_CLAIMS),
+    возвращается ClaimsUser и таблицы CustomUser/UserRole не читаются.
+    Иначе выполняется обычная загрузка пользователя. Эпоха токенов
+    в обоих случаях сверяется с кэшем (см. users.epochs).
+    """
+
+    def get_user(self, validated_token):
+        if has_trusted_claims(validated_token):
+            check_token_epoch(
+                validated_token, get_token_epoch(validated_token[api_settings.USER_ID_CLAIM])
+            )
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
@@ -0,0 +1,141 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from backend.bulk import BULK_BATCH_SIZE, raw_delete
+
+from .cache import schedule_users_invalidation
+from .models import UserRole
+
+
+def _insert_user_roles(pairs):
+    """
+    INSERT связей с пропуском существующих
+
+    Returns:
+        set: id пользователей, для которых связь действительно добавлена
+
+    На PostgreSQL - INSERT ... ON CONFLICT DO NOTHING RETURNING: bulk_create с
+    ignore_conflicts не возвращает, какие строки вставлены. На других базах
+    существующие пары пакета выбираются перед вставкой по user_id IN и
+    role_id IN (без OR на каждую пару - SQLite ограничивает глубину выражения).
+    """
+    chunks = [
+        pairs[start:start + BULK_BATCH_SIZE] for start in range(0, len(pairs), BULK_BATCH_SIZE)
+    ]
+    if connection.vendor != "postgresql":
+        inserted = set()
+        for chunk in chunks:
+            existing = set(
+                UserRole.objects.filter(
+                    user_id__in={user_id for user_id, _ in chunk},
+                    role_id__in={role_id for _, role_id in chunk},
+                ).values_list("user_id", "role_id")
+            )
+            new_pairs = [pair for pair in chunk if pair not in existing]
+            UserRole.objects.bulk_create(
+                (UserRole(user_id=user_id, role_id=role_id) for user_id, role_id in new_pairs),
+                ignore_conflicts=True,
+            )
+            inserted.update(user_id for user_id, _ in new_pairs)
+        return inserted
+
+    quote = connection.ops.quote_name
+    columns = [UserRole._meta.get_field(name).column for name in ("user", "role", "created_at")]
+    created_at = UserRole._meta.get_field("created_at").get_db_prep_save(timezone.now(), connection)
+    inserted = set()
+    with connection.cursor() as cursor:
+        for chunk in chunks:
+            params = []
+            for user_id, role_id in chunk:
+                params.extend([user_id, role_id, created_at])
+            cursor.execute(
+                f"INSERT INTO {quote(UserRole._meta.db_table)} "
+                f"({', '.join(quote(column) for column in columns)}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT ({quote(columns[0])}, {quote(columns[1])}) DO NOTHING "
+                f"RETURNING {quote(columns[0])}",
+                params,
+            )
+            inserted.update(user_id for user_id, in cursor.fetchall())
+    return inserted
+
+
+def assign_roles(pairs):
+    """
+    Массовое назначение ролей
+
+    Args:
+        pairs: Итерируемые пары (user_id, role_id)
+
+    Returns:
+        set: id пользователей, которым добавлена хотя бы одна роль
+
+    Уже существующие связи пропускаются (ON CONFLICT DO NOTHING). Вставка
+    не отправляет сигналы, поэтому кэш прав сбрасывается одним вызовом
+    после фиксации транзакции.
+    """
+    pairs = list(set(pairs))
+    with transaction.atomic():
+        user_ids = _insert_user_roles(pairs) if pairs else set()
+        schedule_users_invalidation(user_ids)
+    return user_ids
+
+
+def assign_role_to_users(role, users):
+    """Назначение роли всем пользователям из queryset"""
+    user_ids = users.values_list("id", flat=True)
+    return assign_roles((user_id, role.pk) for user_id in user_ids)
+
+
+def assign_default_roles(user_ids, policy):
+    """
+    Назначение ролей по умолчанию новым пользователям одним INSERT
+
+    Роли берутся из скомпилированной политики (Role.is_default) без запроса.
+    Кэш прав не сбрасывается: для только что созданных пользователей в нем
+    ничего нет, а вызывающий код может сразу заполнить его маской
+    policy.mask_for_roles(policy.default_roles).
+    """
+    UserRole.objects.bulk_create(
+        [
+            UserRole(user_id=user_id, role_id=role_id)
+            for user_id in user_ids
+            for role_id in policy.default_roles
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def revoke_roles(pairs):
+    """
+    Массовый отзыв ролей одним DELETE
+
+    Returns:
+        tuple: (количество удаленных связей, id затронутых пользователей)
+    """
+    by_role = {}
+    for user_id, role_id in set(pairs):
+        by_role.setdefault(role_id, set()).add(user_id)
+    if not by_role:
+        return 0, set()
+
+    condition = Q()
+    for role_id, user_ids in by_role.items():
+        condition |= Q(role_id=role_id, user_id__in=user_ids)
+
+    user_ids = set().union(*by_role.values())
+    with transaction.atomic():
+        deleted = raw_delete(UserRole.objects.filter(condition))
+        schedule_users_invalidation(user_ids)
+    return deleted, user_ids
+
+
+def revoke_role_from_users(role, users):
+    """Отзыв роли у всех пользователей из queryset (DELETE с подзапросом)"""
+    assigned = UserRole.objects.filter(role=role, user__in=users.values("id"))
+    with transaction.atomic():
+        user_ids = set(assigned.values_list("user_id", flat=True))
+        deleted = raw_delete(assigned)
+        schedule_users_invalidation(user_ids)
+    return deleted, user_ids
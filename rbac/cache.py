@@ -0,0 +1,128 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import UserRole
+from .policy import get_policy_version
+
+USER_PERMISSIONS_KEY = "rbac:user_permissions:{version}:{user_id}"
+USER_STAMP_KEY = "rbac:user_stamp:{user_id}"
+
+
+class CacheStats:
+    """
+    Счетчики попаданий в кэш разрешений пользователей
+
+    Счетчики ведутся в пределах процесса и позволяют оценить долю проверок
+    прав, обслуженных без обращения к базе данных.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else None,
+        }
+
+
+stats = CacheStats()
+
+
+def _user_key(user_id, version):
+    return USER_PERMISSIONS_KEY.format(version=version, user_id=user_id)
+
+
+def get_user_permission_mask(user_id, policy):
+    """
+    Эффективная маска разрешений пользователя
+
+    Маска зависит от нумерации битов политики, поэтому ключ кэша включает
+    версию политики: при ее смене все записи устаревают автоматически.
+
+    Если отметка изменения ролей сменилась между чтением ролей и записью
+    маски, записанная маска удаляется: иначе сброс (invalidate_users) в это
+    время вернул бы в кэш маску с уже отозванной ролью.
+    """
+    key = _user_key(user_id, policy.version)
+    mask = cache.get(key)
+    if mask is not None:
+        stats.hit()
+        return mask
+
+    stats.miss()
+    stamp_key = USER_STAMP_KEY.format(user_id=user_id)
+    stamp = cache.get(stamp_key)
+    role_ids = UserRole.objects.filter(user_id=user_id).values_list("role_id", flat=True)
+    mask = policy.mask_for_roles(role_ids)
+    cache.set(key, mask, settings.RBAC_PERMISSION_CACHE_TIMEOUT)
+    if cache.get(stamp_key) != stamp:
+        cache.delete(key)
+    return mask
+
+
+def set_user_permission_mask(user_id, policy, mask):
+    """Заполнение кэша заранее известной маской (например, для нового пользователя)"""
+    cache.set(_user_key(user_id, policy.version), mask, settings.RBAC_PERMISSION_CACHE_TIMEOUT)
+
+
+def get_user_stamp(user_id):
+    """
+    Время последнего изменения ролей пользователя
+
+    Токены с правами, выпущенные раньше этого момента, считаются устаревшими.
+    Если отметка отсутствует в кэше (например, вытеснена), она выставляется
+    в текущее время - это консервативно отзывает ранее выпущенные права.
+    """
+    key = USER_STAMP_KEY.format(user_id=user_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, time.time(), timeout=None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def invalidate_users(user_ids):
+    """
+    Сброс кэша разрешений для набора пользователей одной операцией
+
+    Отметки обновляются до удаления масок: маску, прочитанную до сброса,
+    удаляет либо этот вызов, либо записавший ее get_user_permission_mask.
+    """
+    user_ids = set(user_ids)
+    version = get_policy_version()
+    now = time.time()
+    cache.set_many(
+        {USER_STAMP_KEY.format(user_id=user_id): now for user_id in user_ids},
+        timeout=None,
+    )
+    cache.delete_many([_user_key(user_id, version) for user_id in user_ids])
+
+
+def schedule_users_invalidation(user_ids):
+    """Сброс кэша разрешений пользователей после фиксации транзакции"""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: invalidate_users(user_ids))
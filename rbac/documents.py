@@ -0,0 +1,307 @@
+"""
+Политика RBAC как документ
+
+Формат документа (JSON или YAML):
+
+    {
+        "version": 1,
+        "actions": [{"code": "view", "name": "Просмотр", "description": ""}],
+        "resources": [{"name": "Профиль", "endpoint": "/api/users/profile/", "description": ""}],
+        "permissions": [["Профиль", "view"]],
+        "roles": [{"name": "Пользователь", "description": "", "is_default": true,
+                   "permissions": [["Профиль", "view"]]}]
+    }
+
+Действия идентифицируются кодом, ресурсы и роли - названием, разрешения -
+парой [название ресурса, код действия]. Разрешения, выданные ролям, можно не
+перечислять в "permissions" - они создаются автоматически.
+"""
+
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from backend.bulk import raw_delete
+
+from .models import Resource, Action, Permission, Role, UserRole
+from .policy import schedule_policy_bump
+
+DOCUMENT_VERSION = 1
+
+ACTION_FIELDS = ("name", "description")
+RESOURCE_FIELDS = ("endpoint", "description")
+ROLE_FIELDS = ("description", "is_default")
+
+
+class PolicyDocumentError(ValueError):
+    """Документ политики имеет неверную структуру или ссылки"""
+
+
+def export_policy():
+    """Выгрузка всей политики RBAC в документ (пять запросов)"""
+    resources = list(Resource.objects.order_by("name").values("id", "name", *RESOURCE_FIELDS))
+    actions = list(Action.objects.order_by("code").values("id", "code", *ACTION_FIELDS))
+    resource_names = {item.pop("id"): item["name"] for item in resources}
+    action_codes = {item.pop("id"): item["code"] for item in actions}
+
+    permission_keys = {
+        permission_id: [resource_names[resource_id], action_codes[action_id]]
+        for permission_id, resource_id, action_id in Permission.objects.values_list(
+            "id", "resource_id", "action_id"
+        )
+    }
+
+    grants = {}
+    for role_id, permission_id in Role.permissions.through.objects.values_list(
+        "role_id", "permission_id"
+    ):
+        grants.setdefault(role_id, []).append(permission_keys[permission_id])
+
+    roles = []
+    for role in Role.objects.order_by("name").values("id", "name", *ROLE_FIELDS):
+        role["permissions"] = sorted(grants.get(role.pop("id"), []))
+        roles.append(role)
+
+    return {
+        "version": DOCUMENT_VERSION,
+        "actions": actions,
+        "resources": resources,
+        "permissions": sorted(permission_keys.values()),
+        "roles": roles,
+    }
+
+
+def dump_document(document, fmt="json"):
+    if fmt == "yaml":
+        return _yaml().safe_dump(document, allow_unicode=True, sort_keys=False)
+    return json.dumps(document, ensure_ascii=False, indent=2)
+
+
+def load_document(text, fmt="json"):
+    try:
+        if fmt == "yaml":
+            return _yaml().safe_load(text)
+        return json.loads(text)
+    except ValueError as e:
+        raise PolicyDocumentError(f"Не удалось разобрать документ: {e}")
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise PolicyDocumentError("Для формата YAML требуется пакет PyYAML")
+    return yaml
+
+
+def _entries(document, section, key, fields):
+    """Проверка раздела документа и приведение к словарю {ключ: поля}"""
+    items = document.get(section, [])
+    if not isinstance(items, list):
+        raise PolicyDocumentError(f"Раздел {section} должен быть списком")
+
+    entries = {}
+    for item in items:
+        if not isinstance(item, dict) or not item.get(key):
+            raise PolicyDocumentError(f"Элемент раздела {section} без поля {key}: {item!r}")
+        if item[key] in entries:
+            raise PolicyDocumentError(f"Повторяющийся элемент раздела {section}: {item[key]}")
+        entries[item[key]] = item
+    return entries
+
+
+def _permission_key(value):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise PolicyDocumentError(
+            f"Разрешение задается парой [ресурс, действие], получено: {value!r}"
+        )
+    return tuple(value)
+
+
+def _changed(instance, data, fields, defaults):
+    """Перенос значений из документа; True, если объект изменился"""
+    changed = False
+    for field in fields:
+        value = data.get(field, defaults.get(field, ""))
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+
+def _sync(model, key, entries, fields, defaults, summary):
+    """
+    Создание и обновление справочника (Action/Resource/Role) по разделу документа
+
+    Returns:
+        dict: Значение ключа -> экземпляр модели
+    """
+    existing = {getattr(obj, key): obj for obj in model.objects.filter(**{f"{key}__in": entries})}
+    to_create = []
+    to_update = []
+    for value, data in entries.items():
+        obj = existing.get(value)
+        if obj is None:
+            obj = model(**{key: value})
+            _changed(obj, data, fields, defaults)
+            to_create.append(obj)
+        elif _changed(obj, data, fields, defaults):
+            to_update.append(obj)
+
+    model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, fields)
+    summary[model._meta.model_name].update(created=len(to_create), updated=len(to_update))
+
+    existing.update({getattr(obj, key): obj for obj in to_create})
+    return existing
+
+
+def _prune(action_entries, resource_entries, role_entries, permission_keys, summary):
+    """
+    Удаление объектов, которых нет в документе
+
+    Удаляется в порядке зависимостей одиночными DELETE без загрузки строк
+    (см. backend.bulk.raw_delete): каскад Collector с post_delete на каждое
+    разрешение занимал бы секунды на больших политиках. Назначения удаляемых
+    ролей тоже удаляются; кэш прав пользователей сбрасывается сменой версии политики.
+    """
+    stale_permissions = [
+        permission_id
+        for permission_id, resource_name, action_code in Permission.objects.values_list(
+            "id", "resource__name", "action__code"
+        )
+        if (resource_name, action_code) not in permission_keys
+    ]
+    stale_roles = list(Role.objects.exclude(name__in=role_entries).values_list("id", flat=True))
+
+    through = Role.permissions.through
+    raw_delete(
+        through.objects.filter(
+            Q(permission_id__in=stale_permissions) | Q(role_id__in=stale_roles)
+        )
+    )
+    raw_delete(UserRole.objects.filter(role_id__in=stale_roles))
+    summary["permission"]["deleted"] = raw_delete(
+        Permission.objects.filter(id__in=stale_permissions)
+    )
+    summary["role"]["deleted"] = raw_delete(Role.objects.filter(id__in=stale_roles))
+    summary["resource"]["deleted"] = raw_delete(
+        Resource.objects.exclude(name__in=resource_entries)
+    )
+    summary["action"]["deleted"] = raw_delete(Action.objects.exclude(code__in=action_entries))
+
+
+def apply_policy(document, prune=False, dry_run=False):
+    """
+    Применение документа политики одной транзакцией
+
+    Вычисляет разницу с текущим состоянием и применяет ее bulk-операциями:
+    bulk_create/bulk_update для справочников, разрешений и связей ролей.
+    При prune удаляются объекты, отсутствующие в документе.
+    Сигналы при bulk-операциях не отправляются, поэтому политика
+    инвалидируется один раз после фиксации транзакции.
+
+    Returns:
+        dict: Сводка изменений по каждой сущности
+    """
+    if not isinstance(document, dict):
+        raise PolicyDocumentError("Документ должен быть объектом")
+    if document.get("version", DOCUMENT_VERSION) != DOCUMENT_VERSION:
+        raise PolicyDocumentError(f"Поддерживается версия документа {DOCUMENT_VERSION}")
+
+    action_entries = _entries(document, "actions", "code", ACTION_FIELDS)
+    resource_entries = _entries(document, "resources", "name", RESOURCE_FIELDS)
+    role_entries = _entries(document, "roles", "name", ROLE_FIELDS)
+    for name, resource in resource_entries.items():
+        # Пустой endpoint совпал бы как префикс с любым маршрутом
+        endpoint = resource.get("endpoint")
+        if not isinstance(endpoint, str) or not endpoint.strip("/ "):
+            raise PolicyDocumentError(f"Ресурс {name} без endpoint")
+
+    role_grants = {
+        name: {_permission_key(value) for value in role.get("permissions", [])}
+        for name, role in role_entries.items()
+    }
+    permission_keys = {_permission_key(value) for value in document.get("permissions", [])}
+    permission_keys.update(*role_grants.values())
+    for resource_name, action_code in permission_keys:
+        if resource_name not in resource_entries or action_code not in action_entries:
+            raise PolicyDocumentError(
+                f"Разрешение ссылается на неизвестный ресурс или действие: "
+                f"[{resource_name}, {action_code}]"
+            )
+
+    summary = {
+        name: {"created": 0, "updated": 0, "deleted": 0}
+        for name in ("action", "resource", "role", "permission", "role_permissions")
+    }
+    try:
+        with transaction.atomic():
+            if prune:
+                _prune(action_entries, resource_entries, role_entries, permission_keys, summary)
+
+            actions = _sync(Action, "code", action_entries, ACTION_FIELDS, {}, summary)
+            resources = _sync(Resource, "name", resource_entries, RESOURCE_FIELDS, {}, summary)
+            roles = _sync(Role, "name", role_entries, ROLE_FIELDS, {"is_default": False}, summary)
+
+            permissions = _sync_permissions(permission_keys, resources, actions, summary)
+            _sync_grants(role_grants, roles, permissions, summary)
+
+            if dry_run:
+                transaction.set_rollback(True)
+            else:
+                schedule_policy_bump()
+    except IntegrityError as e:
+        # Например, новый ресурс с endpoint существующего ресурса под другим названием
+        raise PolicyDocumentError(f"Документ противоречит существующим данным: {e}")
+    return summary
+
+
+def _sync_permissions(keys, resources, actions, summary):
+    """Создание недостающих разрешений; возвращает (ресурс, действие) -> Permission"""
+    existing = {
+        (permission.resource.name, permission.action.code): permission
+        for permission in Permission.objects.select_related("resource", "action")
+    }
+    to_create = [
+        Permission(resource=resources[resource_name], action=actions[action_code])
+        for resource_name, action_code in keys - existing.keys()
+    ]
+    Permission.objects.bulk_create(to_create)
+    summary["permission"]["created"] = len(to_create)
+
+    existing.update(
+        ((permission.resource.name, permission.action.code), permission)
+        for permission in to_create
+    )
+    return existing
+
+
+def _sync_grants(role_grants, roles, permissions, summary):
+    """Приведение связей роль-разрешение к документу для описанных в нем ролей"""
+    through = Role.permissions.through
+    wanted = {
+        (roles[role_name].pk, permissions[key].pk)
+        for role_name, keys in role_grants.items()
+        for key in keys
+    }
+    managed = {roles[name].pk for name in role_grants}
+    current = {
+        (role_id, permission_id): pk
+        for pk, role_id, permission_id in through.objects.filter(role_id__in=managed).values_list(
+            "id", "role_id", "permission_id"
+        )
+    }
+
+    missing = wanted - current.keys()
+    extra = current.keys() - wanted
+    through.objects.bulk_create(
+        through(role_id=role_id, permission_id=permission_id)
+        for role_id, permission_id in missing
+    )
+    if extra:
+        # По id связей, а не OR по парам: глубина выражения в SQLite ограничена
+        raw_delete(through.objects.filter(id__in=[current[pair] for pair in extra]))
+    summary["role_permissions"].update(created=len(missing), deleted=len(extra))
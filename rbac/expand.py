@@ -0,0 +1,100 @@
+"""
+Параметр ?expand=: связанные данные в ответах без запроса на каждую строку
+
+Сериализатор объявляет дополнительные поля для каждой связи
+(expandable_fields), а представление - как эту связь загрузить
+(expand_related): через select_related или prefetch_related, а only()
+ограничивает выбираемые столбцы связанных таблиц. Количество запросов
+списка не зависит от размера страницы.
+
+    GET /api/rbac/permissions/?expand=resource,action
+"""
+
+import copy
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+EXPAND_PARAM = "expand"
+
+
+class ExpandableSerializerMixin:
+    """Поля expandable_fields[связь] добавляются, только если связь указана в context["expand"]"""
+
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.context.get("expand", ()):
+            for field_name, field in self.expandable_fields.get(name, {}).items():
+                fields[field_name] = copy.deepcopy(field)
+        return fields
+
+
+class Expand:
+    """
+    Загрузка связи для ?expand=
+
+    Args:
+        select_related: Связи для select_related
+        prefetch_related: Связи или объекты Prefetch для prefetch_related
+        only: Поля связанных моделей ("resource__name"); поля самой модели
+            выбираются все
+    """
+
+    def __init__(self, select_related=(), prefetch_related=(), only=()):
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+        self.only = only
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+class ExpandMixin:
+    """
+    Поддержка ?expand= в ViewSet
+
+    Связи применяются в filter_queryset, поэтому действуют и для списка, и
+    для get_object (retrieve, update). Неизвестная связь - ошибка 400.
+    """
+
+    expand_related = {}
+
+    def get_expand(self):
+        """Запрошенные связи в порядке указания"""
+        if not hasattr(self, "_expand"):
+            request = getattr(self, "request", None)
+            value = request.query_params.get(EXPAND_PARAM, "") if request is not None else ""
+            names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+            unknown = [name for name in names if name not in self.expand_related]
+            if unknown:
+                raise ValidationError(
+                    {
+                        EXPAND_PARAM: _("Неизвестные связи: %(unknown)s. Доступны: %(allowed)s")
+                        % {"unknown": ", ".join(unknown), "allowed": ", ".join(self.expand_related)}
+                    }
+                )
+            self._expand = names
+        return self._expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        only = []
+        for name in self.get_expand():
+            expand = self.expand_related[name]
+            queryset = expand.apply(queryset)
+            only.extend(expand.only)
+        if only:
+            own_fields = [field.name for field in queryset.model._meta.concrete_fields]
+            queryset = queryset.only(*own_fields, *only)
+        return queryset
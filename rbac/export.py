@@ -0,0 +1,60 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Поля выгрузки аудит логов: (имя в выгрузке, поле для values_list)
+EXPORT_FIELDS = (
+    ("id", "id"),
+    ("created_at", "created_at"),
+    ("user", "user_id"),
+    ("user_email", "user__email"),
+    ("action", "action"),
+    ("resource", "resource"),
+    ("details", "details"),
+    ("ip_address", "ip_address"),
+    ("user_agent", "user_agent"),
+)
+
+EXPORT_CHUNK_SIZE = 2000
+
+_names = [name for name, _ in EXPORT_FIELDS]
+
+
+def export_rows(queryset):
+    """
+    Строки выгрузки через серверный курсор
+
+    values_list не создает экземпляры моделей, а iterator() читает результат
+    порциями по EXPORT_CHUNK_SIZE, поэтому расход памяти не зависит от объема.
+    """
+    return queryset.values_list(*(field for _, field in EXPORT_FIELDS)).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+def iter_ndjson(rows):
+    """Выгрузка в формате NDJSON: один JSON объект на строку"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(_names, row))) + "\n"
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Выгрузка в формате CSV с заголовком; details сериализуется в JSON"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(_names)
+    created_index = _names.index("created_at")
+    details_index = _names.index("details")
+    for row in rows:
+        row = list(row)
+        row[created_index] = row[created_index].isoformat()
+        row[details_index] = json.dumps(row[details_index], ensure_ascii=False)
+        yield writer.writerow(row)
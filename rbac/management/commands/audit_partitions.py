@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rbac.partitions import (
+    add_months,
+    create_partition,
+    is_partitioned,
+    list_partitions,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    help = "Создание месячных секций таблицы аудит логов на несколько месяцев вперед"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead", type=int, default=3,
+            help="На сколько месяцев вперед создавать секции",
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("Таблица аудит логов не секционирована (требуется PostgreSQL)")
+
+        existing = {month for month, _ in list_partitions()}
+        current = month_start(timezone.now())
+        for offset in range(options["ahead"] + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                moved = create_partition(month)
+                self.stdout.write(f"Создана секция за {month:%Y-%m}")
+                if moved:
+                    self.stdout.write(f"Перенесено записей из секции DEFAULT: {moved}")
+        self.stdout.write(self.style.SUCCESS("Секции аудит логов актуальны"))
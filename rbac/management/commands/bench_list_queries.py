@@ -0,0 +1,118 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.querybudget import count_queries
+from rbac.models import Resource, Action, Permission, Role, UserRole
+from rbac.policy import bump_policy_version
+from rbac.views import PermissionViewSet, RoleViewSet, UserRoleViewSet
+
+User = get_user_model()
+
+# Эндпоинт, ?expand= и queryset без загрузки связей для сравнения
+ENDPOINTS = [
+    ("permissions", PermissionViewSet, "resource,action", lambda: Permission.objects.all()),
+    ("roles", RoleViewSet, "", lambda: Role.objects.all()),
+    ("roles", RoleViewSet, "permissions", lambda: Role.objects.all()),
+    ("user-roles", UserRoleViewSet, "user,role", lambda: UserRole.objects.all()),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Количество SQL запросов списков RBAC с ?expand= в зависимости от числа строк"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[10, 100, 1000],
+            help="Количество строк в ответе",
+        )
+        parser.add_argument(
+            "--permissions-per-role", type=int, default=5,
+            help="Количество разрешений каждой роли",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'rows':>6} {'endpoint':<34} {'SQL':>5} {'ms':>8} {'naive SQL':>10}"
+        )
+        for rows in options["rows"]:
+            try:
+                with transaction.atomic():
+                    self._bench(rows, options["permissions_per_role"])
+                    raise _Rollback
+            except _Rollback:
+                pass
+            bump_policy_version()
+
+    def _bench(self, rows, permissions_per_role):
+        admin = self._make_data(rows, permissions_per_role)
+        factory = APIRequestFactory()
+
+        for name, viewset, expand, naive_queryset in ENDPOINTS:
+            # Без пагинации: в ответе все строки
+            view = viewset.as_view({"get": "list"}, pagination_class=None)
+            request = factory.get(f"/api/rbac/{name}/", {"expand": expand} if expand else {})
+            force_authenticate(request, admin)
+
+            started = time.perf_counter()
+            with count_queries() as queries:
+                response = view(request)
+            elapsed = (time.perf_counter() - started) * 1000
+            assert response.status_code == 200, response.data
+
+            label = f"{name}/?expand={expand}" if expand else f"{name}/"
+            naive = self._naive_queries(viewset, naive_queryset(), expand)
+            self.stdout.write(
+                f"{rows:>6} {label:<34} {queries.count:>5} {elapsed:>8.1f} {naive:>10}"
+            )
+
+    def _naive_queries(self, viewset, queryset, expand):
+        """Запросы сериализации того же списка без select_related/prefetch_related"""
+        context = {"expand": [name for name in expand.split(",") if name]}
+        with count_queries() as queries:
+            viewset.serializer_class(queryset, many=True, context=context).data
+        return queries.count
+
+    def _make_data(self, rows, permissions_per_role):
+        suffix = uuid.uuid4().hex[:8]
+        admin = User.objects.create_superuser(
+            email=f"bench-{suffix}@example.com", password=None, first_name="Bench", last_name="Admin"
+        )
+        action, _ = Action.objects.get_or_create(code="view", defaults={"name": "Просмотр"})
+
+        # Оставляем в таблицах только данные замера
+        UserRole.objects.all().delete()
+        Permission.objects.all().delete()
+        Role.objects.all().delete()
+
+        resources = Resource.objects.bulk_create(
+            Resource(name=f"bench-{suffix}-{index}", endpoint=f"/bench/{suffix}/{index}/")
+            for index in range(rows)
+        )
+        permissions = Permission.objects.bulk_create(
+            Permission(resource=resource, action=action) for resource in resources
+        )
+        roles = Role.objects.bulk_create(
+            Role(name=f"bench-{suffix}-{index}") for index in range(rows)
+        )
+        Role.permissions.through.objects.bulk_create(
+            Role.permissions.through(role_id=role.pk, permission_id=permissions[(index + offset) % rows].pk)
+            for index, role in enumerate(roles)
+            for offset in range(min(permissions_per_role, rows))
+        )
+        users = User.objects.bulk_create(
+            User(email=f"bench-{suffix}-{index}@example.com", first_name="Bench", last_name="User")
+            for index in range(rows)
+        )
+        UserRole.objects.bulk_create(
+            UserRole(user=user, role=role) for user, role in zip(users, roles)
+        )
+        return admin
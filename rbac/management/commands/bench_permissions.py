@@ -0,0 +1,126 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIRequestFactory
+
+from rbac.models import Resource, Action, Permission, Role, UserRole
+from rbac.permissions import HasPermission
+from rbac.policy import METHOD_ACTIONS, bump_policy_version, get_policy
+
+User = get_user_model()
+
+BENCH_PATH = "/api/mock/objects/"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_has_permission(request):
+    """Прежняя реализация HasPermission (N+1 запрос на каждую проверку)"""
+    endpoint = resolve(request.path_info).route
+    action_code = METHOD_ACTIONS.get(request.method, "view")
+    try:
+        resource = Resource.objects.get(endpoint__icontains=endpoint)
+        action = Action.objects.get(code=action_code)
+        permission = Permission.objects.get(resource=resource, action=action)
+        for user_role in UserRole.objects.filter(user=request.user):
+            if permission in user_role.role.permissions.all():
+                return True
+    except (Resource.DoesNotExist, Action.DoesNotExist, Permission.DoesNotExist):
+        return True
+    return False
+
+
+class Command(BaseCommand):
+    help = "Микробенчмарк проверки прав: прежняя реализация против скомпилированной политики"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--roles", type=int, nargs="+", default=[10, 100, 1000],
+            help="Количество ролей пользователя",
+        )
+        parser.add_argument(
+            "--seconds", type=float, default=2.0,
+            help="Длительность замера для каждой реализации",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'roles':>6} {'legacy dec/s':>14} {'legacy SQL':>11} "
+            f"{'compiled dec/s':>15} {'compiled SQL':>13} {'speedup':>8}"
+        )
+        for roles in options["roles"]:
+            try:
+                with transaction.atomic():
+                    self._bench(roles, options["seconds"])
+                    raise _Rollback
+            except _Rollback:
+                pass
+            bump_policy_version()
+
+    def _bench(self, roles_count, seconds):
+        request = self._make_request(roles_count)
+        permission = HasPermission()
+
+        assert legacy_has_permission(request)
+        assert permission.has_permission(request, None)
+        get_policy()
+
+        legacy_rate, legacy_queries = self._measure(
+            lambda: legacy_has_permission(request), seconds
+        )
+        compiled_rate, compiled_queries = self._measure(
+            lambda: permission.has_permission(request, None), seconds
+        )
+        self.stdout.write(
+            f"{roles_count:>6} {legacy_rate:>14.0f} {legacy_queries:>11} "
+            f"{compiled_rate:>15.0f} {compiled_queries:>13} "
+            f"{compiled_rate / legacy_rate:>7.1f}x"
+        )
+
+    def _make_request(self, roles_count):
+        """Пользователь с N ролями, из которых нужное разрешение дает только последняя"""
+        suffix = uuid.uuid4().hex[:8]
+        action, _ = Action.objects.get_or_create(
+            code="view", defaults={"name": "Просмотр"}
+        )
+        resource, _ = Resource.objects.get_or_create(
+            endpoint=BENCH_PATH, defaults={"name": f"bench-{suffix}"}
+        )
+        permission, _ = Permission.objects.get_or_create(resource=resource, action=action)
+
+        user = User.objects.create_user(
+            email=f"bench-{suffix}@example.com", first_name="Bench", last_name="User"
+        )
+        roles = Role.objects.bulk_create(
+            Role(name=f"bench-{suffix}-{index}") for index in range(roles_count)
+        )
+        UserRole.objects.bulk_create(UserRole(user=user, role=role) for role in roles)
+        roles[-1].permissions.add(permission)
+        # Внутри транзакции on_commit не срабатывает - сбрасываем политику явно
+        bump_policy_version()
+
+        request = APIRequestFactory().get(BENCH_PATH)
+        request.user = user
+        return request
+
+    def _measure(self, decide, seconds):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            decide()
+        per_decision = len(queries)
+
+        decisions = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(10):
+                decide()
+            decisions += 10
+        return decisions / (time.perf_counter() - started), per_decision
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from rbac.documents import dump_document, export_policy
+
+
+class Command(BaseCommand):
+    help = "Выгрузка политики RBAC (ресурсы, действия, разрешения, роли) в документ"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", dest="fmt", choices=("json", "yaml"), default="json",
+            help="Формат документа",
+        )
+        parser.add_argument(
+            "--output", "-o",
+            help="Файл для записи; по умолчанию документ выводится в stdout",
+        )
+
+    def handle(self, *args, **options):
+        content = dump_document(export_policy(), options["fmt"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(content)
+            self.stdout.write(self.style.SUCCESS(f"Политика выгружена в {options['output']}"))
+        else:
+            self.stdout.write(content)
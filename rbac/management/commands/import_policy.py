@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rbac.documents import PolicyDocumentError, apply_policy, load_document
+
+
+class Command(BaseCommand):
+    help = "Применение документа политики RBAC одной транзакцией"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл документа (.json, .yaml или .yml)")
+        parser.add_argument(
+            "--format", dest="fmt", choices=("json", "yaml"),
+            help="Формат документа; по умолчанию определяется по расширению файла",
+        )
+        parser.add_argument(
+            "--replace", action="store_true",
+            help="Удалить ресурсы, действия, разрешения и роли, которых нет в документе",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать изменения без сохранения",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["fmt"]
+        if fmt is None:
+            extension = os.path.splitext(options["path"])[1].lower()
+            fmt = "yaml" if extension in (".yaml", ".yml") else "json"
+
+        with open(options["path"], encoding="utf-8") as f:
+            text = f.read()
+
+        try:
+            summary = apply_policy(
+                load_document(text, fmt),
+                prune=options["replace"],
+                dry_run=options["dry_run"],
+            )
+        except PolicyDocumentError as e:
+            raise CommandError(str(e))
+
+        for entity, changes in summary.items():
+            counts = ", ".join(f"{name}: {count}" for name, count in changes.items())
+            self.stdout.write(f"{entity}: {counts}")
+        if options["dry_run"]:
+            self.stdout.write("Изменения не сохранены (--dry-run)")
+        else:
+            self.stdout.write(self.style.SUCCESS("Политика применена"))
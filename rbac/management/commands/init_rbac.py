@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from rbac.utils import initialize_rbac
+
+
+class Command(BaseCommand):
+    help = "Создание базовых действий, ресурсов и ролей RBAC"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Выполнить создание без проверки, что данные уже есть",
+        )
+
+    def handle(self, *args, **options):
+        if initialize_rbac(force=options["force"]):
+            self.stdout.write(self.style.SUCCESS("RBAC система инициализирована"))
+        else:
+            self.stdout.write("Базовые данные RBAC уже созданы")
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rbac.models import AuditLog
+from rbac.partitions import (
+    add_months,
+    drop_partition,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    prune_default_partition,
+)
+
+
+class Command(BaseCommand):
+    help = "Удаление аудит логов старше заданного количества месяцев"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months", type=int, required=True,
+            help="Сколько полных месяцев логов хранить, не считая текущего",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Размер пакета DELETE для несекционированной таблицы",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать, что будет удалено",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = add_months(month_start(timezone.now()), -options["keep_months"])
+
+        if is_partitioned():
+            self._drop_partitions(cutoff, options["dry_run"])
+        else:
+            self._delete_rows(cutoff, options["batch_size"], options["dry_run"])
+
+    def _drop_partitions(self, cutoff, dry_run):
+        """Секции удаляются целиком: без построчного DELETE, WAL и VACUUM"""
+        for month, name in list_partitions():
+            if month >= cutoff:
+                continue
+            if dry_run:
+                self.stdout.write(f"Будет удалена секция {name}")
+                continue
+            drop_partition(name)
+            self.stdout.write(f"Удалена секция {name}")
+
+        # Записи вне месячных секций хранятся в DEFAULT и удаляются DELETE
+        count = prune_default_partition(cutoff, dry_run)
+        if dry_run:
+            self.stdout.write(f"Будет удалено записей из секции DEFAULT: {count}")
+            return
+        if count:
+            self.stdout.write(f"Удалено записей из секции DEFAULT: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Логи до {cutoff:%Y-%m} удалены"))
+
+    def _delete_rows(self, cutoff, batch_size, dry_run):
+        """Запасной вариант для СУБД без секционирования: DELETE пакетами по id"""
+        old_logs = AuditLog.objects.filter(created_at__lt=cutoff)
+        if dry_run:
+            self.stdout.write(f"Будет удалено записей: {old_logs.count()}")
+            return
+
+        deleted = 0
+        while True:
+            ids = list(old_logs.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += AuditLog.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Удалено записей: {deleted}"))
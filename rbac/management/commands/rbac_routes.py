@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from rbac.models import Resource
+from rbac.policy import CompiledPolicy, iter_url_routes
+
+
+class Command(BaseCommand):
+    help = "Показывает, к какому ресурсу RBAC относится каждый маршрут URLconf"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix", default="",
+            help="Показывать только маршруты с указанным префиксом, например api/",
+        )
+        parser.add_argument(
+            "--unmapped", action="store_true",
+            help="Показывать только маршруты без ресурса (доступ не ограничен)",
+        )
+
+    def handle(self, *args, **options):
+        policy = CompiledPolicy.load()
+        resources = {
+            resource.id: resource
+            for resource in Resource.objects.only("id", "name", "endpoint")
+        }
+
+        for route, pattern in iter_url_routes():
+            if not route.startswith(options["prefix"].lstrip("/")):
+                continue
+            resource = resources.get(policy.resource_for_route(route))
+            if resource is None:
+                target = self.style.WARNING("-")
+            elif options["unmapped"]:
+                continue
+            else:
+                target = f"{resource.name} ({resource.endpoint})"
+            name = pattern.name or ""
+            self.stdout.write(f"/{route:<55} {name:<28} {target}")
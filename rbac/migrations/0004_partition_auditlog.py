@@ -0,0 +1,135 @@
+"""
+Помесячное секционирование rbac_auditlog на PostgreSQL
+
+Таблица пересоздается как PARTITION BY RANGE (created_at) с первичным ключом
+(id, created_at), данные копируются, индексы и внешние ключи переносятся
+с прежними именами. Создаются секции с месяца самой старой записи до трех
+месяцев вперед и секция DEFAULT для записей вне диапазона. Дальнейшие секции
+создает команда audit_partitions. На других СУБД миграция ничего не делает.
+"""
+
+import re
+from datetime import date, timezone as dt_timezone
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = "rbac_auditlog"
+OLD_TABLE = "rbac_auditlog_unpartitioned"
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _move_indexes_and_constraints(cursor, source, target):
+    """Перенос внешних ключей и индексов (кроме первичного ключа) с source на target"""
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [source],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass AND NOT x.indisprimary
+        """,
+        [source],
+    )
+    indexes = cursor.fetchall()
+
+    for name, definition in constraints:
+        cursor.execute(f'ALTER TABLE "{source}" DROP CONSTRAINT "{name}"')
+        cursor.execute(f'ALTER TABLE "{target}" ADD CONSTRAINT "{name}" {definition}')
+    for name, definition in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+        definition = re.sub(
+            rf'\sON\s+(ONLY\s+)?(\S+\.)?"?{source}"?\s', f' ON "{target}" ', definition
+        )
+        cursor.execute(definition)
+
+
+def _swap_table(cursor):
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD_TABLE}"')
+    cursor.execute(
+        f'ALTER TABLE "{OLD_TABLE}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{OLD_TABLE}_pkey"'
+    )
+
+
+def _copy_rows(cursor):
+    cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{OLD_TABLE}"')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+        f'COALESCE((SELECT MAX(id) FROM "{TABLE}"), 0) + 1, false)'
+    )
+    cursor.execute(f'DROP TABLE "{OLD_TABLE}"')
+
+
+def partition_auditlog(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(created_at) FROM "{TABLE}"')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        _swap_table(cursor)
+
+        # Identity столбцы в секционированных таблицах поддерживаются не во всех
+        # версиях PostgreSQL, поэтому id получает значение из обычной последовательности
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{OLD_TABLE}" INCLUDING STORAGE) '
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f'CREATE SEQUENCE "{TABLE}_id_partitioned_seq" OWNED BY "{TABLE}".id')
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ALTER COLUMN id '
+            f"SET DEFAULT nextval('\"{TABLE}_id_partitioned_seq\"')"
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, created_at)')
+
+        oldest = timezone.localtime(oldest, dt_timezone.utc)
+        month = date(oldest.year, oldest.month, 1)
+        last = _add_months(date.today().replace(day=1), MONTHS_AHEAD)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [f"{month} 00:00:00+00", f"{_add_months(month, 1)} 00:00:00+00"],
+            )
+            month = _add_months(month, 1)
+        cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+        _move_indexes_and_constraints(cursor, OLD_TABLE, TABLE)
+        _copy_rows(cursor)
+
+
+def unpartition_auditlog(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        _swap_table(cursor)
+        cursor.execute(f'CREATE TABLE "{TABLE}" (LIKE "{OLD_TABLE}" INCLUDING STORAGE)')
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY'
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id)')
+        _move_indexes_and_constraints(cursor, OLD_TABLE, TABLE)
+        _copy_rows(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac', '0003_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditlog, unpartition_auditlog),
+    ]
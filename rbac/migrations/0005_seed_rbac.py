@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def seed(apps, schema_editor):
+    from rbac.utils import seed_rbac
+
+    seed_rbac(
+        apps.get_model("rbac", "Action"),
+        apps.get_model("rbac", "Resource"),
+        apps.get_model("rbac", "Permission"),
+        apps.get_model("rbac", "Role"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac', '0004_partition_auditlog'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
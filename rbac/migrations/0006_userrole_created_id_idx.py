@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbac', '0005_seed_rbac'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userrole',
+            index=models.Index(fields=['created_at', 'id'], name='rbac_userrole_created_id_idx'),
+        ),
+    ]
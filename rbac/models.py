@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
@@ -157,6 +158,10 @@ class UserRole(models.Model):
         verbose_name = _("user role")
         verbose_name_plural = _("user roles")
         unique_together = ["user", "role"]
+        indexes = [
+            # Keyset пагинация (?pagination=cursor)
+            models.Index(fields=["created_at", "id"], name="rbac_userrole_created_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.email} - {self.role.name}"
@@ -191,12 +196,22 @@ class AuditLog(models.Model):
     details = models.JSONField(_("details"), default=dict)
     ip_address = models.GenericIPAddressField(_("IP address"), null=True, blank=True)
     user_agent = models.TextField(_("user agent"), blank=True)
-    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    # Время события, а не вставки: записи сохраняются пакетами с задержкой
+    created_at = models.DateTimeField(_("created at"), default=timezone.now)
 
     class Meta:
         verbose_name = _("audit log")
         verbose_name_plural = _("audit logs")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="rbac_audit_user_created_idx"),
+            models.Index(
+                fields=["resource", "action", "created_at"],
+                name="rbac_audit_res_act_created_idx",
+            ),
+            # Keyset пагинация по (created_at, id) для полного списка
+            models.Index(fields=["created_at", "id"], name="rbac_audit_created_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.email if self.user else 'System'} - {self.action}"
@@ -0,0 +1,165 @@
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AuditLog
+
+TABLE = AuditLog._meta.db_table
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(value):
+    """Первое число месяца (UTC) для даты или datetime"""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value, dt_timezone.utc).date()
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def is_partitioned():
+    """Секционирована ли таблица аудит логов (только PostgreSQL)"""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            )
+            """,
+            [TABLE],
+        )
+        return cursor.fetchone()[0]
+
+
+def list_partitions():
+    """
+    Месячные секции таблицы аудит логов
+
+    Returns:
+        list: Пары (первое число месяца, имя секции), по возрастанию месяца
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+            """,
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions.append((date(int(match[1]), int(match[2]), 1), name))
+    return sorted(partitions)
+
+
+def default_partition():
+    """Имя секции DEFAULT таблицы аудит логов или None, если ее нет"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT d.relname FROM pg_partitioned_table pt
+            JOIN pg_class parent ON parent.oid = pt.partrelid
+            JOIN pg_class d ON d.oid = pt.partdefid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+            """,
+            [TABLE],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _month_range(month):
+    return [f"{month} 00:00:00+00", f"{add_months(month, 1)} 00:00:00+00"]
+
+
+def create_partition(month):
+    """
+    Создание секции за месяц, если она еще не существует
+
+    Если записи за месяц уже попали в секцию DEFAULT, PostgreSQL не дает
+    создать секцию. Тогда DEFAULT отсоединяется, записи месяца переносятся в
+    новую секцию, и DEFAULT присоединяется обратно - одной транзакцией; на это
+    время таблица аудит логов заблокирована.
+
+    Returns:
+        int: Количество записей, перенесенных из секции DEFAULT
+    """
+    quote = connection.ops.quote_name
+    bounds = _month_range(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        default = default_partition()
+        moved = False
+        if default is not None and month not in {existing for existing, _ in list_partitions()}:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {quote(default)} "
+                f"WHERE created_at >= %s AND created_at < %s)",
+                bounds,
+            )
+            moved = cursor.fetchone()[0]
+        if moved:
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(default)}")
+
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} "
+            f"PARTITION OF {quote(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+
+        if moved:
+            columns = ", ".join(quote(field.column) for field in AuditLog._meta.concrete_fields)
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {quote(default)} "
+                f"WHERE created_at >= %s AND created_at < %s RETURNING {columns}) "
+                f"INSERT INTO {quote(partition_name(month))} ({columns}) SELECT {columns} FROM moved",
+                bounds,
+            )
+            moved = cursor.rowcount
+            cursor.execute(
+                f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(default)} DEFAULT"
+            )
+    return int(moved)
+
+
+def prune_default_partition(before, dry_run=False):
+    """
+    Удаление из секции DEFAULT записей старше before
+
+    Returns:
+        int: Количество удаленных (при dry_run - подлежащих удалению) записей
+    """
+    default = default_partition()
+    if default is None:
+        return 0
+    operation = "SELECT count(*) FROM" if dry_run else "DELETE FROM"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"{operation} {connection.ops.quote_name(default)} WHERE created_at < %s",
+            [f"{before} 00:00:00+00"],
+        )
+        return cursor.fetchone()[0] if dry_run else cursor.rowcount
+
+
+def drop_partition(name):
+    """Удаление секции целиком - без построчного DELETE и раздувания таблицы"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
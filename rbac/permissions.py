@@ -1,6 +1,9 @@
 from rest_framework import permissions
 from django.urls import resolve
-from .models import Resource, Action, Permission, UserRole
+from .authentication import ClaimsUser
+from .cache import get_user_permission_mask
+from .policy import METHOD_ACTIONS, get_policy
+from .tokens import get_claims_permission_mask
 
 
 class HasPermission(permissions.BasePermission):
@@ -24,36 +27,37 @@ class HasPermission(permissions.BasePermission):
             return True
 
         # Получаем текущий эндпоинт
-        try:
-            resolved = resolve(request.path_info)
-            endpoint = f"{resolved.route}"
-        except Exception:
-            endpoint = request.path
-
-        # Определяем действие на основе HTTP метода
-        method_actions = {
-            "GET": "view",
-            "POST": "create",
-            "PUT": "edit",
-            "PATCH": "edit",
-            "DELETE": "delete",
-        }
-        action_code = method_actions.get(request.method, "view")
-
-        # Ищем разрешение
-        try:
-            resource = Resource.objects.get(endpoint__icontains=endpoint)
-            action = Action.objects.get(code=action_code)
-            permission = Permission.objects.get(resource=resource, action=action)
+        endpoint = self._get_route(request)
 
-            # Проверяем, есть ли у пользователя роль с таким разрешением
-            user_roles = UserRole.objects.filter(user=request.user)
-            for user_role in user_roles:
-                if permission in user_role.role.permissions.all():
-                    return True
+        # Определяем действие: явно заданное во view или на основе HTTP метода
+        action_code = getattr(view, "rbac_action_codes", {}).get(getattr(view, "action", None))
+        if action_code is None:
+            action_code = METHOD_ACTIONS.get(request.method, "view")
 
-        except (Resource.DoesNotExist, Action.DoesNotExist, Permission.DoesNotExist):
+        # Ищем разрешение в скомпилированной политике
+        policy = get_policy()
+        permission_bit = policy.permission_bit(endpoint, action_code)
+        if permission_bit is None:
             # Если для эндпоинта не настроены права - разрешаем доступ
             return True
 
-        return False
+        # Проверяем, есть ли у пользователя роль с таким разрешением
+        return bool(self._get_permission_mask(request.user, policy) & permission_bit)
+
+    def _get_permission_mask(self, user, policy):
+        """Маска разрешений пользователя: из токена, из кэша или из базы данных"""
+        if isinstance(user, ClaimsUser):
+            mask = get_claims_permission_mask(user.token, policy)
+            if mask is not None:
+                return mask
+        return get_user_permission_mask(user.pk, policy)
+
+    def _get_route(self, request):
+        """Шаблон маршрута текущего запроса"""
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is not None:
+            return resolver_match.route
+        try:
+            return resolve(request.path_info).route
+        except Exception:
+            return request.path
@@ -0,0 +1,212 @@
+import functools
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from .models import Resource, Action, Permission, Role
+
+POLICY_VERSION_KEY = "rbac:policy_version"
+
+# Соответствие HTTP методов действиям RBAC
+METHOD_ACTIONS = {
+    "GET": "view",
+    "POST": "create",
+    "PUT": "edit",
+    "PATCH": "edit",
+    "DELETE": "delete",
+}
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+class CompiledPolicy:
+    """
+    Скомпилированная политика RBAC
+
+    Неизменяемый снимок таблиц Resource/Action/Permission/Role в памяти процесса.
+    Каждому разрешению присваивается номер бита, а каждой роли - битовая маска
+    (int) ее разрешений, поэтому проверка доступа сводится к операции AND.
+
+    Поля:
+    - version: Версия политики, из которой собран снимок
+    - endpoints: Пары (префикс маршрута, id ресурса), от длинных к коротким
+    - routes: Шаблон маршрута из URLconf -> id ресурса (или None)
+    - actions: Код действия -> id действия
+    - bits: (id ресурса, id действия) -> битовая маска разрешения
+    - role_masks: id роли -> битовая маска разрешений роли
+    - default_roles: id ролей, назначаемых новым пользователям (Role.is_default)
+    """
+
+    __slots__ = ("version", "endpoints", "routes", "actions", "bits", "role_masks", "default_roles")
+
+    def __init__(
+        self, version, endpoints, actions, bits, role_masks, routes=(), default_roles=()
+    ):
+        self.version = version
+        self.endpoints = tuple(
+            sorted(
+                ((normalize_route(endpoint), resource_id) for endpoint, resource_id in endpoints),
+                key=lambda item: (-len(item[0]), item[0]),
+            )
+        )
+        self.actions = dict(actions)
+        self.bits = dict(bits)
+        self.role_masks = dict(role_masks)
+        self.default_roles = tuple(default_roles)
+        self.routes = {route: self.match_resource(route) for route in routes}
+
+    @classmethod
+    def load(cls, version=None):
+        """
+        Сборка политики из базы данных
+
+        Выполняет ровно пять запросов независимо от количества ролей и разрешений.
+        """
+        endpoints = [
+            (endpoint, resource_id)
+            for resource_id, endpoint in Resource.objects.values_list("id", "endpoint")
+        ]
+        actions = Action.objects.values_list("code", "id")
+
+        bits = {}
+        permission_bits = {}
+        permissions = Permission.objects.order_by("id").values_list(
+            "id", "resource_id", "action_id"
+        )
+        for index, (permission_id, resource_id, action_id) in enumerate(permissions):
+            bit = 1 << index
+            bits[(resource_id, action_id)] = bit
+            permission_bits[permission_id] = bit
+
+        role_masks = {}
+        grants = Role.permissions.through.objects.values_list("role_id", "permission_id")
+        for role_id, permission_id in grants:
+            role_masks[role_id] = role_masks.get(role_id, 0) | permission_bits[permission_id]
+
+        default_roles = Role.objects.filter(is_default=True).values_list("id", flat=True)
+
+        return cls(
+            version, endpoints, actions, bits, role_masks, url_routes(), default_roles
+        )
+
+    def match_resource(self, route):
+        """
+        Ресурс с самым длинным endpoint, являющимся префиксом маршрута
+
+        Например, маршрут "api/mock/objects/<int:pk>/" относится к ресурсу
+        с endpoint "/api/mock/objects/". Endpoint уникален, поэтому результат
+        детерминирован.
+        """
+        route = normalize_route(route)
+        for endpoint, resource_id in self.endpoints:
+            if route.startswith(endpoint):
+                return resource_id
+        return None
+
+    def resource_for_route(self, route):
+        """
+        Поиск ресурса по маршруту за O(1)
+
+        Индекс строится при сборке политики по всем маршрутам URLconf,
+        маршруты вне индекса сопоставляются по префиксу.
+        """
+        try:
+            return self.routes[route]
+        except KeyError:
+            return self.match_resource(route)
+
+    def permission_bit(self, route, action_code):
+        """
+        Битовая маска разрешения для маршрута и действия
+
+        Returns:
+            int | None: Маска разрешения или None, если права не настроены
+        """
+        resource_id = self.resource_for_route(route)
+        action_id = self.actions.get(action_code)
+        if resource_id is None or action_id is None:
+            return None
+        return self.bits.get((resource_id, action_id))
+
+    def mask_for_roles(self, role_ids):
+        """Объединенная маска разрешений набора ролей"""
+        mask = 0
+        for role_id in role_ids:
+            mask |= self.role_masks.get(role_id, 0)
+        return mask
+
+
+def normalize_route(route):
+    """Приведение endpoint/маршрута к виду шаблона URLconf (без ведущего "/")"""
+    return route.lstrip("^/").lower()
+
+
+def iter_url_routes(patterns=None, prefix=""):
+    """
+    Обход URLconf
+
+    Yields:
+        tuple: (шаблон маршрута в формате ResolverMatch.route, URLPattern)
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = URLResolver._join_route(prefix, str(pattern.pattern))
+        if isinstance(pattern, URLPattern):
+            yield route, pattern
+        elif isinstance(pattern, URLResolver):
+            yield from iter_url_routes(pattern.url_patterns, route)
+
+
+@functools.lru_cache(maxsize=None)
+def url_routes():
+    """Все шаблоны маршрутов проекта (URLconf разбирается один раз на процесс)"""
+    return tuple(route for route, _ in iter_url_routes())
+
+
+def get_policy_version():
+    """Текущая версия политики (хранится в кэше Django)"""
+    version = cache.get(POLICY_VERSION_KEY)
+    if version is None:
+        cache.add(POLICY_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(POLICY_VERSION_KEY)
+    return version
+
+
+def bump_policy_version():
+    """
+    Инвалидация политики во всех процессах
+
+    Версия строится на основе времени, поэтому после вытеснения ключа из кэша
+    старые значения не могут повториться.
+    """
+    cache.set(POLICY_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def schedule_policy_bump():
+    """Инвалидация политики после фиксации текущей транзакции"""
+    transaction.on_commit(bump_policy_version)
+
+
+def get_policy():
+    """
+    Актуальная скомпилированная политика процесса
+
+    В установившемся режиме не выполняет SQL запросов: политика
+    пересобирается только при изменении версии в кэше.
+    """
+    global _policy
+
+    version = get_policy_version()
+    policy = _policy
+    if policy is not None and policy.version == version:
+        return policy
+
+    with _policy_lock:
+        if _policy is None or _policy.version != version:
+            _policy = CompiledPolicy.load(version)
+        return _policy
@@ -1,9 +1,52 @@
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from .models import Resource, Action, Permission, Role, UserRole, AuditLog
+from .expand import ExpandableSerializerMixin
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
 
+# Максимальное количество элементов в одном массовом запросе
+BULK_MAX_ITEMS = 10000
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, загружаемый одним запросом (in_bulk) вместо запроса на каждый"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = []
+        for item in data:
+            if isinstance(item, bool) or not isinstance(item, (int, str)) or not str(item).isdigit():
+                self.child_relation.fail('incorrect_type', data_type=type(item).__name__)
+            pks.append(int(item))
+
+        objects = self.child_relation.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                self.child_relation.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        child_kwargs = {
+            key: value for key, value in kwargs.items()
+            if key not in MANY_RELATION_KWARGS
+        }
+        list_kwargs = {
+            key: value for key, value in kwargs.items()
+            if key in MANY_RELATION_KWARGS
+        }
+        list_kwargs['child_relation'] = cls(*args, **child_kwargs)
+        return BulkManyRelatedField(*args, **list_kwargs)
+
 
 class ResourceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,33 +62,70 @@ class ActionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class PermissionSerializer(serializers.ModelSerializer):
+class PermissionSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     resource = serializers.PrimaryKeyRelatedField(queryset=Resource.objects.all())
     action = serializers.PrimaryKeyRelatedField(queryset=Action.objects.all())
 
+    expandable_fields = {
+        'resource': {
+            'resource_name': serializers.CharField(source='resource.name', read_only=True),
+            'resource_endpoint': serializers.CharField(source='resource.endpoint', read_only=True),
+        },
+        'action': {
+            'action_name': serializers.CharField(source='action.name', read_only=True),
+            'action_code': serializers.CharField(source='action.code', read_only=True),
+        },
+    }
+
     class Meta:
         model = Permission
         fields = ['id', 'resource', 'action', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class RoleSerializer(serializers.ModelSerializer):
-    permissions = serializers.PrimaryKeyRelatedField(
+class ExpandedPermissionSerializer(serializers.ModelSerializer):
+    """Разрешение роли при ?expand=permissions"""
+
+    resource_name = serializers.CharField(source='resource.name', read_only=True)
+    action_code = serializers.CharField(source='action.code', read_only=True)
+
+    class Meta:
+        model = Permission
+        fields = ['id', 'resource', 'resource_name', 'action', 'action_code']
+        read_only_fields = fields
+
+
+class RoleSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    # Permission.__str__ обращается к ресурсу и действию (варианты выбора в browsable API)
+    permissions = BulkPrimaryKeyRelatedField(
         many=True,
-        queryset=Permission.objects.all(),
+        queryset=Permission.objects.select_related('resource', 'action'),
         required=False
     )
 
+    expandable_fields = {
+        'permissions': {
+            'permission_details': ExpandedPermissionSerializer(
+                source='permissions', many=True, read_only=True
+            ),
+        },
+    }
+
     class Meta:
         model = Role
         fields = ['id', 'name', 'description', 'permissions', 'is_default', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class UserRoleSerializer(serializers.ModelSerializer):
+class UserRoleSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
     role = serializers.PrimaryKeyRelatedField(queryset=Role.objects.all())
 
+    expandable_fields = {
+        'user': {'user_email': serializers.EmailField(source='user.email', read_only=True)},
+        'role': {'role_name': serializers.CharField(source='role.name', read_only=True)},
+    }
+
     class Meta:
         model = UserRole
         fields = ['id', 'user', 'role', 'created_at']
@@ -61,4 +141,78 @@ class AuditLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'user_email', 'ip_address', 'user_agent', 'created_at']
 
     def get_user_email(self, obj):
-        return obj.user.email if obj.user else None
\ No newline at end of file
+        return obj.user.email if obj.user else None
+
+class UserRolePairSerializer(serializers.Serializer):
+    user = serializers.IntegerField(min_value=1)
+    role = serializers.IntegerField(min_value=1)
+
+
+class UserFilterSerializer(serializers.Serializer):
+    """Отбор пользователей для массовых операций"""
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    email_domain = serializers.CharField(required=False)
+    is_active = serializers.BooleanField(required=False)
+    has_role = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(_('Необходимо указать хотя бы одно условие отбора'))
+        return attrs
+
+    @staticmethod
+    def filter_queryset(queryset, data):
+        """Применение проверенных условий отбора к queryset пользователей"""
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'email_domain' in data:
+            queryset = queryset.filter(email__iendswith='@' + data['email_domain'].lstrip('@'))
+        if 'is_active' in data:
+            queryset = queryset.filter(is_active=data['is_active'])
+        if 'has_role' in data:
+            queryset = queryset.filter(user_roles__role_id=data['has_role'])
+        return queryset
+
+
+class BulkUserRoleSerializer(serializers.Serializer):
+    """
+    Массовое назначение/отзыв ролей
+
+    Принимает либо список пар assignments [{"user": 1, "role": 2}, ...],
+    либо роль role и условие отбора пользователей filter.
+    """
+
+    assignments = serializers.ListField(
+        child=UserRolePairSerializer(), required=False, max_length=BULK_MAX_ITEMS
+    )
+    role = serializers.PrimaryKeyRelatedField(queryset=Role.objects.all(), required=False)
+    filter = UserFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        by_pairs = 'assignments' in attrs
+        by_filter = 'role' in attrs and 'filter' in attrs
+        if by_pairs == by_filter:
+            raise serializers.ValidationError(
+                _('Укажите либо assignments, либо role и filter')
+            )
+        if by_pairs:
+            attrs['pairs'] = self._validate_pairs(attrs['assignments'])
+        return attrs
+
+    def _validate_pairs(self, assignments):
+        """Проверка существования пользователей и ролей двумя запросами"""
+        pairs = {(item['user'], item['role']) for item in assignments}
+        user_ids = {user_id for user_id, _ in pairs}
+        role_ids = {role_id for _, role_id in pairs}
+        missing_users = user_ids - set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        missing_roles = role_ids - set(Role.objects.filter(id__in=role_ids).values_list('id', flat=True))
+
+        errors = {}
+        if missing_users:
+            errors['users'] = _('Пользователи не найдены: %s') % sorted(missing_users)
+        if missing_roles:
+            errors['roles'] = _('Роли не найдены: %s') % sorted(missing_roles)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return pairs
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from .models import Resource, Action, Permission, Role, UserRole
+from .cache import schedule_users_invalidation
+from .policy import schedule_policy_bump
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_policy(sender, **kwargs):
+    """Инвалидация скомпилированной политики при изменении таблиц RBAC"""
+    schedule_policy_bump()
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_role_permissions(sender, action, **kwargs):
+    """Инвалидация политики при изменении разрешений роли"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        schedule_policy_bump()
+
+
+@receiver(pre_save, sender=UserRole)
+def remember_previous_user(sender, instance, **kwargs):
+    """Запоминаем прежнего пользователя, если связь переназначается"""
+    instance._previous_user_id = None
+    if instance.pk:
+        instance._previous_user_id = (
+            UserRole.objects.filter(pk=instance.pk)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def invalidate_user_permissions(sender, instance, **kwargs):
+    """Сброс кэша разрешений пользователей, затронутых изменением роли"""
+    user_ids = {instance.user_id}
+    previous_user_id = getattr(instance, "_previous_user_id", None)
+    if previous_user_id:
+        user_ids.add(previous_user_id)
+    schedule_users_invalidation(user_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_claims(sender, instance, created, **kwargs):
+    """Отзыв прав в токенах при изменении пользователя (деактивация, флаги)"""
+    if not created:
+        schedule_users_invalidation([instance.pk])
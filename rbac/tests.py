@@ -1,3 +1,664 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from backend.testing import QueryCountTestCase
+from .audit import AuditLogWriter
+from .cache import get_user_permission_mask, invalidate_users
+from .models import Resource, Action, Permission, Role, UserRole, AuditLog
+from .partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    create_partition,
+    default_partition,
+    month_start,
+    partition_name,
+)
+from .policy import CompiledPolicy, get_policy
+from .tokens import RbacRefreshToken
+
+User = get_user_model()
+
+
+class RbacQueryCountTests(QueryCountTestCase):
+    """Количество SQL запросов эндпоинтов rbac/urls.py"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123", first_name="A", last_name="B"
+        )
+        self.client.force_authenticate(self.admin)
+        self.resource = Resource.objects.create(name="Тест", endpoint="/api/test/")
+        self.action = Action.objects.create(name="Тест", code="test")
+        self.permission = Permission.objects.create(resource=self.resource, action=self.action)
+        self.role = Role.objects.create(name="Тест")
+        self.role.permissions.add(self.permission)
+        self.users = User.objects.bulk_create(
+            User(email=f"user{i}@example.com", first_name="U", last_name="U") for i in range(12)
+        )
+
+    def _add_resources(self, count=12):
+        Resource.objects.bulk_create(
+            Resource(name=f"Ресурс {i}", endpoint=f"/api/test/{i}/") for i in range(count)
+        )
+
+    def _add_permissions(self):
+        actions = Action.objects.bulk_create(
+            Action(name=f"Действие {i}", code=f"action{i}") for i in range(12)
+        )
+        Permission.objects.bulk_create(
+            Permission(resource=self.resource, action=action) for action in actions
+        )
+        return actions
+
+    # Resources
+
+    def test_resource_list(self):
+        self.assertConstantQueries(
+            2, lambda: self.client.get(reverse("resource-list")), self._add_resources
+        )
+
+    def test_resource_create(self):
+        data = {"name": "Новый", "endpoint": "/api/new/"}
+        with self.assertQueryCount(4):
+            response = self.client.post(reverse("resource-list"), data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_resource_detail(self):
+        url = reverse("resource-detail", args=[self.resource.pk])
+        with self.assertQueryCount(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(5):
+            response = self.client.put(url, {"name": "Тест", "endpoint": "/api/test2/"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(3):
+            response = self.client.patch(url, {"description": "Описание"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_resource_delete(self):
+        url = reverse("resource-detail", args=[self.resource.pk])
+        with self.assertQueryCount(6, max_repeats=1):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    # Actions
+
+    def test_action_list(self):
+        self.assertConstantQueries(
+            2, lambda: self.client.get(reverse("action-list")), self._add_permissions
+        )
+
+    def test_action_create(self):
+        with self.assertQueryCount(4):
+            response = self.client.post(
+                reverse("action-list"), {"name": "Новое", "code": "new"}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_action_detail(self):
+        url = reverse("action-detail", args=[self.action.pk])
+        with self.assertQueryCount(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(5):
+            response = self.client.put(url, {"name": "Тест", "code": "test2"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(3):
+            response = self.client.patch(url, {"description": "Описание"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(6, max_repeats=1):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    # Permissions
+
+    def test_permission_list(self):
+        self.assertConstantQueries(
+            2, lambda: self.client.get(reverse("permission-list")), self._add_permissions
+        )
+
+    def test_permission_list_expand(self):
+        response = self.assertConstantQueries(
+            2,
+            lambda: self.client.get(reverse("permission-list"), {"expand": "resource,action"}),
+            self._add_permissions,
+        )
+        resources = dict(Resource.objects.values_list("id", "name"))
+        for row in response.json()["results"]:
+            self.assertEqual(row["resource_name"], resources[row["resource"]])
+
+    def test_expand_unknown(self):
+        response = self.client.get(reverse("permission-list"), {"expand": "roles"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_permission_create(self):
+        action = Action.objects.create(name="Новое", code="new")
+        data = {"resource": self.resource.pk, "action": action.pk}
+        with self.assertQueryCount(5):
+            response = self.client.post(reverse("permission-list"), data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_permission_detail(self):
+        url = reverse("permission-detail", args=[self.permission.pk])
+        with self.assertQueryCount(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = {"resource": self.resource.pk, "action": self.action.pk}
+        with self.assertQueryCount(5):
+            response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(5):
+            response = self.client.patch(url, {"action": self.action.pk}, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(4, max_repeats=1):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    # Roles
+
+    def test_role_list(self):
+        def grow():
+            actions = self._add_permissions()
+            permissions = Permission.objects.filter(action__in=actions)
+            for i in range(12):
+                Role.objects.create(name=f"Роль {i}").permissions.set(permissions)
+
+        self.assertConstantQueries(3, lambda: self.client.get(reverse("role-list")), grow)
+
+    def test_role_list_expand(self):
+        def grow():
+            actions = self._add_permissions()
+            permissions = Permission.objects.filter(action__in=actions)
+            for i in range(12):
+                Role.objects.create(name=f"Роль {i}").permissions.set(permissions)
+
+        response = self.assertConstantQueries(
+            3, lambda: self.client.get(reverse("role-list"), {"expand": "permissions"}), grow
+        )
+        for role in response.json()["results"]:
+            self.assertEqual(
+                [item["id"] for item in role["permission_details"]], role["permissions"]
+            )
+
+    def test_role_create(self):
+        self._add_permissions()
+        permissions = list(Permission.objects.values_list("id", flat=True))
+        data = {"name": "Новая", "permissions": permissions}
+        with self.assertQueryCount(8, max_repeats=1):
+            response = self.client.post(reverse("role-list"), data, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["permissions"]), len(permissions))
+
+    def test_role_detail(self):
+        url = reverse("role-detail", args=[self.role.pk])
+        with self.assertQueryCount(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(5):
+            response = self.client.patch(url, {"description": "Описание"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(6, max_repeats=1):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    # User roles
+
+    def test_user_role_list(self):
+        UserRole.objects.create(user=self.admin, role=self.role)
+
+        def grow():
+            UserRole.objects.bulk_create(UserRole(user=user, role=self.role) for user in self.users)
+
+        self.assertConstantQueries(2, lambda: self.client.get(reverse("user-role-list")), grow)
+
+    def test_user_role_list_expand(self):
+        UserRole.objects.create(user=self.admin, role=self.role)
+
+        def grow():
+            UserRole.objects.bulk_create(UserRole(user=user, role=self.role) for user in self.users)
+
+        response = self.assertConstantQueries(
+            2, lambda: self.client.get(reverse("user-role-list"), {"expand": "user,role"}), grow
+        )
+        row = response.json()["results"][0]
+        self.assertEqual(row["role_name"], "Тест")
+        self.assertTrue(row["user_email"].endswith("@example.com"))
+
+    def test_user_role_create(self):
+        data = {"user": self.users[0].pk, "role": self.role.pk}
+        with self.assertQueryCount(5):
+            response = self.client.post(reverse("user-role-list"), data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_user_role_detail(self):
+        user_role = UserRole.objects.create(user=self.users[0], role=self.role)
+        url = reverse("user-role-detail", args=[user_role.pk])
+        with self.assertQueryCount(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertQueryCount(3):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    def test_user_role_bulk_assign(self):
+        def assign():
+            return self.client.post(
+                reverse("user-role-bulk-assign"),
+                {"role": self.role.pk, "filter": {"email_domain": "example.com"}},
+                format="json",
+            )
+
+        def grow():
+            User.objects.bulk_create(
+                User(email=f"more{i}@example.com", first_name="U", last_name="U") for i in range(12)
+            )
+
+        # На других СУБД перед вставкой выбираются существующие связи пакета
+        expected = 6 if connection.vendor == "postgresql" else 7
+        response = self.assertConstantQueries(expected, assign, grow)
+        # Повторный запрос добавляет роль только новым пользователям
+        self.assertEqual(response.json()["users"], 12)
+        self.assertEqual(
+            UserRole.objects.filter(role=self.role).count(),
+            User.objects.filter(email__endswith="@example.com").count(),
+        )
+
+    def test_user_role_bulk_assign_many_pairs(self):
+        users = User.objects.bulk_create(
+            User(email=f"many{i}@example.com", first_name="U", last_name="U") for i in range(1000)
+        )
+        UserRole.objects.create(user=users[0], role=self.role)
+        pairs = [{"user": user.pk, "role": self.role.pk} for user in users]
+        response = self.client.post(
+            reverse("user-role-bulk-assign"), {"assignments": pairs}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"pairs": 1000, "users": 999})
+
+    def test_user_role_bulk_assign_pairs_existing(self):
+        UserRole.objects.create(user=self.users[0], role=self.role)
+        pairs = [{"user": user.pk, "role": self.role.pk} for user in self.users[:3]]
+        response = self.client.post(
+            reverse("user-role-bulk-assign"), {"assignments": pairs}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"pairs": 3, "users": 2})
+        self.assertEqual(UserRole.objects.filter(role=self.role).count(), 3)
+
+    def test_user_role_bulk_revoke(self):
+        pairs = [{"user": user.pk, "role": self.role.pk} for user in self.users]
+        with self.assertQueryCount(6, max_repeats=1):
+            response = self.client.post(
+                reverse("user-role-bulk-revoke"), {"assignments": pairs}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    # Audit logs
+
+    def _add_audit_logs(self):
+        # Старше окна EXPORT_SETTLE_SECONDS, чтобы попасть в выгрузку
+        created_at = timezone.now() - timedelta(minutes=5)
+        AuditLog.objects.bulk_create(
+            AuditLog(user=user, action="create", resource="test", created_at=created_at)
+            for user in self.users
+        )
+
+    def test_audit_log_list(self):
+        AuditLog.objects.create(user=self.admin, action="create", resource="test")
+        self.assertConstantQueries(
+            2, lambda: self.client.get(reverse("audit-log-list")), self._add_audit_logs
+        )
+
+    def test_audit_log_list_cursor(self):
+        self.assertConstantQueries(
+            1,
+            lambda: self.client.get(reverse("audit-log-list"), {"pagination": "cursor"}),
+            self._add_audit_logs,
+        )
+
+    def test_audit_log_detail(self):
+        self._add_audit_logs()
+        url = reverse("audit-log-detail", args=[AuditLog.objects.first().pk])
+        with self.assertQueryCount(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_audit_log_export(self):
+        def export():
+            response = self.client.get(reverse("audit-log-export"))
+            return b"".join(response.streaming_content)
+
+        self.assertConstantQueries(1, export, self._add_audit_logs)
+        self.assertEqual(len(export().splitlines()), len(self.users))
+
+    def test_audit_log_export_since(self):
+        now = timezone.now()
+        # id не совпадает с порядком времени: запись с меньшим id сохранена позже
+        late, first, second, fresh = AuditLog.objects.bulk_create(
+            AuditLog(action=action, resource="test", created_at=now - timedelta(seconds=age))
+            for action, age in (("late", 60), ("first", 120), ("second", 90), ("fresh", 1))
+        )
+
+        def export(since):
+            response = self.client.get(reverse("audit-log-export"), {"since": since})
+            self.assertEqual(response.status_code, 200)
+            lines = b"".join(response.streaming_content).splitlines()
+            return [json.loads(line)["action"] for line in lines]
+
+        self.assertEqual(export(first.pk), ["second", "late"])
+        # Свежая запись ждет окончания окна EXPORT_SETTLE_SECONDS
+        self.assertEqual(export(late.pk), [])
+        response = self.client.get(reverse("audit-log-export"), {"since": 10 ** 9})
+        self.assertEqual(response.status_code, 400)
+
+    def test_audit_log_export_since_other_user(self):
+        user = self.users[0]
+        created_at = timezone.now() - timedelta(minutes=5)
+        own, other = AuditLog.objects.bulk_create(
+            AuditLog(user=owner, action="create", resource="test", created_at=created_at)
+            for owner in (user, self.admin)
+        )
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse("audit-log-export"), {"since": own.pk})
+        self.assertEqual(response.status_code, 200)
+        # Запись другого пользователя не видна так же, как несуществующая
+        response = self.client.get(reverse("audit-log-export"), {"since": other.pk})
+        self.assertEqual(response.status_code, 400)
+
+    # Policy document and cache stats
+
+    def test_policy_export(self):
+        self.assertConstantQueries(
+            5, lambda: self.client.get(reverse("policy-document")), self._add_permissions
+        )
+
+    def test_policy_import_unchanged(self):
+        document = self.client.get(reverse("policy-document")).json()
+        with self.assertQueryCount(8, max_repeats=1):
+            response = self.client.post(reverse("policy-document"), document, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_permission_cache_stats(self):
+        with self.assertQueryCount(0):
+            response = self.client.get(reverse("permission-cache-stats"))
+        self.assertEqual(response.status_code, 200)
+
+
+class AuditLogWriterTests(QueryCountTestCase):
+    """Сохранение пакетов фоновым потоком записи аудит логов"""
+
+    def test_bad_entry_does_not_drop_batch(self):
+        writer = AuditLogWriter()
+        batch = [
+            AuditLog(action="create", resource="test"),
+            # NOT NULL нарушается на любой СУБД (длину varchar SQLite не проверяет)
+            AuditLog(action=None, resource="test"),
+            AuditLog(action="update", resource="test"),
+        ]
+        # Соединение теста открыто в транзакции и не должно закрываться
+        with mock.patch("rbac.audit.close_old_connections"), \
+                self.assertLogs("rbac.audit", level="WARNING"):
+            writer._save(batch)
+
+        self.assertEqual(
+            list(AuditLog.objects.order_by("id").values_list("action", flat=True)),
+            ["create", "update"],
+        )
+        self.assertEqual(writer.stats()["written"], 2)
+        self.assertEqual(writer.stats()["dropped"], 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "Секционирование только на PostgreSQL")
+class AuditPartitionTests(QueryCountTestCase):
+    """Секция DEFAULT при создании секций и удалении старых логов"""
+
+    def _partition_of(self, log):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {AuditLog._meta.db_table} WHERE id = %s",
+                [log.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_create_partition_moves_default_rows(self):
+        month = add_months(month_start(timezone.now()), 24)
+        log = AuditLog.objects.create(action="create", resource="test")
+        AuditLog.objects.filter(pk=log.pk).update(
+            created_at=datetime(month.year, month.month, 15, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(self._partition_of(log), DEFAULT_PARTITION)
+
+        self.assertEqual(create_partition(month), 1)
+
+        self.assertEqual(self._partition_of(log), partition_name(month))
+        self.assertEqual(default_partition(), DEFAULT_PARTITION)
+
+    def test_prune_default_rows(self):
+        log = AuditLog.objects.create(action="create", resource="test")
+        AuditLog.objects.filter(pk=log.pk).update(
+            created_at=datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(self._partition_of(log), DEFAULT_PARTITION)
+
+        call_command("prune_audit_logs", "--keep-months", "12", stdout=StringIO())
+
+        self.assertFalse(AuditLog.objects.filter(pk=log.pk).exists())
+
+
+class AuditDetailsTests(QueryCountTestCase):
+    """Содержимое AuditLog.details для изменений через API"""
+
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123", first_name="A", last_name="B"
+        )
+        self.client.force_authenticate(admin)
+        self.resource = Resource.objects.create(name="Тест", endpoint="/api/test/")
+        self.action = Action.objects.create(name="Тест", code="test")
+        self.permission = Permission.objects.create(resource=self.resource, action=self.action)
+
+    def test_update_logs_changed_fields(self):
+        url = reverse("resource-detail", args=[self.resource.pk])
+        self.client.patch(url, {"description": "Описание", "name": "Тест"}, format="json")
+        log = AuditLog.objects.get(action="update")
+        self.assertEqual(
+            log.details, {"id": self.resource.pk, "changes": {"description": ["", "Описание"]}}
+        )
+
+        # Запрос без изменений не записывается
+        self.client.patch(url, {"name": "Тест"}, format="json")
+        self.assertEqual(AuditLog.objects.filter(action="update").count(), 1)
+
+    def test_role_permissions_diff(self):
+        role = Role.objects.create(name="Тест")
+        other = Permission.objects.create(
+            resource=self.resource, action=Action.objects.create(name="Другое", code="other")
+        )
+        role.permissions.add(self.permission)
+
+        url = reverse("role-detail", args=[role.pk])
+        self.client.patch(url, {"permissions": [other.pk]}, format="json")
+        log = AuditLog.objects.get(action="update")
+        self.assertEqual(
+            log.details["changes"],
+            {"permissions": {"added": [other.pk], "removed": [self.permission.pk]}},
+        )
+
+    def test_delete_logs_snapshot(self):
+        url = reverse("permission-detail", args=[self.permission.pk])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Permission.objects.filter(pk=self.permission.pk).exists())
+        log = AuditLog.objects.get(action="delete")
+        self.assertEqual(log.details["resource_id"], self.resource.pk)
+        self.assertEqual(log.details["action_id"], self.action.pk)
+
+
+class PolicyDocumentTests(QueryCountTestCase):
+    """Доступ к документу политики и проверка документа"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password123", first_name="A", last_name="B"
+        )
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password123", first_name="U", last_name="U"
+        )
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse("policy-document")).status_code, 403)
+        response = self.client.post(
+            reverse("policy-document") + "?mode=replace", {"version": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Role.objects.exists())
+
+    def test_resource_without_endpoint(self):
+        self.client.force_authenticate(self.admin)
+        document = self.client.get(reverse("policy-document")).json()
+        document["resources"].append({"name": "Без endpoint"})
+        response = self.client.post(reverse("policy-document"), document, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Resource.objects.filter(name="Без endpoint").exists())
+
+    def test_import_audit_resource(self):
+        self.client.force_authenticate(self.admin)
+        document = self.client.get(reverse("policy-document")).json()
+        response = self.client.post(reverse("policy-document"), document, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AuditLog.objects.get(action="import").resource, "policy")
+
+    def test_import_revokes_many_grants(self):
+        resources = Resource.objects.bulk_create(
+            Resource(name=f"Ресурс {i}", endpoint=f"/api/many/{i}/") for i in range(300)
+        )
+        permissions = Permission.objects.bulk_create(
+            Permission(resource=resource, action=action)
+            for resource in resources
+            for action in Action.objects.all()
+        )
+        role = Role.objects.create(name="Много прав")
+        role.permissions.set(permissions)
+
+        self.client.force_authenticate(self.admin)
+        document = self.client.get(reverse("policy-document")).json()
+        for entry in document["roles"]:
+            if entry["name"] == role.name:
+                entry["permissions"] = []
+        response = self.client.post(reverse("policy-document"), document, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(role.permissions.exists())
+
+
+class PolicyPermissionTests(QueryCountTestCase):
+    """
+    Проверка прав пользователя без прав суперпользователя через
+    скомпилированную политику: биты разрешений, маски ролей и ресурс с самым
+    длинным подходящим endpoint
+    """
+
+    def setUp(self):
+        super().setUp()
+        actions = {action.code: action for action in Action.objects.all()}
+        # Общий ресурс для всего API RBAC без прав у роли и ресурс ролей
+        # с правом только на просмотр
+        rbac = Resource.objects.create(name="RBAC", endpoint="/api/rbac/")
+        roles = Resource.objects.create(name="Роли", endpoint="/api/rbac/roles/")
+        Permission.objects.bulk_create(
+            Permission(resource=resource, action=action)
+            for resource in (rbac, roles)
+            for action in actions.values()
+        )
+        self.view_roles = Permission.objects.get(resource=roles, action=actions["view"])
+        self.delete_roles = Permission.objects.get(resource=roles, action=actions["delete"])
+        self.role = Role.objects.create(name="Читатель ролей")
+        self.role.permissions.add(self.view_roles)
+
+        self.user = User.objects.create_user(
+            email="reader@example.com", password="password123", first_name="R", last_name="R"
+        )
+        UserRole.objects.create(user=self.user, role=self.role)
+        refresh = RbacRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.detail_url = reverse("role-detail", args=[self.role.pk])
+
+    def test_allow_and_deny(self):
+        self.assertEqual(self.client.get(reverse("role-list")).status_code, 200)
+        self.assertEqual(
+            self.client.post(reverse("role-list"), {"name": "Новая"}, format="json").status_code, 403
+        )
+        # Маршрут "api/rbac/roles/<int:pk>/" относится к ресурсу по префиксу
+        self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+        self.assertEqual(self.client.delete(self.detail_url).status_code, 403)
+        # Более короткий endpoint "/api/rbac/" закрывает остальные маршруты
+        self.assertEqual(self.client.get(reverse("action-list")).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse("action-detail", args=[Action.objects.first().pk])).status_code,
+            403,
+        )
+        # Маршрут без подходящего ресурса не ограничивается
+        self.assertEqual(self.client.get(reverse("mock-object-list")).status_code, 200)
+
+    def test_grant_and_revoke(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.add(self.delete_roles)
+        other = Role.objects.create(name="Другая")
+        self.assertEqual(self.client.delete(reverse("role-detail", args=[other.pk])).status_code, 204)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserRole.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(self.detail_url).status_code, 403)
+
+    def test_invalidation_during_miss(self):
+        policy = get_policy()
+        mask_for_roles = CompiledPolicy.mask_for_roles
+
+        def revoke_while_reading(policy, role_ids):
+            # Роли прочитаны до отзыва, сброс кэша выполняется до записи маски
+            mask = mask_for_roles(policy, list(role_ids))
+            UserRole.objects.filter(user=self.user).delete()
+            invalidate_users([self.user.pk])
+            return mask
+
+        with mock.patch.object(
+            CompiledPolicy, "mask_for_roles", autospec=True, side_effect=revoke_while_reading
+        ):
+            self.assertTrue(get_user_permission_mask(self.user.pk, policy))
+        self.assertEqual(get_user_permission_mask(self.user.pk, policy), 0)
+
+    def test_compiled_policy(self):
+        policy = get_policy()
+        view_bit = policy.permission_bit("api/rbac/roles/<int:pk>/", "view")
+        self.assertIsNotNone(view_bit)
+        self.assertEqual(view_bit, policy.permission_bit("api/rbac/roles/", "view"))
+        self.assertNotEqual(view_bit, policy.permission_bit("api/rbac/actions/", "view"))
+        self.assertIsNone(policy.permission_bit("api/mock/objects/", "view"))
+        self.assertIsNone(policy.permission_bit("api/rbac/roles/", "unknown"))
+
+        mask = policy.mask_for_roles([self.role.pk])
+        self.assertTrue(mask & view_bit)
+        self.assertFalse(mask & policy.permission_bit("api/rbac/roles/", "delete"))
+        self.assertEqual(policy.mask_for_roles([]), 0)
+
+    def test_detail_queries(self):
+        warm = self.client.get(self.detail_url)
+        self.assertEqual(warm.status_code, 200)
+        # Пользователь, политика и маска прав - из кэша; запрос роли и ее разрешений
+        with self.assertQueryCount(2):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        policy = get_policy()
+        self.assertEqual(
+            get_user_permission_mask(self.user.pk, policy), policy.mask_for_roles([self.role.pk])
+        )
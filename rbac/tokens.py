@@ -0,0 +1,126 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.blacklist import is_token_blacklisted
+from users.epochs import TOKEN_EPOCH_CLAIM, get_token_epoch, token_epoch_matches
+
+from .cache import get_user_permission_mask, get_user_stamp, stats
+from .policy import get_policy, get_policy_version
+
+POLICY_VERSION_CLAIM = "rbac_pv"
+PERMISSIONS_CLAIM = "rbac_perms"
+ISSUED_AT_CLAIM = "rbac_at"
+
+
+def add_permission_claims(token, user_id):
+    """
+    Добавление прав пользователя в токен
+
+    В токен записываются версия политики, маска разрешений (hex) и точное
+    время выпуска прав. Отметка изменения ролей пользователя фиксируется до
+    времени выпуска, а маска читается после него, поэтому любое последующее
+    изменение ролей сделает права в токене недействительными.
+    """
+    get_user_stamp(user_id)
+    issued_at = time.time()
+    policy = get_policy()
+    token[POLICY_VERSION_CLAIM] = policy.version
+    token[PERMISSIONS_CLAIM] = format(get_user_permission_mask(user_id, policy), "x")
+    token[ISSUED_AT_CLAIM] = issued_at
+    return token
+
+
+def has_trusted_claims(token):
+    """
+    Можно ли доверять правам из токена без обращения к базе данных
+
+    Права действительны, пока не сменилась версия политики и роли
+    пользователя не менялись после выпуска токена.
+    """
+    if POLICY_VERSION_CLAIM not in token:
+        return False
+    if token[POLICY_VERSION_CLAIM] != get_policy_version():
+        return False
+    user_id = token[api_settings.USER_ID_CLAIM]
+    return token.get(ISSUED_AT_CLAIM, 0) >= get_user_stamp(user_id)
+
+
+def get_claims_permission_mask(token, policy):
+    """
+    Маска разрешений из токена
+
+    Returns:
+        int | None: Маска или None, если токен выпущен для другой версии политики
+    """
+    if token.get(POLICY_VERSION_CLAIM) != policy.version:
+        return None
+    stats.hit()
+    return int(token[PERMISSIONS_CLAIM], 16)
+
+
+class RbacRefreshToken(RefreshToken):
+    """
+    Refresh токен с правами RBAC в access токенах
+
+    При включенной настройке RBAC_TOKEN_CLAIMS каждый выпускаемый access токен
+    (при логине и при обновлении) содержит актуальные права пользователя.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # Копируется и в access токены (см. users.epochs)
+        token[TOKEN_EPOCH_CLAIM] = user.token_epoch
+        if settings.RBAC_TOKEN_CLAIMS:
+            token["is_staff"] = user.is_staff
+            token["is_superuser"] = user.is_superuser
+        return token
+
+    def refresh_user_flags(self):
+        """
+        Проверка пользователя перед выпуском access токена по refresh токену
+
+        Флаги читаются из базы данных, а не из refresh токена: иначе
+        деактивированный или лишенный прав администратора пользователь
+        продолжал бы получать токены с прежними флагами, в том числе после
+        ротации. Новые значения записываются в refresh токен и копируются в
+        access токен.
+
+        Raises:
+            TokenError: Если пользователь удален или неактивен
+        """
+        flags = (
+            get_user_model().objects.filter(pk=self[api_settings.USER_ID_CLAIM])
+            .values("is_active", "is_staff", "is_superuser")
+            .first()
+        )
+        if flags is None or not flags["is_active"]:
+            raise TokenError(_("Пользователь неактивен или удален"))
+        if settings.RBAC_TOKEN_CLAIMS:
+            self["is_staff"] = flags["is_staff"]
+            self["is_superuser"] = flags["is_superuser"]
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        epoch = get_token_epoch(self.payload[api_settings.USER_ID_CLAIM])
+        if not token_epoch_matches(self.payload, epoch):
+            raise TokenError(_("Токен отозван"))
+
+    def check_blacklist(self):
+        # Проверка по фильтру в памяти вместо запроса к BlacklistedToken (см. users.blacklist)
+        if is_token_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if settings.RBAC_TOKEN_CLAIMS:
+            access.set_iat()
+            add_permission_claims(access, self[api_settings.USER_ID_CLAIM])
+        return access
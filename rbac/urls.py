@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ResourceViewSet, ActionViewSet, PermissionViewSet, RoleViewSet, UserRoleViewSet, AuditLogViewSet
+from .views import ResourceViewSet, ActionViewSet, PermissionViewSet, RoleViewSet, UserRoleViewSet, AuditLogViewSet, PermissionCacheStatsView, PolicyDocumentView
 
 urlpatterns = [
     # Resources
@@ -20,9 +20,18 @@ urlpatterns = [
     
     # User Roles
     path('user-roles/', UserRoleViewSet.as_view({'get': 'list', 'post': 'create'}), name='user-role-list'),
+    path('user-roles/bulk-assign/', UserRoleViewSet.as_view({'post': 'bulk_assign'}), name='user-role-bulk-assign'),
+    path('user-roles/bulk-revoke/', UserRoleViewSet.as_view({'post': 'bulk_revoke'}), name='user-role-bulk-revoke'),
     path('user-roles/<int:pk>/', UserRoleViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='user-role-detail'),
     
     # Audit Logs
     path('audit-logs/', AuditLogViewSet.as_view({'get': 'list'}), name='audit-log-list'),
+    path('audit-logs/export/', AuditLogViewSet.as_view({'get': 'export'}), name='audit-log-export'),
     path('audit-logs/<int:pk>/', AuditLogViewSet.as_view({'get': 'retrieve'}), name='audit-log-detail'),
+
+    # Policy document
+    path('policy/', PolicyDocumentView.as_view(), name='policy-document'),
+
+    # Permission cache
+    path('permission-cache/stats/', PermissionCacheStatsView.as_view(), name='permission-cache-stats'),
 ]
\ No newline at end of file
@@ -1,75 +1,138 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+
 from .models import Resource, Action, Permission, Role
+from .policy import schedule_policy_bump
+
+# Базовые данные RBAC
+SEED_ACTIONS = [
+    {"name": "Просмотр", "code": "view", "description": "Просмотр ресурса"},
+    {
+        "name": "Создание",
+        "code": "create",
+        "description": "Создание нового ресурса",
+    },
+    {
+        "name": "Редактирование",
+        "code": "edit",
+        "description": "Редактирование ресурса",
+    },
+    {"name": "Удаление", "code": "delete", "description": "Удаление ресурса"},
+]
+
+SEED_RESOURCES = [
+    {
+        "name": "Пользователи",
+        "endpoint": "/api/users/",
+        "description": "Управление пользователями",
+    },
+    {
+        "name": "Профиль",
+        "endpoint": "/api/users/profile/",
+        "description": "Профиль пользователя",
+    },
+    {
+        "name": "Аутентификация",
+        "endpoint": "/api/auth/",
+        "description": "Аутентификация и регистрация",
+    },
+]
+
+SEED_ROLES = [
+    {
+        "name": "Администратор",
+        "description": "Полный доступ ко всем функциям",
+        "is_default": False,
+    },
+    {"name": "Пользователь", "description": "Базовый доступ", "is_default": True},
+    {
+        "name": "Менеджер",
+        "description": "Доступ к управлению контентом",
+        "is_default": False,
+    },
+]
+
+ADMIN_ROLE = "Администратор"
+
+SEED_FINGERPRINT = hashlib.sha256(
+    json.dumps([SEED_ACTIONS, SEED_RESOURCES, SEED_ROLES], sort_keys=True).encode()
+).hexdigest()[:16]
+
+SEEDED_CACHE_KEY = f"rbac:seeded:{SEED_FINGERPRINT}"
+
+
+def seed_rbac(Action, Resource, Permission, Role):
+    """
+    Создание базовых данных RBAC набором bulk-запросов
+
+    Принимает классы моделей, чтобы работать и в миграции (исторические
+    модели), и в коде приложения. Существующие строки не изменяются
+    (ON CONFLICT DO NOTHING), поэтому повторный запуск безопасен.
+    Администратор получает разрешения на все действия над всеми ресурсами.
+    """
+    Action.objects.bulk_create([Action(**data) for data in SEED_ACTIONS], ignore_conflicts=True)
+    Resource.objects.bulk_create(
+        [Resource(**data) for data in SEED_RESOURCES], ignore_conflicts=True
+    )
+    Role.objects.bulk_create([Role(**data) for data in SEED_ROLES], ignore_conflicts=True)
+
+    action_ids = list(Action.objects.values_list("id", flat=True))
+    Permission.objects.bulk_create(
+        [
+            Permission(resource_id=resource_id, action_id=action_id)
+            for resource_id in Resource.objects.values_list("id", flat=True)
+            for action_id in action_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+    admin_role = Role.objects.get(name=ADMIN_ROLE)
+    admin_role.permissions.add(*Permission.objects.values_list("id", flat=True))
+
+
+def is_seeded():
+    """
+    Проверка, что базовые данные уже созданы (два запроса)
+
+    Базовые роли существуют, а у администратора есть все разрешения
+    на базовые ресурсы - это подразумевает и наличие действий и ресурсов.
+    """
+    if Role.objects.filter(name__in=[role["name"] for role in SEED_ROLES]).count() != len(
+        SEED_ROLES
+    ):
+        return False
+    granted = Permission.objects.filter(
+        roles__name=ADMIN_ROLE,
+        resource__name__in=[resource["name"] for resource in SEED_RESOURCES],
+        action__code__in=[action["code"] for action in SEED_ACTIONS],
+    ).count()
+    return granted == len(SEED_RESOURCES) * len(SEED_ACTIONS)
+
+
+def initialize_rbac(force=False):
+    """
+    Инициализация базовых данных RBAC
+
+    Для новой базы данные создает миграция 0005_seed_rbac; функция
+    используется командой init_rbac, но не при старте процесса. Отпечаток базовых данных запоминается в кэше, так что
+    повторный вызов при том же наборе данных не выполняет запросов.
 
+    Returns:
+        bool: True, если данные создавались
+    """
+    if not force:
+        if cache.get(SEEDED_CACHE_KEY):
+            return False
+        if is_seeded():
+            cache.set(SEEDED_CACHE_KEY, True, None)
+            return False
 
-def initialize_rbac():
-    """Инициализация базовых данных RBAC"""
-
-    # Создаем действия
-    actions_data = [
-        {"name": "Просмотр", "code": "view", "description": "Просмотр ресурса"},
-        {
-            "name": "Создание",
-            "code": "create",
-            "description": "Создание нового ресурса",
-        },
-        {
-            "name": "Редактирование",
-            "code": "edit",
-            "description": "Редактирование ресурса",
-        },
-        {"name": "Удаление", "code": "delete", "description": "Удаление ресурса"},
-    ]
-
-    for action_data in actions_data:
-        Action.objects.get_or_create(**action_data)
-
-    # Создаем ресурсы для пользователей
-    user_resources = [
-        {
-            "name": "Пользователи",
-            "endpoint": "/api/users/",
-            "description": "Управление пользователями",
-        },
-        {
-            "name": "Профиль",
-            "endpoint": "/api/users/profile/",
-            "description": "Профиль пользователя",
-        },
-        {
-            "name": "Аутентификация",
-            "endpoint": "/api/auth/",
-            "description": "Аутентификация и регистрация",
-        },
-    ]
-
-    for resource_data in user_resources:
-        Resource.objects.get_or_create(**resource_data)
-
-    # Создаем базовые роли
-    roles_data = [
-        {
-            "name": "Администратор",
-            "description": "Полный доступ ко всем функциям",
-            "is_default": False,
-        },
-        {"name": "Пользователь", "description": "Базовый доступ", "is_default": True},
-        {
-            "name": "Менеджер",
-            "description": "Доступ к управлению контентом",
-            "is_default": False,
-        },
-    ]
-
-    for role_data in roles_data:
-        Role.objects.get_or_create(**role_data)
-
-    # Даем администратору все разрешения
-    admin_role = Role.objects.get(name="Администратор")
-    for resource in Resource.objects.all():
-        for action in Action.objects.all():
-            permission, _ = Permission.objects.get_or_create(
-                resource=resource, action=action
-            )
-            admin_role.permissions.add(permission)
-
-    print("RBAC система инициализирована")
+    with transaction.atomic():
+        seed_rbac(Action, Resource, Permission, Role)
+        # bulk_create не отправляет сигналы
+        schedule_policy_bump()
+    cache.set(SEEDED_CACHE_KEY, True, None)
+    return True
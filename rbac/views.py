@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.decorators import action
+from django.db.models import Prefetch
 from django.utils.translation import gettext_lazy as _
 from .models import Resource, Action, Permission, Role, UserRole, AuditLog
 from .serializers import (
@@ -9,133 +11,330 @@ from .serializers import (
     PermissionSerializer,
     RoleSerializer,
     UserRoleSerializer,
-    AuditLogSerializer
+    AuditLogSerializer,
+    BulkUserRoleSerializer,
+    UserFilterSerializer,
 )
 from .permissions import HasPermission
+from .expand import Expand, ExpandMixin
+from .export import export_rows, iter_csv, iter_ndjson
+from .bulk import assign_roles, assign_role_to_users, revoke_roles, revoke_role_from_users
+from .audit import diff, snapshot, write_audit_log
+from .cache import stats as permission_cache_stats
+from .documents import PolicyDocumentError, apply_policy, dump_document, export_policy
+from datetime import timedelta
+
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.http import HttpResponse, StreamingHttpResponse
 from django.contrib.auth import get_user_model
+from rest_framework.exceptions import ValidationError
+from backend.pagination import PaginationModeMixin
 
 User = get_user_model()
 
 
-class ResourceViewSet(viewsets.ModelViewSet):
-    queryset = Resource.objects.all()
-    serializer_class = ResourceSerializer
-    permission_classes = [permissions.IsAuthenticated & HasPermission]
+class BaseViewSet:
+    """
+    Базовый класс для логирования действий
+
+    Создание, изменение и удаление записываются в аудит лог под именем
+    audit_resource: при создании и удалении - снимок полей экземпляра, при
+    изменении - только измененные поля (см. rbac.audit.snapshot и diff).
+    """
+
+    audit_resource = None
+    # Связи многие-ко-многим в снимке; queryset представления должен их предзагружать
+    audit_many_to_many = ()
 
     def perform_create(self, serializer):
-        serializer.save()
-        self._log_action("create", "resource", serializer.data)
+        instance = serializer.save()
+        data = {name: [] for name in self.audit_many_to_many}
+        data.update(serializer.validated_data)
+        self._log_action("create", self.audit_resource, self._audit_snapshot(instance, data))
 
     def perform_update(self, serializer):
-        self._log_action("update", "resource", serializer.data)
+        before = self._audit_snapshot(serializer.instance)
+        instance = serializer.save()
+        changes = diff(before, self._audit_snapshot(instance, serializer.validated_data))
+        # Запрос без изменений не записывается
+        if changes:
+            self._log_action("update", self.audit_resource, {"id": instance.pk, "changes": changes})
 
     def perform_destroy(self, instance):
-        self._log_action("delete", "resource", {"id": instance.id, "name": instance.name})
+        details = self._audit_snapshot(instance)
+        instance.delete()
+        self._log_action("delete", self.audit_resource, details)
+
+    def _audit_snapshot(self, instance, data=None):
+        """Снимок экземпляра; связи многие-ко-многим берутся из data (validated_data), если они там есть"""
+        many_to_many = {}
+        for name in self.audit_many_to_many:
+            related = data[name] if data is not None and name in data else getattr(instance, name).all()
+            many_to_many[name] = [obj.pk for obj in related]
+        return snapshot(instance, many_to_many)
 
+    def _log_action(self, action, resource, details):
+        """Логирование действий администратора"""
+        ip_address = self._get_client_ip()
+        user_agent = self.request.META.get('HTTP_USER_AGENT', '')
+        
+        # Запись выполняется фоновым потоком пакетами (см. rbac.audit)
+        write_audit_log(
+            user_id=self.request.user.pk,
+            action=action,
+            resource=resource,
+            details=details,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+    
+    def _get_client_ip(self):
+        """Получение IP адреса клиента"""
+        x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip = x_forwarded_for.split(',')[0]
+        else:
+            ip = self.request.META.get('REMOTE_ADDR')
+        return ip
 
-class ActionViewSet(viewsets.ModelViewSet):
-    queryset = Action.objects.all()
-    serializer_class = ActionSerializer
-    permission_classes = [permissions.IsAuthenticated & HasPermission]
 
-    def perform_create(self, serializer):
-        serializer.save()
-        self._log_action("create", "action", serializer.data)
+class ResourceViewSet(PaginationModeMixin, BaseViewSet, viewsets.ModelViewSet):
+    queryset = Resource.objects.all()
+    serializer_class = ResourceSerializer
+    permission_classes = [permissions.IsAuthenticated & HasPermission]
+    audit_resource = "resource"
 
-    def perform_update(self, serializer):
-        self._log_action("update", "action", serializer.data)
 
-    def perform_destroy(self, instance):
-        self._log_action("delete", "action", {"id": instance.id, "name": instance.name})
+class ActionViewSet(PaginationModeMixin, BaseViewSet, viewsets.ModelViewSet):
+    queryset = Action.objects.all()
+    serializer_class = ActionSerializer
+    permission_classes = [permissions.IsAuthenticated & HasPermission]
+    audit_resource = "action"
 
 
-class PermissionViewSet(viewsets.ModelViewSet):
+class PermissionViewSet(PaginationModeMixin, ExpandMixin, BaseViewSet, viewsets.ModelViewSet):
     queryset = Permission.objects.all()
     serializer_class = PermissionSerializer
     permission_classes = [permissions.IsAuthenticated & HasPermission]
+    audit_resource = "permission"
+    expand_related = {
+        "resource": Expand(select_related=["resource"], only=["resource__name", "resource__endpoint"]),
+        "action": Expand(select_related=["action"], only=["action__name", "action__code"]),
+    }
 
-    def perform_create(self, serializer):
-        serializer.save()
-        self._log_action("create", "permission", serializer.data)
 
-    def perform_update(self, serializer):
-        self._log_action("update", "permission", serializer.data)
-
-    def perform_destroy(self, instance):
-        self._log_action("delete", "permission", {"id": instance.id})
-
-
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(PaginationModeMixin, ExpandMixin, BaseViewSet, viewsets.ModelViewSet):
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
     permission_classes = [permissions.IsAuthenticated & HasPermission]
+    audit_resource = "role"
+    audit_many_to_many = ("permissions",)
+    expand_related = {
+        "permissions": Expand(
+            prefetch_related=[
+                Prefetch(
+                    "permissions",
+                    queryset=Permission.objects.select_related("resource", "action").only(
+                        "id", "resource", "action", "resource__name", "action__code"
+                    ),
+                )
+            ]
+        ),
+    }
 
-    def perform_create(self, serializer):
-        serializer.save()
-        self._log_action("create", "role", serializer.data)
-
-    def perform_update(self, serializer):
-        self._log_action("update", "role", serializer.data)
-
-    def perform_destroy(self, instance):
-        self._log_action("delete", "role", {"id": instance.id, "name": instance.name})
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Идентификаторы разрешений всех ролей одним запросом; при
+        # ?expand=permissions их загружает Prefetch из expand_related
+        if "permissions" not in self.get_expand():
+            queryset = queryset.prefetch_related("permissions")
+        return queryset
 
 
-class UserRoleViewSet(viewsets.ModelViewSet):
+class UserRoleViewSet(PaginationModeMixin, ExpandMixin, BaseViewSet, viewsets.ModelViewSet):
     queryset = UserRole.objects.all()
     serializer_class = UserRoleSerializer
     permission_classes = [permissions.IsAuthenticated & HasPermission]
+    audit_resource = "user_role"
+    cursor_ordering = ("-created_at", "-id")
+    expand_related = {
+        "user": Expand(select_related=["user"], only=["user__email"]),
+        "role": Expand(select_related=["role"], only=["role__name"]),
+    }
+    # Массовый отзыв выполняется POST запросом, но требует права на удаление
+    rbac_action_codes = {"bulk_revoke": "delete"}
 
     def get_queryset(self):
         if self.request.user.is_superuser:
-            return UserRole.objects.all()
+            # Роли мягко удаленных пользователей не показываются
+            return UserRole.objects.filter(user__deleted_at__isnull=True)
         return UserRole.objects.filter(user=self.request.user)
 
-    def perform_create(self, serializer):
-        serializer.save()
-        self._log_action("create", "user_role", serializer.data)
+    def bulk_assign(self, request):
+        """Массовое назначение ролей одной транзакцией"""
+        serializer = BulkUserRoleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-    def perform_update(self, serializer):
-        self._log_action("update", "user_role", serializer.data)
+        if "pairs" in data:
+            user_ids = assign_roles(data["pairs"])
+            details = {"pairs": len(data["pairs"]), "users": len(user_ids)}
+        else:
+            users = UserFilterSerializer.filter_queryset(User.objects.all(), data["filter"])
+            user_ids = assign_role_to_users(data["role"], users)
+            details = {"role": data["role"].pk, "filter": data["filter"], "users": len(user_ids)}
+
+        self._log_action("bulk_assign", "user_role", details)
+        return Response(details, status=status.HTTP_200_OK)
+
+    def bulk_revoke(self, request):
+        """Массовый отзыв ролей одним DELETE"""
+        serializer = BulkUserRoleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if "pairs" in data:
+            deleted, user_ids = revoke_roles(data["pairs"])
+            details = {"pairs": len(data["pairs"])}
+        else:
+            users = UserFilterSerializer.filter_queryset(User.objects.all(), data["filter"])
+            deleted, user_ids = revoke_role_from_users(data["role"], users)
+            details = {"role": data["role"].pk, "filter": data["filter"]}
+        details.update({"deleted": deleted, "users": len(user_ids)})
 
-    def perform_destroy(self, instance):
-        self._log_action("delete", "user_role", {"id": instance.id})
+        self._log_action("bulk_revoke", "user_role", details)
+        return Response(details, status=status.HTTP_200_OK)
 
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+class AuditLogViewSet(PaginationModeMixin, viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated & HasPermission]
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
+        # user_email каждой записи берется из присоединенного пользователя
+        queryset = AuditLog.objects.select_related("user")
         if self.request.user.is_superuser:
-            return AuditLog.objects.all()
-        return AuditLog.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def export(self, request):
+        """
+        Потоковая выгрузка аудит логов (NDJSON или CSV)
+
+        Параметры:
+        - export_format: ndjson (по умолчанию) или csv
+        - created_after / created_before: Интервал времени (ISO 8601)
+        - user, action, resource: Фильтры по полям
+        - since: id последней полученной записи - выгрузка продолжится после нее
+
+        Записи отдаются в порядке (created_at, id), коллектор забирает лог
+        инкрементально, передавая id последней строки в since. Порядок id не
+        совпадает с порядком фиксации (записи пишутся пакетами фоновым
+        потоком и несколькими процессами), поэтому записи моложе
+        AUDIT_LOG["EXPORT_SETTLE_SECONDS"] не выгружаются: за это время
+        запись успевает попасть в базу. Запись, сохраненная с большей
+        задержкой (например, при переполненной очереди), может быть пропущена.
+        """
+        params = request.query_params
+        queryset = self.get_queryset()
+
+        filters = {}
+        date_filters = (("created_after", "created_at__gte"), ("created_before", "created_at__lt"))
+        for param, lookup in date_filters:
+            if params.get(param):
+                value = parse_datetime(params[param])
+                if value is None:
+                    raise ValidationError({param: _("Неверный формат даты")})
+                filters[lookup] = value
+        for param in ("user", "since"):
+            if params.get(param) and not params[param].isdigit():
+                raise ValidationError({param: _("Ожидается целое число")})
+        if params.get("user"):
+            filters["user_id"] = int(params["user"])
+        for param in ("action", "resource"):
+            if params.get(param):
+                filters[param] = params[param]
+
+        export_format = params.get("export_format", "ndjson")
+        if export_format not in ("ndjson", "csv"):
+            raise ValidationError({"export_format": _("Поддерживаются форматы ndjson и csv")})
+
+        settle = timedelta(seconds=settings.AUDIT_LOG["EXPORT_SETTLE_SECONDS"])
+        queryset = queryset.filter(created_at__lt=timezone.now() - settle, **filters)
+        if params.get("since"):
+            since = int(params["since"])
+            # Только среди доступных пользователю записей: иначе по чужим id
+            # можно было бы узнать время их создания
+            created_at = (
+                self.get_queryset().filter(id=since).values_list("created_at", flat=True).first()
+            )
+            if created_at is None:
+                raise ValidationError({"since": _("Запись не найдена")})
+            # Keyset по индексу (created_at, id): записи после указанной
+            queryset = queryset.filter(created_at__gte=created_at).exclude(
+                created_at=created_at, id__lte=since
+            )
+
+        rows = export_rows(queryset.order_by("created_at", "id"))
+        if export_format == "csv":
+            response = StreamingHttpResponse(iter_csv(rows), content_type="text/csv")
+        else:
+            response = StreamingHttpResponse(iter_ndjson(rows), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="audit-logs.{export_format}"'
+        return response
 
 
-class BaseViewSet:
-    """Базовый класс для логирования действий"""
-    
-    def _log_action(self, action, resource, details):
-        """Логирование действий администратора"""
-        ip_address = self._get_client_ip()
-        user_agent = self.request.META.get('HTTP_USER_AGENT', '')
-        
-        AuditLog.objects.create(
-            user=self.request.user,
-            action=action,
-            resource=resource,
-            details=details,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
-    
-    def _get_client_ip(self):
-        """Получение IP адреса клиента"""
-        x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = self.request.META.get('REMOTE_ADDR')
-        return ip
+class PermissionCacheStatsView(APIView):
+    """Статистика кэша разрешений текущего процесса"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(permission_cache_stats.as_dict())
+
+
+class PolicyDocumentView(BaseViewSet, APIView):
+    """
+    Политика RBAC целиком как документ (см. rbac.documents)
+
+    GET - выгрузка (?export_format=json|yaml)
+    POST - применение JSON документа одной транзакцией
+    (?mode=replace удаляет отсутствующие в документе объекты, ?dry_run=1 только считает изменения)
+
+    Только для администраторов: документ может переписать или удалить все
+    права, а ресурса для /api/rbac/ в политике может и не быть.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        export_format = request.query_params.get("export_format", "json")
+        if export_format not in ("json", "yaml"):
+            raise ValidationError({"export_format": _("Поддерживаются форматы json и yaml")})
+        if export_format == "json":
+            return Response(export_policy())
+
+        try:
+            content = dump_document(export_policy(), "yaml")
+        except PolicyDocumentError as e:
+            raise ValidationError({"export_format": str(e)})
+        return HttpResponse(content, content_type="application/yaml")
+
+    def post(self, request):
+        mode = request.query_params.get("mode", "merge")
+        if mode not in ("merge", "replace"):
+            raise ValidationError({"mode": _("Поддерживаются режимы merge и replace")})
+        dry_run = request.query_params.get("dry_run") in ("1", "true")
+
+        try:
+            summary = apply_policy(request.data, prune=mode == "replace", dry_run=dry_run)
+        except PolicyDocumentError as e:
+            raise ValidationError({"document": str(e)})
+
+        if not dry_run:
+            self._log_action("import", "policy", {"mode": mode, "summary": summary})
+        return Response({"dry_run": dry_run, "mode": mode, "summary": summary})
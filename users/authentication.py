@@ -0,0 +1,100 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .epochs import token_epoch_matches
+from .user_cache import aget_cached_user, get_cached_user
+
+
+def check_token_epoch(validated_token, epoch):
+    if not token_epoch_matches(validated_token, epoch):
+        raise AuthenticationFailed(_("Токен отозван"), code="token_revoked")
+
+
+def _user_id(validated_token):
+    try:
+        return validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+
+
+def check_user(validated_token, user):
+    """Проверки simplejwt для загруженного пользователя и сверка эпохи токенов"""
+    if user is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+    if not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+    if api_settings.CHECK_REVOKE_TOKEN:
+        if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(
+            user.password
+        ):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+
+    check_token_epoch(validated_token, user.token_epoch)
+    return user
+
+
+def _use_user_cache():
+    # Кэш хранит пользователей по первичному ключу
+    return settings.USER_CACHE["ENABLED"] and api_settings.USER_ID_FIELD in ("id", "pk")
+
+
+class EpochJWTAuthentication(JWTAuthentication):
+    """
+    JWT аутентификация с проверкой эпохи токенов пользователя
+
+    Пользователь берется из кэша (users.user_cache), так что на запросах
+    с попаданием в кэш обращений к базе нет. Эпоха сравнивается с полем
+    загруженного пользователя.
+    """
+
+    def get_user(self, validated_token):
+        if not _use_user_cache():
+            user = super().get_user(validated_token)
+            check_token_epoch(validated_token, user.token_epoch)
+            return user
+        return check_user(validated_token, get_cached_user(_user_id(validated_token)))
+
+
+class AsyncJWTAuthentication(EpochJWTAuthentication):
+    """
+    JWT аутентификация с асинхронной загрузкой пользователя
+
+    В синхронных представлениях работает как JWTAuthentication; асинхронные
+    представления (users.views.AsyncAPIView) вызывают aauthenticate.
+    Проверка подписи токена не обращается к базе данных и выполняется
+    в событийном цикле.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = _user_id(validated_token)
+        if _use_user_cache():
+            user = await aget_cached_user(user_id)
+        else:
+            user = await self.user_model.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).afirst()
+        # user.password при CHECK_REVOKE_TOKEN может быть отложенным полем
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return await sync_to_async(check_user)(validated_token, user)
+        return check_user(validated_token, user)
@@ -0,0 +1,102 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import auth
+from django.contrib.auth import get_backends, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+
+from .hashing import get_hashing_pool, verify_password
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend с проверкой пароля в пуле хеширования
+
+    Поток запроса выполняет только запросы к базе данных; хеширование
+    выполняется в ограниченном пуле (см. users.hashing). Пересчитанный хеш
+    сохраняется одним UPDATE поля password.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        pool = get_hashing_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хеширование и для несуществующего пользователя, чтобы по времени
+            # ответа нельзя было определить, зарегистрирован ли email
+            pool.run(make_password, password)
+            return None
+
+        is_correct, new_encoded = pool.run(verify_password, password, user.password)
+        if new_encoded:
+            user.password = new_encoded
+            user.save(update_fields=["password"])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Асинхронный вариант authenticate
+
+        Поток событийного цикла не блокируется хешированием: результат пула
+        ожидается через asyncio.wrap_future.
+        """
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        pool = get_hashing_pool()
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await asyncio.wrap_future(pool.submit(make_password, password))
+            return None
+
+        is_correct, new_encoded = await asyncio.wrap_future(
+            pool.submit(verify_password, password, user.password)
+        )
+        if new_encoded:
+            user.password = new_encoded
+            await user.asave(update_fields=["password"])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+async def aauthenticate(request=None, **credentials):
+    """
+    Асинхронный аналог django.contrib.auth.authenticate
+
+    Бэкенды без aauthenticate вызываются через sync_to_async. Как и в
+    синхронном варианте, PermissionDenied прекращает перебор бэкендов, а
+    неудачный вход отправляет сигнал user_login_failed.
+    """
+    for backend in get_backends():
+        try:
+            if hasattr(backend, "aauthenticate"):
+                user = await backend.aauthenticate(request, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is not None:
+            user.backend = f"{backend.__module__}.{backend.__class__.__qualname__}"
+            return user
+
+    # Обработчики сигнала синхронные и могут обращаться к базе данных
+    await sync_to_async(user_login_failed.send)(
+        sender=auth.__name__, credentials=auth._clean_credentials(credentials), request=request
+    )
+    return None
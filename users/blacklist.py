@@ -0,0 +1,188 @@
+"""
+Проверка черного списка refresh токенов без SQL запросов
+
+Черный список simplejwt (BlacklistedToken) растет с каждой ротацией и
+выходом, а каждое обновление токена проверяет его запросом к базе данных.
+Здесь проверка выполняется в два шага:
+
+1. Фильтр Блума в памяти процесса со всеми неистекшими JTI из черного
+   списка на момент последней перестройки. Отрицательный ответ фильтра точен.
+2. Токены, занесенные в черный список после перестройки фильтра, хранятся в
+   общем кэше (ключ на JTI) дольше интервала перестройки.
+
+Запрос к базе выполняется только при положительном ответе фильтра, чтобы
+отсеять ложные срабатывания. При нескольких процессах нужен общий кэш
+(см. CACHE_BACKEND), иначе процесс не увидит токены, отозванные другими.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+RECENT_KEY = "token_blacklist:jti:{jti}"
+
+# Минимальная емкость фильтра, чтобы не перестраивать его после каждого отзыва
+MIN_CAPACITY = 1024
+
+
+class BloomFilter:
+    """Фильтр Блума на bytearray с двойным хешированием blake2b"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class TokenBlacklistFilter:
+    """
+    Черный список refresh токенов процесса
+
+    Фильтр перестраивается раз в rebuild_interval секунд (и при превышении
+    емкости): истекшие токены в него не попадают, поэтому размер фильтра
+    следует за числом действующих отозванных токенов.
+    """
+
+    def __init__(self, error_rate=0.001, rebuild_interval=600):
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.checks = 0
+        self.filter_negatives = 0
+        self.recent_hits = 0
+        self.db_hits = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self._filter = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def is_blacklisted(self, jti):
+        self._count("checks")
+        bloom = self._get_filter()
+        if jti not in bloom:
+            if cache.get(RECENT_KEY.format(jti=jti)):
+                self._count("recent_hits")
+                return True
+            self._count("filter_negatives")
+            return False
+
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            self._count("db_hits")
+            return True
+        self._count("false_positives")
+        return False
+
+    def add(self, jti):
+        """
+        Регистрация отозванного токена (после фиксации транзакции)
+
+        Ключ в кэше живет два интервала перестройки: за это время любой
+        процесс перестроит фильтр, и токен попадет в него из базы данных.
+        """
+        cache.set(RECENT_KEY.format(jti=jti), True, self.rebuild_interval * 2)
+        bloom = self._filter
+        if bloom is not None:
+            with self._lock:
+                bloom.add(jti)
+
+    def stats(self):
+        with self._lock:
+            bloom = self._filter
+            return {
+                "checks": self.checks,
+                "filter_negatives": self.filter_negatives,
+                "recent_hits": self.recent_hits,
+                "db_hits": self.db_hits,
+                "false_positives": self.false_positives,
+                "rebuilds": self.rebuilds,
+                "filter_count": bloom.count if bloom else 0,
+                "filter_capacity": bloom.capacity if bloom else 0,
+                "filter_bytes": len(bloom._bits) if bloom else 0,
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _get_filter(self):
+        bloom = self._filter
+        stale = (
+            bloom is None
+            or time.monotonic() - self._built_at > self.rebuild_interval
+            or bloom.count > bloom.capacity
+        )
+        if not stale:
+            return bloom
+
+        # Перестраивает один поток; остальные пользуются прежним фильтром
+        if not self._rebuild_lock.acquire(blocking=bloom is None):
+            return bloom
+        try:
+            if self._filter is bloom:
+                self._rebuild()
+        finally:
+            self._rebuild_lock.release()
+        return self._filter
+
+    def _rebuild(self):
+        active = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        bloom = BloomFilter(max(active.count() * 2, MIN_CAPACITY), self.error_rate)
+        for jti in active.values_list("token__jti", flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+
+        with self._lock:
+            self._filter = bloom
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+
+
+_blacklist = None
+_blacklist_lock = threading.Lock()
+
+
+def get_blacklist():
+    """Общий для процесса TokenBlacklistFilter, настроенный из settings.TOKEN_BLACKLIST_FILTER"""
+    global _blacklist
+
+    if _blacklist is None:
+        with _blacklist_lock:
+            if _blacklist is None:
+                options = settings.TOKEN_BLACKLIST_FILTER
+                _blacklist = TokenBlacklistFilter(
+                    error_rate=options["ERROR_RATE"],
+                    rebuild_interval=options["REBUILD_INTERVAL"],
+                )
+    return _blacklist
+
+
+def is_token_blacklisted(jti):
+    """Проверка JTI по фильтру или, если фильтр выключен, запросом к базе"""
+    if settings.TOKEN_BLACKLIST_FILTER["ENABLED"]:
+        return get_blacklist().is_blacklisted(jti)
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
@@ -0,0 +1,45 @@
+"""
+Проверки конфигурации (manage.py check)
+
+Черный список refresh токенов (users.blacklist) и эпохи токенов
+(users.epochs) видны другим процессам только через общий кэш. С кэшем в
+памяти процесса отозванный в одном процессе токен остается действительным в
+остальных: до перестройки фильтра черного списка (REBUILD_INTERVAL) или,
+для эпохи, до перезапуска процесса.
+"""
+
+from django.conf import settings
+from django.core import checks
+
+# Кэши, которые не разделяются между процессами
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def _cache_messages(level, check_id):
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        level(
+            f"Кэш {backend} не разделяется между процессами: отзыв токенов "
+            "(выход, ротация, выход на всех устройствах) не виден другим процессам.",
+            hint="Укажите общий кэш (Redis/Memcached) в CACHE_BACKEND/CACHE_LOCATION "
+            "или запускайте один процесс.",
+            obj="CACHES",
+            id=check_id,
+        )
+    ]
+
+
+@checks.register(checks.Tags.security, checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    return _cache_messages(checks.Warning, "users.W001")
+
+
+@checks.register(checks.Tags.security, checks.Tags.caches, deploy=True)
+def check_shared_cache_deploy(app_configs, **kwargs):
+    # manage.py check --deploy завершается ошибкой
+    return _cache_messages(checks.Error, "users.E001")
@@ -0,0 +1,48 @@
+"""
+Эпоха токенов пользователя
+
+Каждый выпускаемый токен содержит эпоху пользователя (CustomUser.token_epoch).
+Увеличение эпохи одной записью отзывает все ранее выпущенные токены: при
+проверке эпоха из токена сравнивается с текущей - из загруженного
+пользователя или из кэша, без отдельного запроса к базе данных.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+TOKEN_EPOCH_CLAIM = "epoch"
+TOKEN_EPOCH_KEY = "users:token_epoch:{user_id}"
+
+
+def get_token_epoch(user_id):
+    """
+    Текущая эпоха токенов пользователя
+
+    Читается из кэша; при промахе - одним запросом из базы. Значение из базы
+    записывается через cache.add, чтобы не затереть более новое значение,
+    выставленное после фиксации изменения (set_token_epoch).
+
+    Returns:
+        int | None: Эпоха или None, если пользователь не существует
+    """
+    key = TOKEN_EPOCH_KEY.format(user_id=user_id)
+    epoch = cache.get(key)
+    if epoch is None:
+        epoch = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values_list("token_epoch", flat=True)
+            .first()
+        )
+        if epoch is not None:
+            cache.add(key, epoch, timeout=None)
+    return epoch
+
+
+def set_token_epoch(user_id, epoch):
+    cache.set(TOKEN_EPOCH_KEY.format(user_id=user_id), epoch, timeout=None)
+
+
+def token_epoch_matches(token, epoch):
+    """Токены, выпущенные до появления эпохи, считаются выпущенными в эпоху 0"""
+    return epoch is not None and token.get(TOKEN_EPOCH_CLAIM, 0) == epoch
@@ -0,0 +1,24 @@
+"""
+Хешеры паролей со стоимостью из settings.PASSWORD_HASHING
+
+Названия алгоритмов совпадают со стандартными хешерами Django, поэтому
+существующие хеши проверяются без изменений, а хеши с устаревшей
+стоимостью пересчитываются при входе (must_update).
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = settings.PASSWORD_HASHING["PBKDF2_ITERATIONS"]
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    time_cost = settings.PASSWORD_HASHING["ARGON2_TIME_COST"]
+    memory_cost = settings.PASSWORD_HASHING["ARGON2_MEMORY_COST"]
+    parallelism = settings.PASSWORD_HASHING["ARGON2_PARALLELISM"]
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = settings.PASSWORD_HASHING["SCRYPT_WORK_FACTOR"]
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Сколько последних замеров хранится для перцентилей
+TIMINGS_WINDOW = 1000
+
+
+class HashingPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Слишком много одновременных попыток входа, повторите позже")
+    default_code = "hashing_pool_busy"
+
+
+def verify_password(password, encoded):
+    """
+    Проверка пароля без сохранения в базу данных
+
+    Повторяет django.contrib.auth.hashers.check_password, но вместо вызова
+    setter возвращает новый хеш, если текущий нужно пересчитать (другой
+    алгоритм или стоимость) - сохранение выполняет вызывающий поток.
+
+    Returns:
+        tuple: (пароль верен, новый хеш или None)
+    """
+    if password is None or not is_password_usable(encoded):
+        return False, None
+
+    preferred = get_hasher("default")
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, None
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+
+    # Выравнивание времени ответа для хешей с устаревшей стоимостью
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+
+    if is_correct and must_update:
+        return True, make_password(password)
+    return is_correct, None
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class PasswordHashingPool:
+    """
+    Ограниченный пул потоков для хеширования паролей
+
+    Хеширование (PBKDF2/scrypt в hashlib, Argon2 в argon2-cffi) выполняется
+    без GIL, поэтому потоков достаточно. Одновременно хешируется не более
+    workers паролей, еще queue_size задач могут ждать в очереди; сверх этого
+    задача сразу отклоняется с HashingPoolBusy, а не занимает поток запроса.
+    Так шквал попыток входа ограничен по CPU и не вытесняет остальные запросы.
+
+    Для каждой задачи замеряется время ожидания в очереди и время хеширования.
+    """
+
+    def __init__(self, workers=4, queue_size=64):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.completed = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pending = 0
+        self._queue_times = deque(maxlen=TIMINGS_WINDOW)
+        self._hash_times = deque(maxlen=TIMINGS_WINDOW)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def submit(self, func, *args):
+        """
+        Постановка задачи в пул
+
+        Returns:
+            concurrent.futures.Future: Результат func(*args)
+
+        Raises:
+            HashingPoolBusy: Заняты все потоки и места в очереди
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolBusy()
+
+        with self._lock:
+            self._pending += 1
+        submitted = time.monotonic()
+
+        def task():
+            started = time.monotonic()
+            try:
+                return func(*args)
+            finally:
+                finished = time.monotonic()
+                with self._lock:
+                    self._queue_times.append(started - submitted)
+                    self._hash_times.append(finished - started)
+
+        try:
+            future = self._get_executor().submit(task)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, func, *args):
+        """Выполнение func(*args) в пуле с ожиданием результата"""
+        return self.submit(func, *args).result()
+
+    def stats(self):
+        with self._lock:
+            queue_times = list(self._queue_times)
+            hash_times = list(self._hash_times)
+            pending = self._pending
+            completed, rejected = self.completed, self.rejected
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": pending,
+            "completed": completed,
+            "rejected": rejected,
+            "queue_time_ms": {
+                "avg": ms(sum(queue_times) / len(queue_times)) if queue_times else None,
+                "p99": ms(_percentile(queue_times, 0.99)),
+                "max": ms(max(queue_times, default=None)),
+            },
+            "hash_time_ms": {
+                "avg": ms(sum(hash_times) / len(hash_times)) if hash_times else None,
+                "p99": ms(_percentile(hash_times, 0.99)),
+            },
+        }
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future is not None:
+                self.completed += 1
+        self._slots.release()
+
+    def _get_executor(self):
+        # После fork потоки пула родителя в дочернем процессе не существуют
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hashing"
+                    )
+        return self._executor
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Общий для процесса пул, настроенный из settings.PASSWORD_HASHING"""
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                options = settings.PASSWORD_HASHING
+                _pool = PasswordHashingPool(
+                    workers=options["POOL_WORKERS"],
+                    queue_size=options["POOL_QUEUE_SIZE"],
+                )
+    return _pool
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users.management.loadtest import http_request, percentile
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест входа: входов в секунду и задержка остальных "
+        "эндпоинтов во время шквала входов (против запущенного сервера)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Адрес сервера")
+        parser.add_argument("--email", default="bench-login@example.com")
+        parser.add_argument("--password", default="bench-login-password")
+        parser.add_argument(
+            "--create-user", action="store_true",
+            help="Создать пользователя в базе, если его нет (сервер использует ту же базу)",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16,
+            help="Количество потоков, выполняющих вход",
+        )
+        parser.add_argument(
+            "--probes", type=int, default=2,
+            help="Количество потоков, запрашивающих probe-path",
+        )
+        parser.add_argument("--probe-path", default="/api/users/profile/")
+        parser.add_argument("--seconds", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        self.base_url = options["url"].rstrip("/")
+        self.credentials = {"email": options["email"], "password": options["password"]}
+
+        if options["create_user"] and not User.objects.filter(email=options["email"]).exists():
+            User.objects.create_user(
+                email=options["email"], password=options["password"],
+                first_name="Bench", last_name="Login",
+            )
+
+        status, body = self._login()
+        if status != 200:
+            raise CommandError(f"Не удалось войти: HTTP {status}")
+        self.token = json.loads(body)["access"]
+        self.probe_path = options["probe_path"]
+
+        baseline = self._run(0, options["probes"], options["seconds"] / 2)
+        storm = self._run(options["concurrency"], options["probes"], options["seconds"])
+
+        self.stdout.write(
+            f"{'':>10} {'logins/s':>9} {'503':>6} {'errors':>7} "
+            f"{'probe p50 ms':>13} {'probe p99 ms':>13}"
+        )
+        for name, result in (("baseline", baseline), ("storm", storm)):
+            self.stdout.write(
+                f"{name:>10} {result['logins_per_second']:>9.1f} {result['busy']:>6} "
+                f"{result['errors']:>7} {result['probe_p50'] * 1000:>13.1f} "
+                f"{result['probe_p99'] * 1000:>13.1f}"
+            )
+
+    def _login(self):
+        return http_request(self.base_url + "/api/auth/login/", self.credentials)
+
+    def _run(self, logins, probes, seconds):
+        deadline = time.monotonic() + seconds
+        lock = threading.Lock()
+        result = {"logins": 0, "busy": 0, "errors": 0}
+        latencies = []
+
+        def login_worker():
+            while time.monotonic() < deadline:
+                status, _ = self._login()
+                key = "logins" if status == 200 else "busy" if status == 503 else "errors"
+                with lock:
+                    result[key] += 1
+
+        def probe_worker():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                status, _ = http_request(self.base_url + self.probe_path, token=self.token)
+                elapsed = time.monotonic() - started
+                with lock:
+                    if status == 200:
+                        latencies.append(elapsed)
+                    else:
+                        result["errors"] += 1
+
+        threads = [threading.Thread(target=login_worker) for _ in range(logins)]
+        threads += [threading.Thread(target=probe_worker) for _ in range(probes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result["logins_per_second"] = result["logins"] / seconds
+        result["probe_p50"] = percentile(latencies, 0.5)
+        result["probe_p99"] = percentile(latencies, 0.99)
+        return result
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from backend.bulk import raw_delete
+
+
+class Command(BaseCommand):
+    help = "Удаление истекших выпущенных и отозванных токенов пакетами"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Количество выпущенных токенов в одном пакете DELETE",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.0,
+            help="Пауза между пакетами в секундах, чтобы не нагружать базу",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать, сколько токенов будет удалено",
+        )
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Будет удалено выпущенных токенов: {expired.count()}, отозванных: "
+                f"{BlacklistedToken.objects.filter(token__in=expired).count()}"
+            )
+            return
+
+        # Обход по первичному ключу: старые токены в начале таблицы, и каждый
+        # пакет читается по индексу, а не полным сканированием expires_at
+        last_id = 0
+        outstanding_deleted = blacklisted_deleted = 0
+        while True:
+            ids = list(
+                expired.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            # Одиночные DELETE без загрузки строк и каскада Collector
+            with transaction.atomic():
+                blacklisted_deleted += raw_delete(BlacklistedToken.objects.filter(token_id__in=ids))
+                outstanding_deleted += raw_delete(OutstandingToken.objects.filter(id__in=ids))
+
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Удалено выпущенных токенов: {outstanding_deleted}, "
+                f"отозванных: {blacklisted_deleted}"
+            )
+        )
@@ -0,0 +1,54 @@
+import csv
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.bulk import BULK_BATCH_SIZE
+from users.registration import bulk_register
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовый импорт пользователей с захешированными паролями "
+        "(поля email, first_name, last_name, middle_name, password)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл пользователей (.csv с заголовком или .json со списком)")
+        parser.add_argument(
+            "--format", dest="fmt", choices=("csv", "json"),
+            help="Формат файла; по умолчанию определяется по расширению файла",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=BULK_BATCH_SIZE,
+            help="Количество пользователей в одной транзакции",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["fmt"]
+        if fmt is None:
+            extension = os.path.splitext(options["path"])[1].lower()
+            fmt = "json" if extension == ".json" else "csv"
+
+        with open(options["path"], encoding="utf-8", newline="") as f:
+            if fmt == "json":
+                try:
+                    rows = json.load(f)
+                except ValueError as e:
+                    raise CommandError(f"Не удалось разобрать файл: {e}")
+                if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                    raise CommandError("Ожидается список пользователей")
+            else:
+                # Строки CSV читаются потоково, пакетами по --batch-size
+                rows = csv.DictReader(f)
+            summary = bulk_register(rows, batch_size=options["batch_size"])
+
+        for error in summary["errors"]:
+            self.stderr.write(f"Строка {error['row']} ({error['email']}): {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано: {summary['created']}, уже существовали: {summary['existing']}, "
+                f"с ошибками: {len(summary['errors'])}"
+            )
+        )
@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from backend.bulk import raw_delete
+from rbac.models import AuditLog, UserRole
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Окончательное удаление мягко удаленных пользователей пакетами"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30,
+            help="Удалять пользователей, удаленных больше указанного числа дней назад",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Количество пользователей в одном пакете",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.0,
+            help="Пауза между пакетами в секундах, чтобы не нагружать базу",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать, сколько пользователей будет удалено",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        expired = CustomUser.all_objects.filter(deleted_at__lte=cutoff)
+        if options["dry_run"]:
+            self.stdout.write(f"Будет удалено пользователей: {expired.count()}")
+            return
+
+        groups = CustomUser.groups.through
+        user_permissions = CustomUser.user_permissions.through
+
+        last_id = 0
+        counts = {"users": 0, "user_roles": 0, "tokens": 0}
+        while True:
+            ids = list(
+                expired.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            # Связанные строки удаляются одиночными DELETE без каскада Collector;
+            # аудит сохраняется без ссылки на пользователя (как при SET_NULL)
+            with transaction.atomic():
+                counts["user_roles"] += raw_delete(UserRole.objects.filter(user_id__in=ids))
+                raw_delete(BlacklistedToken.objects.filter(token__user_id__in=ids))
+                counts["tokens"] += raw_delete(OutstandingToken.objects.filter(user_id__in=ids))
+                AuditLog.objects.filter(user_id__in=ids).update(user=None)
+                raw_delete(groups.objects.filter(customuser_id__in=ids))
+                raw_delete(user_permissions.objects.filter(customuser_id__in=ids))
+                if apps.is_installed("django.contrib.admin"):
+                    # Журнал админки ссылается на пользователя (CASCADE)
+                    LogEntry = apps.get_model("admin", "LogEntry")
+                    raw_delete(LogEntry.objects.filter(user_id__in=ids))
+                counts["users"] += raw_delete(CustomUser.all_objects.filter(id__in=ids))
+
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Удалено пользователей: {counts['users']}, ролей пользователей: "
+                f"{counts['user_roles']}, токенов: {counts['tokens']}"
+            )
+        )
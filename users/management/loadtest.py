@@ -0,0 +1,75 @@
+"""Общие функции нагрузочных тестов против запущенного сервера"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def http_request(url, data=None, token=None, timeout=60):
+    """
+    HTTP запрос с JSON телом
+
+    Returns:
+        tuple: (код ответа или None при сетевой ошибке, тело ответа)
+    """
+    if data is not None and not isinstance(data, bytes):
+        data = json.dumps(data).encode()
+    request = urllib.request.Request(url, data=data)
+    request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except OSError:
+        return None, b""
+
+
+def run_workers(workers, seconds):
+    """
+    Запуск функций-воркеров в потоках на заданное время
+
+    Каждый воркер вызывается в цикле с аргументом deadline и должен вернуть
+    (успех, время запроса в секундах).
+
+    Returns:
+        dict: ok, errors, rps, p50, p99 (в секундах)
+    """
+    deadline = time.monotonic() + seconds
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def loop(worker):
+        while time.monotonic() < deadline:
+            ok, elapsed = worker()
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "ok": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / seconds,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+    }
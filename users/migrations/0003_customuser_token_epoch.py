@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_customuser_managers_customuser_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='token_epoch',
+            field=models.PositiveIntegerField(default=0, verbose_name='token epoch'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:45
+
+from django.core.management.base import CommandError
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+import django.db.models.functions.text
+
+# Сколько групп дубликатов показывать в сообщении об ошибке
+SHOWN_DUPLICATES = 20
+
+
+def check_email_duplicates(apps, schema_editor):
+    """
+    Проверка перед добавлением ограничения: email, отличающиеся только
+    регистром, иначе уронили бы миграцию невнятной ошибкой базы
+    """
+    User = apps.get_model("users", "CustomUser")
+    duplicates = list(
+        User._base_manager.annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .order_by("email_lower")
+        .values_list("email_lower", flat=True)
+    )
+    if not duplicates:
+        return
+
+    shown = duplicates[:SHOWN_DUPLICATES]
+    rows = (
+        User._base_manager.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=shown)
+        .order_by("email_lower", "id")
+        .values_list("id", "email", "deleted_at")
+    )
+    lines = [
+        f"  id={pk} {email}" + (" (удален)" if deleted_at else "")
+        for pk, email, deleted_at in rows
+    ]
+    if len(duplicates) > len(shown):
+        lines.append(f"  ... и еще {len(duplicates) - len(shown)} email")
+    raise CommandError(
+        "Нельзя добавить уникальность email без учета регистра: "
+        f"найдено {len(duplicates)} email, отличающихся только регистром:\n"
+        + "\n".join(lines)
+        + "\nОставьте по одной учетной записи на email (удалите или переименуйте "
+        "остальные, например `python manage.py shell`) и повторите `python manage.py migrate`."
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_customuser_token_epoch'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_email_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='users_customuser_email_lower_uniq', violation_error_message='Пользователь с таким email уже существует'),
+        ),
+    ]
@@ -1,10 +1,38 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
+from .epochs import set_token_epoch
+from .user_cache import invalidate_user
 
-class CustomUserManager(BaseUserManager):
+
+def email_lookup(email):
+    """
+    Условие поиска по email без учета регистра
+
+    Строится как LOWER(email) = LOWER(%s), поэтому использует уникальный
+    функциональный индекс users_customuser_email_lower_uniq (в отличие от
+    email__iexact, который сравнивает UPPER).
+    """
+    return Exact(Lower("email"), Lower(Value(email)))
+
+
+ALIVE = Q(deleted_at__isnull=True)
+
+
+class CustomUserQuerySet(models.QuerySet):
+    def alive(self):
+        return self.filter(ALIVE)
+
+    def deleted(self):
+        return self.exclude(ALIVE)
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     """
     Кастомный менеджер пользователей для email аутентификации
     
@@ -16,8 +44,15 @@ class CustomUserManager(BaseUserManager):
     - Использует email вместо username для аутентификации
     - Валидация обязательных полей
     - Нормализация email адресов
+    - Поиск по email без учета регистра
     """
 
+    def get_by_natural_key(self, username):
+        return self.get(email_lookup(username))
+
+    async def aget_by_natural_key(self, username):
+        return await self.aget(email_lookup(username))
+
     def create_user(self, email, password=None, **extra_fields):
         """
         Создание обычного пользователя
@@ -68,6 +103,13 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
+class AliveUserManager(CustomUserManager):
+    """Пользователи без мягкого удаления (deleted_at IS NULL)"""
+
+    def get_queryset(self):
+        return super().get_queryset().alive()
+
+
 class CustomUser(AbstractUser):
     """
     Кастомная модель пользователя
@@ -84,6 +126,7 @@ class CustomUser(AbstractUser):
     - last_name: Фамилия (обязательное)
     - middle_name: Отчество (необязательное)
     - deleted_at: Дата мягкого удаления
+    - token_epoch: Эпоха токенов; токены с другой эпохой недействительны
     """
     username = None
     email = models.EmailField(_("email address"), unique=True)
@@ -93,12 +136,32 @@ class CustomUser(AbstractUser):
         _("middle name"), max_length=50, blank=True, null=True
     )
     deleted_at = models.DateTimeField(_("deleted at"), blank=True, null=True)
+    token_epoch = models.PositiveIntegerField(_("token epoch"), default=0)
 
-    objects = CustomUserManager()
+    # Менеджер по умолчанию не видит мягко удаленных пользователей;
+    # all_objects - все пользователи (проверка занятости email, очистка)
+    objects = AliveUserManager()
+    all_objects = CustomUserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Email уникален без учета регистра; индекс используется email_lookup
+            models.UniqueConstraint(
+                Lower("email"),
+                name="users_customuser_email_lower_uniq",
+                violation_error_message=_("Пользователь с таким email уже существует"),
+            ),
+        ]
+        # Частичные индексы только по живым пользователям: меньше и используются
+        # запросами менеджера по умолчанию (deleted_at IS NULL)
+        indexes = [
+            models.Index(Lower("email"), name="users_alive_email_idx", condition=ALIVE),
+            models.Index(fields=["is_active"], name="users_alive_active_idx", condition=ALIVE),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -111,8 +174,29 @@ class CustomUser(AbstractUser):
         - Устанавливает дату удаления
         - Сохраняет пользователя в базе
         
-        Это позволяет восстановить аккаунт при необходимости
+        Это позволяет восстановить аккаунт при необходимости.
+        Все выпущенные токены отзываются. Записываются только измененные
+        поля: экземпляр может быть снимком из кэша (см. users.user_cache).
         """
         self.is_active = False
         self.deleted_at = timezone.now()
-        self.save()
+        self.revoke_tokens()
+        self.save(update_fields=["is_active", "deleted_at"])
+
+    def revoke_tokens(self):
+        """
+        Отзыв всех выпущенных токенов пользователя
+
+        Эпоха увеличивается в базе одним UPDATE (token_epoch + 1), а не
+        записью значения экземпляра: экземпляр может быть устаревшим снимком
+        из кэша, и параллельный отзыв потерялся бы. Новое значение читается
+        обратно, кэш эпохи и кэш пользователя обновляются после фиксации
+        транзакции.
+        """
+        users = CustomUser.all_objects.filter(pk=self.pk)
+        users.update(token_epoch=F("token_epoch") + 1)
+        self.token_epoch = users.values_list("token_epoch", flat=True).get()
+
+        user_id, epoch = self.pk, self.token_epoch
+        transaction.on_commit(lambda: set_token_epoch(user_id, epoch))
+        transaction.on_commit(lambda: invalidate_user(user_id))
@@ -3,10 +3,12 @@ from .views import (
     UserProfileView,
     UserUpdateView,
     UserDeleteView,
+    AsyncUserProfileView,
 )
 
 urlpatterns = [
     path("profile/", UserProfileView.as_view(), name="profile"),
+    path("async/profile/", AsyncUserProfileView.as_view(), name="async_profile"),
     path("profile/update/", UserUpdateView.as_view(), name="update_profile"),
     path("delete/", UserDeleteView.as_view(), name="delete_account"),
 ]
@@ -0,0 +1,169 @@
+"""
+Регистрация пользователей
+
+Регистрация выполняет один INSERT пользователя без предварительной проверки
+email: занятый email определяется по нарушению уникального ограничения.
+Роли по умолчанию (Role.is_default) назначаются в той же транзакции одним
+INSERT, а кэш прав нового пользователя заполняется сразу, поэтому выпуск
+токенов после регистрации не обращается к базе данных.
+
+Массовый импорт (bulk_register) принимает уже захешированные пароли и
+создает пользователей пакетами через bulk_create.
+"""
+
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from backend.bulk import BULK_BATCH_SIZE
+from rbac.bulk import assign_default_roles
+from rbac.cache import set_user_permission_mask
+from rbac.policy import get_policy
+
+from .models import CustomUser, email_lookup
+
+
+class EmailTaken(ValueError):
+    """Пользователь с таким email уже существует"""
+
+
+def register_user(email, password, **extra_fields):
+    """
+    Создание пользователя с ролями по умолчанию
+
+    Raises:
+        EmailTaken: Если email уже занят
+    """
+    user = CustomUser(email=CustomUser.objects.normalize_email(email), **extra_fields)
+    user.set_password(password)
+
+    policy = get_policy()
+    try:
+        with transaction.atomic():
+            user.save(force_insert=True)
+            assign_default_roles([user.pk], policy)
+    except IntegrityError:
+        # Проверка выполняется только при ошибке, а не перед каждой вставкой
+        if CustomUser.all_objects.filter(email_lookup(user.email)).exists():
+            raise EmailTaken(user.email)
+        raise
+
+    set_user_permission_mask(user.pk, policy, policy.mask_for_roles(policy.default_roles))
+    return user
+
+
+def _build_user(row):
+    """
+    Пользователь из строки импорта
+
+    Пароль должен быть хешем в формате Django (algorithm$...); без пароля
+    создается пользователь с непригодным для входа паролем.
+
+    Raises:
+        ValidationError: Если строка не проходит проверку
+    """
+    email = CustomUser.objects.normalize_email((row.get("email") or "").strip())
+    validate_email(email)
+    # validate_email допускает адреса длиннее столбца: иначе DataError
+    # прервал бы вставку всего пакета
+    max_length = CustomUser._meta.get_field("email").max_length
+    if len(email) > max_length:
+        raise ValidationError(f"email: длина больше {max_length}")
+
+    names = {}
+    for field in ("first_name", "last_name", "middle_name"):
+        value = (row.get(field) or "").strip()
+        max_length = CustomUser._meta.get_field(field).max_length
+        if len(value) > max_length:
+            raise ValidationError(f"{field}: длина больше {max_length}")
+        if not value and field != "middle_name":
+            raise ValidationError(f"{field}: обязательное поле")
+        names[field] = value or None
+
+    password = row.get("password") or None
+    if password is None:
+        password = make_password(None)
+    else:
+        try:
+            identify_hasher(password)
+        except ValueError:
+            raise ValidationError("password: неизвестный формат хеша пароля")
+
+    return CustomUser(email=email, password=password, **names)
+
+
+def _insert_batch(users, policy):
+    """
+    Вставка пакета пользователей одной транзакцией
+
+    Returns:
+        tuple: (количество созданных, количество уже существующих)
+    """
+    with transaction.atomic():
+        # Сравнение по LOWER(email) использует уникальный функциональный индекс
+        existing = set(
+            CustomUser.all_objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=[user.email.lower() for user in users])
+            .values_list("email_lower", flat=True)
+        )
+        new_users = [user for user in users if user.email.lower() not in existing]
+        CustomUser.objects.bulk_create(new_users)
+        assign_default_roles([user.pk for user in new_users], policy)
+    return len(new_users), len(users) - len(new_users)
+
+
+def bulk_register(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Массовое создание пользователей
+
+    Строки читаются пакетами, так что итератор может быть потоковым (CSV на
+    сотни тысяч записей). На пакет выполняется три запроса: выборка занятых
+    email, INSERT пользователей и INSERT ролей по умолчанию. Пакет, в который
+    параллельно вставили тот же email, повторяется один раз.
+
+    Returns:
+        dict: created, existing и errors - список {"row", "email", "error"}
+            для строк, не прошедших проверку
+    """
+    summary = {"created": 0, "existing": 0, "errors": []}
+    policy = get_policy()
+    rows = enumerate(rows, start=1)
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+
+        users = {}
+        for number, row in chunk:
+            try:
+                user = _build_user(row)
+            except ValidationError as e:
+                summary["errors"].append(
+                    {"row": number, "email": row.get("email"), "error": " ".join(e.messages)}
+                )
+                continue
+            if user.email.lower() in users:
+                summary["existing"] += 1
+            else:
+                users[user.email.lower()] = user
+
+        users = list(users.values())
+        if not users:
+            continue
+        for attempt in range(2):
+            try:
+                created, existing = _insert_batch(users, policy)
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+
+        summary["created"] += created
+        summary["existing"] += existing
+
+    return summary
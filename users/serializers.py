@@ -1,8 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
+from rbac.tokens import RbacRefreshToken
 from .models import CustomUser
+from .registration import EmailTaken, register_user
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -21,7 +25,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             "password_confirm",
         ]
         extra_kwargs = {
-            "email": {"required": True},
+            # Уникальность проверяет ограничение базы при вставке (см. users.registration)
+            "email": {"required": True, "validators": []},
             "first_name": {"required": True},
             "last_name": {"required": True},
         }
@@ -31,17 +36,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(_("Пароли не совпадают"))
         return attrs
 
-    def validate_email(self, value):
-        if CustomUser.objects.filter(email=value).exists():
-            raise serializers.ValidationError(
-                _("Пользователь с таким email уже существует")
-            )
-        return value
-
     def create(self, validated_data):
         validated_data.pop("password_confirm")
-        user = CustomUser.objects.create_user(**validated_data)
-        return user
+        try:
+            return register_user(**validated_data)
+        except EmailTaken:
+            raise serializers.ValidationError(
+                {"email": [_("Пользователь с таким email уже существует")]}
+            )
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -54,15 +56,32 @@ class UserLoginSerializer(serializers.Serializer):
 
         if email and password:
             user = authenticate(username=email, password=password)
-            if not user:
-                raise serializers.ValidationError(_("Неверные учетные данные"))
-            if not user.is_active:
-                raise serializers.ValidationError(_("Аккаунт деактивирован"))
-            attrs["user"] = user
+            attrs["user"] = self.check_user(user)
         else:
             raise serializers.ValidationError(_("Необходимо указать email и пароль"))
         return attrs
 
+    @staticmethod
+    def check_user(user):
+        """Проверка результата аутентификации (общая для sync и async входа)"""
+        if not user:
+            raise serializers.ValidationError(_("Неверные учетные данные"))
+        if not user.is_active:
+            raise serializers.ValidationError(_("Аккаунт деактивирован"))
+        return user
+
+
+class LoginCredentialsSerializer(UserLoginSerializer):
+    """
+    Проверка формата email и пароля без аутентификации
+
+    Используется асинхронным входом: аутентификация выполняется отдельно
+    через users.backends.aauthenticate.
+    """
+
+    def validate(self, attrs):
+        return attrs
+
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -103,15 +122,47 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         current_password = validated_data.pop("current_password", None)
         new_password = validated_data.pop("new_password", None)
 
+        # request.user может быть снимком из кэша (см. users.user_cache):
+        # записываются только измененные поля, чтобы не вернуть прежние
+        # значения is_active, is_staff, is_superuser или email
+        update_fields = list(validated_data)
         if new_password and current_password:
             if not instance.check_password(current_password):
                 raise serializers.ValidationError(_("Неверный текущий пароль"))
             instance.set_password(new_password)
-            instance.save()
+            # Смена пароля завершает все сессии пользователя
+            instance.revoke_tokens()
+            update_fields.append("password")
 
         # Обновляем остальные поля
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.save()
+        if update_fields:
+            instance.save(update_fields=update_fields)
         return instance
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Обновление токена с актуальными правами RBAC в новом access токене
+
+    Неактивный пользователь получает ошибку токена; флаги is_staff и
+    is_superuser берутся из базы данных (см. RbacRefreshToken.refresh_user_flags).
+    """
+
+    token_class = RbacRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        refresh.refresh_user_flags()
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
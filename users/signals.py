@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import get_blacklist
+from .epochs import set_token_epoch
+from .models import CustomUser
+from .user_cache import invalidate_user
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def blacklisted_token_saved(sender, instance, created, **kwargs):
+    if created and settings.TOKEN_BLACKLIST_FILTER["ENABLED"]:
+        jti = instance.token.jti
+        transaction.on_commit(lambda: get_blacklist().add(jti))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, created=False, **kwargs):
+    # Сохранение (в том числе soft_delete и смена эпохи) и удаление
+    # сбрасывают кэш аутентификации после фиксации транзакции
+    if not created:
+        user_id = instance.pk
+        transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # Кэш эпохи токенов обновляется только после фиксации, иначе параллельный
+    # запрос мог бы прочитать из базы прежнее значение
+    if created or (update_fields is not None and "token_epoch" not in update_fields):
+        return
+    user_id, epoch = instance.pk, instance.token_epoch
+    transaction.on_commit(lambda: set_token_epoch(user_id, epoch))
@@ -1,3 +1,687 @@
-from django.test import TestCase
+import asyncio
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.contenttypes.models import ContentType
+from django.core.checks import run_checks
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+import users.throttling
+from backend.querybudget import QueryBudgetMiddleware
+from backend.testing import QueryCountTestCase, reset_process_caches
+from rbac.models import AuditLog, Role, UserRole
+from rbac.policy import get_policy
+from rbac.tokens import RbacRefreshToken
+
+from . import user_cache
+from .blacklist import TokenBlacklistFilter, is_token_blacklisted
+from .epochs import get_token_epoch
+from .hashing import HashingPoolBusy, PasswordHashingPool
+from .registration import EmailTaken, bulk_register, register_user
+from .throttling import LocalMemoryStore, SlidingWindowLimiter, client_ip
+from .views import AsyncAPIView
+
+User = get_user_model()
+
+PASSWORD = "password123"
+
+
+def warm_up(user):
+    """Загрузка данных, которые процесс читает один раз: политика RBAC, фильтр черного списка и эпоха токенов"""
+    get_policy()
+    is_token_blacklisted("")
+    get_token_epoch(user.pk)
+
+
+class UsersQueryCountTests(QueryCountTestCase):
+    """Количество SQL запросов эндпоинтов users/urls.py и users/profile_urls.py"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password=PASSWORD, first_name="A", last_name="A"
+        )
+        warm_up(self.user)
+
+    def _authenticate(self, user):
+        refresh = RbacRefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        return refresh
+
+    # Регистрация
+
+    def test_register(self):
+        data = {
+            "email": "new@example.com",
+            "password": PASSWORD,
+            "password_confirm": PASSWORD,
+            "first_name": "N",
+            "last_name": "N",
+        }
+        with self.assertQueryCount(5):
+            response = self.client.post(reverse("register"), data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_register_taken_email(self):
+        data = {
+            "email": "USER@example.com",
+            "password": PASSWORD,
+            "password_confirm": PASSWORD,
+            "first_name": "N",
+            "last_name": "N",
+        }
+        with self.assertQueryCount(5):
+            response = self.client.post(reverse("register"), data, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_register_bulk(self):
+        self.client.force_authenticate(self.admin)
+        size = 1
+
+        def register():
+            rows = [
+                {"email": f"bulk{size}-{i}@example.com", "first_name": "B", "last_name": "B"}
+                for i in range(size)
+            ]
+            response = self.client.post(reverse("register_bulk"), rows, format="json")
+            self.assertEqual(response.json()["created"], size)
+
+        def grow():
+            nonlocal size
+            size = 50
+
+        self.assertConstantQueries(5, register, grow)
+
+    # Вход и токены
+
+    def test_login(self):
+        data = {"email": self.user.email, "password": PASSWORD}
+        with self.assertQueryCount(2):
+            response = self.client.post(reverse("login"), data, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout(self):
+        refresh = self._authenticate(self.user)
+        with self.assertQueryCount(6):
+            response = self.client.post(reverse("logout"), {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 205)
+
+    def test_logout_all(self):
+        self._authenticate(self.user)
+        # UPDATE эпохи и чтение нового значения
+        with self.assertQueryCount(3):
+            response = self.client.post(reverse("logout_all"))
+        self.assertEqual(response.status_code, 205)
+
+    def test_token_refresh(self):
+        refresh = RbacRefreshToken.for_user(self.user)
+        with self.assertQueryCount(6):
+            response = self.client.post(
+                reverse("token_refresh"), {"refresh": str(refresh)}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_stats(self):
+        self.client.force_authenticate(self.admin)
+        for name in ("login_hashing_stats", "throttle_stats", "token_blacklist_stats"):
+            with self.subTest(name):
+                with self.assertQueryCount(0):
+                    response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+
+    # Профиль
+
+    def test_profile(self):
+        self._authenticate(self.user)
+        with self.assertQueryCount(1):
+            response = self.client.get(reverse("profile"))
+        self.assertEqual(response.status_code, 200)
+        # Пользователь берется из кэша (см. users.user_cache)
+        with self.assertQueryCount(0):
+            response = self.client.get(reverse("profile"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_profile(self):
+        self._authenticate(self.user)
+        with self.assertQueryCount(2):
+            response = self.client.patch(
+                reverse("update_profile"), {"first_name": "Новое"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_account(self):
+        refresh = self._authenticate(self.user)
+        with self.assertQueryCount(9):
+            response = self.client.post(
+                reverse("delete_account"), {"refresh": str(refresh)}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncUsersQueryCountTests(QueryCountTestCase):
+    """
+    Количество SQL запросов асинхронных эндпоинтов
+
+    Запросы считаются в основном потоке: sync_to_async представлений
+    выполняет ORM в потоке, вызвавшем async_to_sync.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+        warm_up(self.user)
+        self.refresh = RbacRefreshToken.for_user(self.user)
+        self.async_client = AsyncClient()
+
+    def test_async_login(self):
+        data = {"email": self.user.email, "password": PASSWORD}
+        with self.assertQueryCount(2):
+            response = async_to_sync(self.async_client.post)(
+                reverse("async_login"), data, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_token_refresh(self):
+        with self.assertQueryCount(6):
+            response = async_to_sync(self.async_client.post)(
+                reverse("async_token_refresh"),
+                {"refresh": str(self.refresh)},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_budget_middleware_stays_async(self):
+        async def get_response(request):
+            return None
+
+        # Под ASGI middleware не переводит цепочку в синхронный режим
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(QueryBudgetMiddleware(lambda request: None)))
+
+        budget = {**settings.QUERY_BUDGET, "ENABLED": True, "HEADERS": True}
+        headers = {"Authorization": f"Bearer {self.refresh.access_token}"}
+        with self.settings(QUERY_BUDGET=budget):
+            response = async_to_sync(self.async_client.get)(reverse("async_profile"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Query-Count"], "1")
+
+    def test_async_login_failed_signal(self):
+        received = []
+
+        def receiver(sender, credentials, **kwargs):
+            received.append(credentials)
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        data = {"email": self.user.email, "password": "wrong"}
+        response = async_to_sync(self.async_client.post)(
+            reverse("async_login"), data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(reverse("login"), data, format="json").status_code, 400)
+        # Как и при синхронном входе: один сигнал, пароль скрыт
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[0], received[1])
+        self.assertNotEqual(received[0]["password"], "wrong")
+
+    def test_initial_outside_event_loop(self):
+        initial = AsyncAPIView.initial
+        loops = []
+
+        def record_loop(view, request, *args, **kwargs):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return initial(view, request, *args, **kwargs)
+
+        headers = {"Authorization": f"Bearer {self.refresh.access_token}"}
+        with mock.patch.object(AsyncAPIView, "initial", autospec=True, side_effect=record_loop):
+            response = async_to_sync(self.async_client.get)(reverse("async_profile"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        # Проверки прав и лимитов (кэш, Redis) не блокируют событийный цикл
+        self.assertEqual(loops, [None])
+
+    def test_async_profile(self):
+        headers = {"Authorization": f"Bearer {self.refresh.access_token}"}
+        with self.assertQueryCount(1):
+            response = async_to_sync(self.async_client.get)(reverse("async_profile"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(RBAC_TOKEN_CLAIMS=True)
+class TokenRefreshUserFlagsTests(QueryCountTestCase):
+    """Флаги пользователя при обновлении токена читаются из базы данных"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password=PASSWORD, first_name="A", last_name="A"
+        )
+        warm_up(self.admin)
+        self.refresh = str(RbacRefreshToken.for_user(self.admin))
+
+    def _refresh(self):
+        return self.client.post(reverse("token_refresh"), {"refresh": self.refresh}, format="json")
+
+    def test_demoted_user(self):
+        User.objects.filter(pk=self.admin.pk).update(is_superuser=False, is_staff=False)
+        response = self._refresh()
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()["access"])
+        self.assertFalse(access["is_superuser"])
+        self.assertFalse(access["is_staff"])
+        # Ротированный refresh токен тоже содержит новые флаги
+        self.assertFalse(RbacRefreshToken(response.json()["refresh"])["is_superuser"])
+
+    def test_inactive_user(self):
+        User.objects.filter(pk=self.admin.pk).update(is_active=False)
+        self.assertEqual(self._refresh().status_code, 401)
+
+
+class ProfileUpdateTests(QueryCountTestCase):
+    """Изменение профиля пользователем из кэша аутентификации"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="staff@example.com", password=PASSWORD, first_name="S", last_name="S",
+            is_staff=True,
+        )
+        warm_up(self.user)
+        refresh = RbacRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        # Пользователь попадает в кэш
+        self.assertEqual(self.client.get(reverse("profile")).status_code, 200)
+
+    def test_update_keeps_admin_changes(self):
+        # Изменение в обход сохранения модели не сбрасывает кэш
+        User.objects.filter(pk=self.user.pk).update(is_staff=False, email="moved@example.com")
+        response = self.client.patch(reverse("update_profile"), {"first_name": "Новое"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.first_name, "Новое")
+        self.assertFalse(user.is_staff)
+        self.assertEqual(user.email, "moved@example.com")
+
+
+class UserCacheTests(QueryCountTestCase):
+    """Сброс кэша аутентификации во время загрузки пользователя"""
+
+    def test_invalidation_during_miss(self):
+        user = User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+        query = user_cache._query
+
+        def deactivate_while_reading(user_id):
+            # Пользователь прочитан до деактивации, сброс - до записи в кэш
+            values = query(user_id).first()
+            User.objects.filter(pk=user_id).update(is_active=False)
+            user_cache.invalidate_user(user_id)
+            return mock.Mock(first=mock.Mock(return_value=values))
+
+        with mock.patch.object(user_cache, "_query", side_effect=deactivate_while_reading):
+            self.assertTrue(user_cache.get_cached_user(user.pk).is_active)
+        self.assertFalse(user_cache.get_cached_user(user.pk).is_active)
+
+
+class TokenEpochTests(QueryCountTestCase):
+    """Отзыв всех токенов пользователя увеличением эпохи"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+        warm_up(self.user)
+
+    def _refresh(self, refresh):
+        return self.client.post(reverse("token_refresh"), {"refresh": str(refresh)}, format="json")
+
+    def test_logout_all_revokes_tokens(self):
+        refresh = RbacRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(reverse("logout_all")).status_code, 205)
+
+        self.assertEqual(self.client.get(reverse("profile")).status_code, 401)
+        self.assertEqual(self._refresh(refresh).status_code, 401)
+        # Токены, выпущенные после отзыва, действуют
+        new_refresh = RbacRefreshToken.for_user(User.objects.get(pk=self.user.pk))
+        self.assertEqual(self._refresh(new_refresh).status_code, 200)
+
+    def test_stale_instances_do_not_lose_revocations(self):
+        first = User.objects.get(pk=self.user.pk)
+        second = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.revoke_tokens()
+            second.revoke_tokens()
+        self.assertEqual(second.token_epoch, 2)
+        self.assertEqual(User.objects.get(pk=self.user.pk).token_epoch, 2)
+        self.assertEqual(get_token_epoch(self.user.pk), 2)
+
+    def test_revocation_survives_cache_loss(self):
+        refresh = RbacRefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).revoke_tokens()
+        # Процесс без значений в кэше читает эпоху из базы данных
+        reset_process_caches()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.assertEqual(self.client.get(reverse("profile")).status_code, 401)
+        response = async_to_sync(AsyncClient().post)(
+            reverse("async_token_refresh"), {"refresh": str(refresh)}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        refresh = RbacRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse("update_profile"),
+                {"current_password": PASSWORD, "new_password": "new-password-123"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._refresh(refresh).status_code, 401)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password("new-password-123"))
+
+
+class PurgeUsersTests(QueryCountTestCase):
+    """Окончательное удаление мягко удаленных пользователей"""
+
+    def test_purge_with_related_rows(self):
+        user = User.objects.create_user(
+            email="gone@example.com", password=PASSWORD, first_name="G", last_name="G"
+        )
+        role = Role.objects.create(name="Удаляемая")
+        UserRole.objects.create(user=user, role=role)
+        RbacRefreshToken.for_user(user)
+        log = AuditLog.objects.create(user=user, action="create", resource="test")
+        LogEntry.objects.create(
+            user=user, content_type=ContentType.objects.get_for_model(User),
+            object_id=str(user.pk), object_repr=str(user), action_flag=ADDITION,
+        )
+        user.soft_delete()
+        User.all_objects.filter(pk=user.pk).update(deleted_at=timezone.now() - timedelta(days=31))
+
+        call_command("purge_users", "--days", "30", stdout=StringIO())
+
+        self.assertFalse(User.all_objects.filter(pk=user.pk).exists())
+        self.assertFalse(LogEntry.objects.filter(user_id=user.pk).exists())
+        self.assertFalse(UserRole.objects.filter(user_id=user.pk).exists())
+        log.refresh_from_db()
+        self.assertIsNone(log.user_id)
+
+
+class SharedCacheCheckTests(QueryCountTestCase):
+    """Проверка общего кэша для черного списка и эпох токенов"""
+
+    def _ids(self, **kwargs):
+        return [message.id for message in run_checks(tags=["caches"], **kwargs)]
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache(self):
+        self.assertIn("users.W001", self._ids())
+        self.assertIn("users.E001", self._ids(include_deployment_checks=True))
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://localhost:6379/1",
+    }})
+    def test_shared_cache(self):
+        self.assertEqual(self._ids(include_deployment_checks=True), [])
+
+
+class HashingPoolTests(QueryCountTestCase):
+    """Отклонение задач переполненным пулем хеширования"""
+
+    def setUp(self):
+        super().setUp()
+        self.pool = PasswordHashingPool(workers=1, queue_size=0)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.busy = self.pool.submit(self.release.wait)
+
+    def test_full_pool_rejects(self):
+        with self.assertRaises(HashingPoolBusy):
+            self.pool.submit(make_password, PASSWORD)
+        self.release.set()
+        self.busy.result()
+        # Место освобождается после завершения задачи
+        self.assertTrue(self.pool.run(make_password, PASSWORD))
+        self.assertEqual(self.pool.stats()["rejected"], 1)
+        self.assertEqual(self.pool.stats()["completed"], 2)
+
+    def test_login_busy(self):
+        User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+        with mock.patch("users.backends.get_hashing_pool", return_value=self.pool):
+            response = self.client.post(
+                reverse("login"), {"email": "user@example.com", "password": PASSWORD}, format="json"
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data["detail"].code, "hashing_pool_busy")
+
+
+class TokenBlacklistTests(QueryCountTestCase):
+    """Отозванные при ротации refresh токены"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+        warm_up(self.user)
+
+    def _refresh(self, refresh):
+        return self.client.post(reverse("token_refresh"), {"refresh": str(refresh)}, format="json")
+
+    def test_rotated_token_rejected(self):
+        refresh = RbacRefreshToken.for_user(self.user)
+        # Фильтр другого процесса, построенный до ротации
+        other = TokenBlacklistFilter()
+        self.assertFalse(other.is_blacklisted(refresh["jti"]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._refresh(refresh)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self._refresh(refresh).status_code, 401)
+        self.assertEqual(self._refresh(response.json()["refresh"]).status_code, 200)
+        # Другой процесс узнает об отзыве по ключу в общем кэше
+        self.assertTrue(other.is_blacklisted(refresh["jti"]))
+        self.assertEqual(other.stats()["recent_hits"], 1)
+
+    @override_settings(TOKEN_BLACKLIST_FILTER={**settings.TOKEN_BLACKLIST_FILTER, "ENABLED": False})
+    def test_rotated_token_rejected_without_filter(self):
+        refresh = RbacRefreshToken.for_user(self.user)
+        self.assertEqual(self._refresh(refresh).status_code, 200)
+        self.assertEqual(self._refresh(refresh).status_code, 401)
+
+
+class BulkRegisterTests(QueryCountTestCase):
+    """Ошибки строк и занятые email при массовом импорте"""
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user(
+            email="user@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+
+    def test_invalid_rows_do_not_abort_batch(self):
+        rows = [
+            {"email": "new@example.com", "first_name": "N", "last_name": "N"},
+            {"email": f"{'a' * 64}@{'b' * 63}.{'c' * 63}.{'d' * 63}.com", "first_name": "L", "last_name": "L"},
+            {"email": "not-an-email", "first_name": "E", "last_name": "E"},
+            {"email": "nameless@example.com", "first_name": "N"},
+            {"email": "hash@example.com", "first_name": "H", "last_name": "H", "password": "plain"},
+        ]
+        summary = bulk_register(rows)
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual([error["row"] for error in summary["errors"]], [2, 3, 4, 5])
+        self.assertIn("email", summary["errors"][0]["error"])
+        self.assertTrue(User.objects.filter(email="new@example.com").exists())
+
+    def test_existing_email_case_insensitive(self):
+        rows = [
+            {"email": "USER@example.com", "first_name": "U", "last_name": "U"},
+            {"email": "new@example.com", "first_name": "N", "last_name": "N"},
+            {"email": "NEW@example.com", "first_name": "N", "last_name": "N"},
+        ]
+        summary = bulk_register(rows)
+        self.assertEqual((summary["created"], summary["existing"]), (1, 2))
+        self.assertEqual(User.objects.filter(email__iexact="new@example.com").count(), 1)
+
+    def test_register_taken_email_case_insensitive(self):
+        with self.assertRaises(EmailTaken):
+            register_user("User@Example.COM", PASSWORD, first_name="N", last_name="N")
+
+
+class EmailCaseTests(QueryCountTestCase):
+    """Email без учета регистра при входе и в ограничении уникальности"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            email="User@example.com", password=PASSWORD, first_name="U", last_name="U"
+        )
+
+    def test_login_any_case(self):
+        for email in ("user@example.com", "USER@EXAMPLE.COM"):
+            with self.subTest(email):
+                response = self.client.post(
+                    reverse("login"), {"email": email, "password": PASSWORD}, format="json"
+                )
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get_by_natural_key("uSeR@ExAmPlE.cOm"), self.user)
+
+    def test_unique_ignores_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(
+                email="user@EXAMPLE.com", password=PASSWORD, first_name="D", last_name="D"
+            )
+        with self.assertRaises(ValidationError):
+            User(email="USER@example.com", first_name="D", last_name="D").validate_constraints()
+
+
+class EmailCaseMigrationTests(TransactionTestCase):
+    """Миграция уникальности email без учета регистра на базе с дубликатами"""
+
+    before = [("users", "0003_customuser_token_epoch")]
+    after = [("users", "0004_customuser_email_lower_uniq")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_duplicates_abort_with_list(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldUser = executor.loader.project_state(self.before).apps.get_model("users", "CustomUser")
+        first = OldUser.objects.create(email="dup@example.com", first_name="A", last_name="A")
+        second = OldUser.objects.create(email="Dup@Example.com", first_name="B", last_name="B")
+        OldUser.objects.create(email="other@example.com", first_name="C", last_name="C")
+
+        executor = MigrationExecutor(connection)
+        with self.assertRaisesMessage(CommandError, "найдено 1 email") as error:
+            executor.migrate(self.after)
+        message = str(error.exception)
+        self.assertIn(f"id={first.pk} dup@example.com", message)
+        self.assertIn(f"id={second.pk} Dup@Example.com", message)
+        self.assertNotIn("other@example.com", message)
+
+        second.delete()
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+
+
+@override_settings(THROTTLING={
+    **settings.THROTTLING,
+    "ENABLED": True,
+    "STORE": "local",
+    "RATES": {"login_ip": "5/m", "login_email": "2/m", "login_global": None},
+})
+class ThrottlingTests(QueryCountTestCase):
+    """Ограничение частоты входа скользящим окном"""
+
+    def setUp(self):
+        super().setUp()
+        users.throttling._limiter = None
+        self.addCleanup(setattr, users.throttling, "_limiter", None)
+
+    def _login(self, email):
+        return self.client.post(reverse("login"), {"email": email, "password": "wrong"}, format="json")
+
+    def test_email_limit(self):
+        self.assertEqual(self._login("user@example.com").status_code, 400)
+        self.assertEqual(self._login("USER@example.com").status_code, 400)
+        # Третья попытка для того же email (без учета регистра) отклоняется
+        response = self._login("user@example.com")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(self._login("other@example.com").status_code, 400)
+        self.assertEqual(
+            users.throttling.get_limiter().stats.as_dict()["login"],
+            {"allowed": 3, "rejected": {"email": 1}},
+        )
+
+    def test_ip_limit(self):
+        statuses = [self._login(f"user{i}@example.com").status_code for i in range(6)]
+        self.assertEqual(statuses, [400] * 5 + [429])
+
+    def test_spoofed_forwarded_for(self):
+        statuses = [
+            self.client.post(
+                reverse("login"), {"email": f"user{i}@example.com", "password": "wrong"},
+                format="json", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}",
+            ).status_code
+            for i in range(6)
+        ]
+        self.assertEqual(statuses, [400] * 5 + [429])
+
+    def test_trusted_proxy(self):
+        request = APIRequestFactory().post(
+            "/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2"
+        )
+        self.assertEqual(client_ip(request), "10.0.0.1")
+        with override_settings(THROTTLING={**settings.THROTTLING, "NUM_PROXIES": 1}):
+            self.assertEqual(client_ip(request), "2.2.2.2")
+
+    def test_sliding_window(self):
+        limiter = SlidingWindowLimiter(LocalMemoryStore(), {"login_ip": "10/m"})
+        idents = {"ip": "1.2.3.4"}
+        for _ in range(10):
+            self.assertIsNone(limiter.hit("login", idents, now=30))
+        self.assertIsNotNone(limiter.hit("login", idents, now=59))
+        # В середине следующего окна предыдущее (11 запросов вместе с
+        # отклоненным) учитывается с весом 1/2: разрешено еще 4 запроса
+        for _ in range(4):
+            self.assertIsNone(limiter.hit("login", idents, now=90))
+        self.assertIsNotNone(limiter.hit("login", idents, now=90))
@@ -0,0 +1,290 @@
+"""
+Ограничение частоты входа и регистрации
+
+Счетчики скользящего окна (sliding window counter): для каждого правила
+хранятся счетчики текущего и предыдущего окна фиксированной длины, а оценка
+числа запросов за последний период - это счетчик текущего окна плюс
+счетчик предыдущего с весом оставшейся в периоде доли. На каждое правило
+нужно два ключа, а все правила запроса проверяются одним обращением к
+хранилищу (store.hit).
+
+Правила задаются в settings.THROTTLING["RATES"] по областям (scope) и
+признакам: "<scope>_ip", "<scope>_email" и "<scope>_global". Проверка
+выполняется в DRF throttle до сериализатора и хеширования пароля.
+
+Хранилища:
+- local: память процесса (счетчики не общие для процессов);
+- cache: кэш Django из CACHES;
+- redis: Redis-совместимый сервер, все ключи запроса за один round trip
+  (нужен пакет redis).
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_KEY = "throttle:{scope}:{name}:{ident}"
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Разбор частоты в формате DRF: "5/m", "100/h"
+
+    Returns:
+        tuple | None: (количество, период в секундах) или None, если правило отключено
+    """
+    if not rate:
+        return None
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class LocalMemoryStore:
+    """Счетчики в памяти процесса"""
+
+    def __init__(self, max_size=100000):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.max_size = max_size
+
+    def hit(self, items):
+        """
+        Увеличение счетчиков текущих окон и чтение счетчиков предыдущих
+
+        Args:
+            items: Тройки (ключ текущего окна, ключ предыдущего окна, ttl)
+
+        Returns:
+            list: Пары (счетчик текущего окна, счетчик предыдущего окна)
+        """
+        now = time.time()
+        counters = self._counters
+        result = []
+        with self._lock:
+            if len(counters) >= self.max_size:
+                self._prune(now)
+            for current_key, previous_key, ttl in items:
+                entry = counters.get(current_key)
+                if entry is None or entry[1] <= now:
+                    entry = counters[current_key] = [0, now + ttl]
+                entry[0] += 1
+                previous = counters.get(previous_key)
+                result.append((entry[0], previous[0] if previous and previous[1] > now else 0))
+        return result
+
+    def _prune(self, now):
+        for key in [key for key, entry in self._counters.items() if entry[1] <= now]:
+            del self._counters[key]
+        if len(self._counters) >= self.max_size:
+            self._counters.clear()
+
+
+class CacheStore:
+    """Счетчики в кэше Django"""
+
+    def hit(self, items):
+        previous = cache.get_many([previous_key for _, previous_key, _ in items])
+        result = []
+        for current_key, previous_key, ttl in items:
+            # incr сохраняет время жизни ключа; счетчик окна создается через add
+            # только при первом запросе в окне
+            try:
+                current = cache.incr(current_key)
+            except ValueError:
+                if cache.add(current_key, 1, ttl):
+                    current = 1
+                else:
+                    current = cache.incr(current_key)
+            result.append((current, previous.get(previous_key, 0)))
+        return result
+
+
+class RedisStore:
+    """Счетчики в Redis-совместимом хранилище (один round trip на запрос)"""
+
+    def __init__(self, url=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("Для хранилища redis требуется пакет redis")
+        self.client = redis.Redis.from_url(url or settings.THROTTLING["REDIS_URL"])
+
+    def hit(self, items):
+        pipeline = self.client.pipeline(transaction=False)
+        for current_key, previous_key, ttl in items:
+            pipeline.incr(current_key)
+            pipeline.expire(current_key, ttl)
+            pipeline.get(previous_key)
+        replies = pipeline.execute()
+        return [
+            (replies[index], int(replies[index + 2] or 0))
+            for index in range(0, len(replies), 3)
+        ]
+
+
+STORES = {
+    "local": LocalMemoryStore,
+    "cache": CacheStore,
+    "redis": RedisStore,
+}
+
+
+class ThrottleStats:
+    """Счетчики пропущенных и отклоненных запросов по областям (в пределах процесса)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scopes = {}
+
+    def record(self, scope, allowed, rule=None):
+        with self._lock:
+            counters = self._scopes.setdefault(scope, {"allowed": 0, "rejected": {}})
+            if allowed:
+                counters["allowed"] += 1
+            else:
+                counters["rejected"][rule] = counters["rejected"].get(rule, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._scopes = {}
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                scope: {"allowed": counters["allowed"], "rejected": dict(counters["rejected"])}
+                for scope, counters in self._scopes.items()
+            }
+
+
+class SlidingWindowLimiter:
+    def __init__(self, store, rates):
+        self.store = store
+        self.rates = {name: parse_rate(rate) for name, rate in rates.items()}
+        self.stats = ThrottleStats()
+
+    def hit(self, scope, idents, now=None):
+        """
+        Учет запроса по всем правилам области
+
+        Args:
+            scope: Область ("login", "register")
+            idents: Признак -> идентификатор, например {"ip": "1.2.3.4", "global": ""}
+
+        Returns:
+            float | None: Через сколько секунд повторить запрос или None, если он разрешен
+        """
+        now = time.time() if now is None else now
+        rules = []
+        items = []
+        for name, ident in idents.items():
+            rate = self.rates.get(f"{scope}_{name}")
+            if rate is None or ident is None:
+                continue
+            limit, period = rate
+            window, offset = divmod(now, period)
+            key = THROTTLE_KEY.format(scope=scope, name=name, ident=ident)
+            rules.append((name, limit, period, offset))
+            items.append((f"{key}:{int(window)}", f"{key}:{int(window) - 1}", 2 * period))
+
+        if not items:
+            return None
+
+        wait = None
+        rejected = None
+        for (name, limit, period, offset), (current, previous) in zip(rules, self.store.hit(items)):
+            weight = 1 - offset / period
+            if current + previous * weight <= limit:
+                continue
+            if current > limit:
+                # Освободится только в следующем окне
+                rule_wait = period - offset
+            else:
+                # Вес предыдущего окна убывает линейно до конца текущего
+                rule_wait = period * (1 - (limit - current) / previous) - offset
+            if wait is None or rule_wait > wait:
+                wait, rejected = rule_wait, name
+
+        self.stats.record(scope, wait is None, rejected)
+        return wait
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Общий для процесса SlidingWindowLimiter, настроенный из settings.THROTTLING"""
+    global _limiter
+
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                options = settings.THROTTLING
+                store = STORES.get(options["STORE"]) or import_string(options["STORE"])
+                _limiter = SlidingWindowLimiter(store(), options["RATES"])
+    return _limiter
+
+
+def client_ip(request):
+    """
+    IP клиента для ограничения частоты
+
+    X-Forwarded-For учитывается только за доверенными прокси
+    (THROTTLING["NUM_PROXIES"]): адрес, добавленный ближайшим к приложению
+    прокси из NUM_PROXIES, нельзя подделать со стороны клиента. Без прокси
+    используется REMOTE_ADDR - заголовок от клиента не учитывается.
+    """
+    num_proxies = settings.THROTTLING["NUM_PROXIES"]
+    forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if num_proxies > 0 and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(",")]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get("REMOTE_ADDR")
+
+
+def email_ident(email):
+    # Короткий хеш вместо email: ограниченная длина ключа и без персональных данных
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=8).hexdigest()
+
+
+class AuthRateThrottle(BaseThrottle):
+    """
+    Ограничение частоты по IP (см. client_ip), email из тела запроса и глобально
+
+    Область задается атрибутом scope подкласса; частоты - в
+    settings.THROTTLING["RATES"].
+    """
+
+    scope = None
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLING["ENABLED"]:
+            return True
+
+        email = request.data.get("email") if isinstance(request.data, dict) else None
+        idents = {
+            "ip": client_ip(request),
+            "email": email_ident(email) if isinstance(email, str) and email else None,
+            "global": "all",
+        }
+        self.wait_seconds = get_limiter().hit(self.scope, idents)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginRateThrottle(AuthRateThrottle):
+    scope = "login"
+
+
+class RegisterRateThrottle(AuthRateThrottle):
+    scope = "register"
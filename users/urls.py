@@ -1,14 +1,28 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     UserRegistrationView,
+    UserBulkImportView,
     UserLoginView,
     UserLogoutView,
+    UserLogoutAllView,
+    CustomTokenRefreshView,
+    LoginHashingStatsView,
+    TokenBlacklistStatsView,
+    ThrottleStatsView,
+    AsyncUserLoginView,
+    AsyncTokenRefreshView,
 )
 
 urlpatterns = [
     path("register/", UserRegistrationView.as_view(), name="register"),
+    path("register/bulk/", UserBulkImportView.as_view(), name="register_bulk"),
     path("login/", UserLoginView.as_view(), name="login"),
     path("logout/", UserLogoutView.as_view(), name="logout"),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("logout-all/", UserLogoutAllView.as_view(), name="logout_all"),
+    path("token/refresh/", CustomTokenRefreshView.as_view(), name="token_refresh"),
+    path("async/login/", AsyncUserLoginView.as_view(), name="async_login"),
+    path("async/token/refresh/", AsyncTokenRefreshView.as_view(), name="async_token_refresh"),
+    path("hashing/stats/", LoginHashingStatsView.as_view(), name="login_hashing_stats"),
+    path("throttle/stats/", ThrottleStatsView.as_view(), name="throttle_stats"),
+    path("token-blacklist/stats/", TokenBlacklistStatsView.as_view(), name="token_blacklist_stats"),
 ]
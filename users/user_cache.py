@@ -0,0 +1,143 @@
+"""
+Кэш аутентифицированных пользователей
+
+JWT аутентификация загружает пользователя на каждый запрос. Здесь пользователь
+хранится в компактном виде - кортеж значений только тех полей, которые нужны
+проверке токена, HasPermission и UserProfileSerializer - в двух уровнях:
+
+- локальный словарь процесса с коротким временем жизни (LOCAL_TIMEOUT);
+- общий кэш Django (TIMEOUT), который сбрасывается после фиксации
+  сохранения или удаления пользователя (users.signals).
+
+Сброс также меняет поколение пользователя (USER_GENERATION_KEY). Если
+поколение сменилось между чтением из базы и записью в кэш, записанное
+значение удаляется: иначе сброс в это время вернул бы в кэш прежние данные
+(например, активного пользователя или старую эпоху токенов).
+
+Локальные копии других процессов сбросить нельзя, поэтому изменения
+(деактивация, отзыв токенов) видны в них с задержкой не больше LOCAL_TIMEOUT.
+
+Из кэша восстанавливается обычный экземпляр CustomUser, у которого остальные
+поля отложены (как при .only()): обращение к user.password загружает поле
+отдельным запросом, а save() записывает только загруженные поля.
+"""
+
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+USER_CACHE_KEY = "users:auth_user:{user_id}"
+USER_GENERATION_KEY = "users:auth_user_generation:{user_id}"
+
+USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "middle_name",
+    "date_joined",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "token_epoch",
+)
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _key(user_id):
+    return USER_CACHE_KEY.format(user_id=user_id)
+
+
+def _generation_key(user_id):
+    return USER_GENERATION_KEY.format(user_id=user_id)
+
+
+@functools.cache
+def _field_names():
+    # Model.from_db ожидает значения в порядке полей модели
+    return tuple(
+        field.attname
+        for field in get_user_model()._meta.concrete_fields
+        if field.attname in USER_FIELDS
+    )
+
+
+def _build(values):
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, _field_names(), values)
+
+
+def _get_local(user_id):
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _set_local(user_id, values):
+    config = settings.USER_CACHE
+    with _local_lock:
+        if len(_local) >= config["LOCAL_MAX_SIZE"]:
+            _local.clear()
+        _local[user_id] = (time.monotonic() + config["LOCAL_TIMEOUT"], values)
+
+
+def _query(user_id):
+    return get_user_model().objects.filter(pk=user_id).values_list(*_field_names())
+
+
+def get_cached_user(user_id):
+    """
+    Пользователь для аутентификации запроса
+
+    Returns:
+        CustomUser | None: Новый экземпляр на каждый вызов или None,
+        если пользователь не существует
+    """
+    values = _get_local(user_id)
+    if values is None:
+        values = cache.get(_key(user_id))
+        if values is None:
+            generation = cache.get(_generation_key(user_id))
+            values = _query(user_id).first()
+            if values is None:
+                return None
+            cache.add(_key(user_id), values, timeout=settings.USER_CACHE["TIMEOUT"])
+            if cache.get(_generation_key(user_id)) != generation:
+                cache.delete(_key(user_id))
+                return _build(values)
+        _set_local(user_id, values)
+    return _build(values)
+
+
+async def aget_cached_user(user_id):
+    """Асинхронный вариант get_cached_user"""
+    values = _get_local(user_id)
+    if values is None:
+        values = await cache.aget(_key(user_id))
+        if values is None:
+            generation = await cache.aget(_generation_key(user_id))
+            values = await _query(user_id).afirst()
+            if values is None:
+                return None
+            await cache.aadd(_key(user_id), values, timeout=settings.USER_CACHE["TIMEOUT"])
+            if await cache.aget(_generation_key(user_id)) != generation:
+                await cache.adelete(_key(user_id))
+                return _build(values)
+        _set_local(user_id, values)
+    return _build(values)
+
+
+def invalidate_user(user_id):
+    # Поколение меняется до удаления: значение, прочитанное до сброса,
+    # удаляет либо этот вызов, либо записавший его get_cached_user
+    cache.set(_generation_key(user_id), time.time_ns(), timeout=None)
+    with _local_lock:
+        _local.pop(user_id, None)
+    cache.delete(_key(user_id))
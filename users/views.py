@@ -1,22 +1,46 @@
-from rest_framework import generics, status, permissions
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, generics, status, permissions
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import AUTH_HEADER_TYPES
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenRefreshView
+from rbac.tokens import RbacRefreshToken
 from django.utils.translation import gettext_lazy as _
 from .models import CustomUser
+from .authentication import AsyncJWTAuthentication
+from .backends import aauthenticate
+from .blacklist import get_blacklist
+from .hashing import get_hashing_pool
+from .registration import bulk_register
+from .throttling import LoginRateThrottle, RegisterRateThrottle, get_limiter
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
+    LoginCredentialsSerializer,
     UserProfileSerializer,
     UserUpdateSerializer,
+    CustomTokenRefreshSerializer,
 )
 
 
+def _login_response_data(user):
+    refresh = RbacRefreshToken.for_user(user)
+    return {
+        "user": UserProfileSerializer(user).data,
+        "access": str(refresh.access_token),
+        "refresh": str(refresh),
+    }
+
+
 class UserRegistrationView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegisterRateThrottle]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -24,7 +48,7 @@ class UserRegistrationView(generics.CreateAPIView):
         user = serializer.save()
 
         # Генерация токенов
-        refresh = RefreshToken.for_user(user)
+        refresh = RbacRefreshToken.for_user(user)
 
         return Response(
             {
@@ -36,23 +60,42 @@ class UserRegistrationView(generics.CreateAPIView):
         )
 
 
+class UserBulkImportView(APIView):
+    """
+    Массовый импорт пользователей (перенос пользовательской базы)
+
+    Принимает список пользователей с захешированными паролями в формате
+    Django; строки с ошибками пропускаются и перечисляются в ответе. Для
+    очень больших баз удобнее команда import_users.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    # Три запроса на пакет из BULK_BATCH_SIZE строк (см. users.registration)
+    query_budget = 100
+
+    def post(self, request):
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get("users")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return Response(
+                {"error": _("Ожидается список пользователей")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(bulk_register(rows))
+
+
 class UserLoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    # Проверяется до хеширования пароля
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
 
-        refresh = RefreshToken.for_user(user)
-
-        return Response(
-            {
-                "user": UserProfileSerializer(user).data,
-                "access": str(refresh.access_token),
-                "refresh": str(refresh),
-            }
-        )
+        return Response(_login_response_data(user))
 
 
 class UserLogoutView(APIView):
@@ -62,13 +105,23 @@ class UserLogoutView(APIView):
         try:
             refresh_token = request.data.get("refresh")
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = RbacRefreshToken(refresh_token)
                 token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class UserLogoutAllView(APIView):
+    """Завершение всех сессий: отзыв всех токенов пользователя одной записью"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        request.user.revoke_tokens()
+        return Response(status=status.HTTP_205_RESET_CONTENT)
+
+
 class UserProfileView(generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -96,7 +149,7 @@ class UserDeleteView(APIView):
         try:
             refresh_token = request.data.get("refresh")
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = RbacRefreshToken(refresh_token)
                 token.blacklist()
         except Exception:
             pass
@@ -109,4 +162,149 @@ class UserDeleteView(APIView):
 class CustomTokenRefreshView(TokenRefreshView):
     """Кастомный view для обновления токена"""
 
-    pass
+    serializer_class = CustomTokenRefreshSerializer
+
+
+class LoginHashingStatsView(APIView):
+    """Статистика пула хеширования паролей текущего процесса"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_hashing_pool().stats())
+
+
+class ThrottleStatsView(APIView):
+    """Счетчики ограничения частоты входа и регистрации текущего процесса"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        limiter = get_limiter()
+        return Response(
+            {"store": type(limiter.store).__name__, "scopes": limiter.stats.as_dict()}
+        )
+
+
+class TokenBlacklistStatsView(APIView):
+    """Статистика фильтра черного списка токенов текущего процесса"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_blacklist().stats())
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView с асинхронными обработчиками для ASGI
+
+    DRF 3.14 не поддерживает async представления, поэтому dispatch
+    переопределен: аутентификаторы с методом aauthenticate вызываются прямо
+    в событийном цикле, остальные - через sync_to_async. Проверки прав и
+    лимитов запросов (initial) могут обращаться к кэшу, Redis или базе данных,
+    поэтому тоже выполняются через sync_to_async, а не в событийном цикле.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # options() у APIView синхронный
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request):
+        """Асинхронный аналог Request._authenticate; initial() затем берет готовый request.user"""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+
+class AsyncUserLoginView(AsyncAPIView):
+    """Асинхронный вход: хеширование в пуле ожидается без блокировки цикла событий"""
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle]
+
+    async def post(self, request):
+        serializer = LoginCredentialsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user = await aauthenticate(
+            request,
+            username=serializer.validated_data["email"],
+            password=serializer.validated_data["password"],
+        )
+        try:
+            user = UserLoginSerializer.check_user(user)
+        except exceptions.ValidationError as e:
+            raise exceptions.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: e.detail})
+
+        # Выпуск токенов записывает OutstandingToken синхронным ORM simplejwt
+        return Response(await sync_to_async(_login_response_data)(user))
+
+
+class AsyncUserProfileView(AsyncAPIView):
+    authentication_classes = [AsyncJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        return Response(UserProfileSerializer(request.user).data)
+
+
+class AsyncTokenRefreshView(AsyncAPIView):
+    """
+    Асинхронное обновление токена
+
+    Проверка черного списка и ротация refresh токена выполняются ORM
+    simplejwt синхронно, поэтому валидация целиком вынесена в sync_to_async.
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    www_authenticate_realm = "api"
+
+    def get_authenticate_header(self, request):
+        # Как в TokenViewBase: ошибка токена - 401, а не 403
+        return f'{AUTH_HEADER_TYPES[0]} realm="{self.www_authenticate_realm}"'
+
+    async def post(self, request):
+        serializer = CustomTokenRefreshSerializer(data=request.data)
+        try:
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        return Response(serializer.validated_data)